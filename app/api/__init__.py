@@ -5,10 +5,14 @@ This module initializes the API package and provides
 access to all API routers.
 """
 
+from .auth import router as auth_router
 from .health import router as health_router
+from .metrics import router as metrics_router
 from .users import router as users_router
 
 __all__ = [
+    "auth_router",
     "health_router",
+    "metrics_router",
     "users_router",
 ]
@@ -0,0 +1,139 @@
+"""
+Authentication API Routes
+
+This module contains the login, logout and current-user endpoints, and
+``get_token_claims``, the dependency that protects routes with a bearer
+access token.
+"""
+
+import math
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.core.ratelimit import RateLimitExceeded
+from app.core.responses import PydanticJSONResponse
+from app.core.security import PasswordHasherBusyError
+from app.core.timing import TimedRoute
+from app.core.tokens import (
+    InvalidTokenError,
+    TokenClaims,
+    TokenManager,
+    get_token_manager,
+)
+from app.schemas.base import SuccessResponse
+from app.schemas.user import TokenResponse, UserLogin, UserResponse
+from app.services.user_service import UserService, get_user_service
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["Auth"],
+    default_response_class=PydanticJSONResponse,
+    route_class=TimedRoute,
+)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def _retry_later(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_token_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+    tokens: TokenManager = Depends(get_token_manager),
+) -> TokenClaims:
+    """Verify the bearer token of a request (401 if missing or invalid).
+
+    The claims come from the token itself, so no user lookup is made.
+    """
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    try:
+        return tokens.verify(credentials.credentials)
+    except InvalidTokenError as error:
+        raise _unauthorized(str(error))
+
+
+@router.post("/login", response_model=TokenResponse)
+async def login(
+    credentials: UserLogin,
+    user_service: UserService = Depends(get_user_service),
+    tokens: TokenManager = Depends(get_token_manager),
+):
+    """
+    Log in with a username (or email) and password, returning an access token.
+    
+    Returns 401 for invalid credentials, 429 once the username has used up
+    its attempts and 503 while password hashing is at capacity; the last
+    two carry a Retry-After header.
+    
+    - **credentials**: Username or email, and password
+    """
+    try:
+        user = await user_service.authenticate_user(
+            credentials.username, credentials.password
+        )
+    except RateLimitExceeded as error:
+        raise _retry_later(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Too many login attempts, retry later",
+            error.retry_after,
+        )
+    except PasswordHasherBusyError as error:
+        raise _retry_later(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Too many password operations in progress, retry later",
+            error.retry_after,
+        )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid username or password"
+        )
+    token, _ = tokens.issue(user.id, user.username)
+    return PydanticJSONResponse(TokenResponse.model_construct(
+        access_token=token,
+        token_type="bearer",
+        expires_in=tokens.ttl_seconds,
+        user=user,
+    ))
+
+
+@router.post("/logout", response_model=SuccessResponse)
+async def logout(
+    claims: TokenClaims = Depends(get_token_claims),
+    tokens: TokenManager = Depends(get_token_manager),
+):
+    """
+    Revoke the bearer token used for this request.
+    
+    The token is rejected from now on, in this process, until it expires.
+    """
+    tokens.revoke(claims)
+    return PydanticJSONResponse(SuccessResponse(message="Logged out"))
+
+
+@router.get("/me", response_model=UserResponse)
+async def get_me(
+    claims: TokenClaims = Depends(get_token_claims),
+    user_service: UserService = Depends(get_user_service),
+):
+    """
+    Get the user the bearer token was issued to.
+    """
+    user = await user_service.get_user_by_id(claims.user_id)
+    if user is None:
+        raise _unauthorized("User no longer exists")
+    return PydanticJSONResponse(user)
@@ -5,11 +5,19 @@ This module contains health check and system status endpoints.
 """
 
 from datetime import datetime
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from app.core.config import Settings, get_settings
+from app.core.responses import PydanticJSONResponse
+from app.core.timing import TimedRoute
 from app.schemas.base import HealthCheckResponse, SuccessResponse
+from app.services.user_service import UserService, get_user_service
 
-router = APIRouter(prefix="/health", tags=["Health"])
+router = APIRouter(
+    prefix="/health",
+    tags=["Health"],
+    default_response_class=PydanticJSONResponse,
+    route_class=TimedRoute,
+)
 
 
 @router.get("/", response_model=HealthCheckResponse)
@@ -19,11 +27,11 @@ async def health_check(settings: Settings = Depends(get_settings)):
     
     Returns the current status and basic information about the application.
     """
-    return HealthCheckResponse(
+    return PydanticJSONResponse(HealthCheckResponse(
         status="healthy",
         version=settings.app_version,
         environment=settings.environment,
-    )
+    ))
 
 
 @router.get("/ping", response_model=SuccessResponse)
@@ -31,26 +39,39 @@ async def ping():
     """
     Simple ping endpoint for basic connectivity testing.
     """
-    return SuccessResponse(
+    return PydanticJSONResponse(SuccessResponse(
         message="pong",
         data={"timestamp": datetime.utcnow().isoformat()}
-    )
+    ))
 
 
 @router.get("/info", response_model=dict)
-async def app_info(settings: Settings = Depends(get_settings)):
+async def app_info(request: Request, settings: Settings = Depends(get_settings)):
     """
     Application information endpoint.
     
-    Returns detailed information about the application configuration.
+    Returns detailed information about the application configuration. The
+    documentation URLs are null when the docs are disabled.
     """
-    return {
+    return PydanticJSONResponse({
         "app_name": settings.app_name,
         "version": settings.app_version,
         "description": settings.app_description,
         "environment": settings.environment,
         "debug": settings.debug,
-        "docs_url": "/docs",
-        "redoc_url": "/redoc",
+        "docs_url": request.app.docs_url,
+        "redoc_url": request.app.redoc_url,
         "timestamp": datetime.utcnow().isoformat(),
-    }
+    })
+
+
+@router.get("/cache", response_model=dict)
+async def cache_stats(user_service: UserService = Depends(get_user_service)):
+    """
+    Read cache statistics endpoint.
+    
+    Returns hit, miss and eviction counters for the user read cache.
+    """
+    if user_service.cache is None:
+        return PydanticJSONResponse({"enabled": False})
+    return PydanticJSONResponse({"enabled": True, **user_service.cache.stats()})
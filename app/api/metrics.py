@@ -0,0 +1,46 @@
+"""
+Metrics API Routes
+
+This module contains the Prometheus scrape endpoint.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import (
+    USER_CACHE_BYTES,
+    USER_CACHE_ENTRIES,
+    USER_CACHE_EVICTIONS,
+    USER_CACHE_REQUESTS,
+    USER_READS_COALESCED,
+    USER_STORE_USERS,
+    registry,
+)
+from app.services.user_service import UserService, get_user_service
+
+router = APIRouter(tags=["Metrics"])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(user_service: UserService = Depends(get_user_service)):
+    """
+    Prometheus metrics endpoint.
+
+    Returns request, latency, service and store metrics in the Prometheus
+    text exposition format.
+    """
+    USER_STORE_USERS.set(await user_service.repository.count())
+    if user_service.cache is not None:
+        stats = user_service.cache.stats()
+        USER_CACHE_ENTRIES.set(stats["entries"])
+        USER_CACHE_BYTES.set(stats["bytes"])
+        # Mirror the cache's own running totals
+        USER_CACHE_REQUESTS.labels("hit").set(stats["hits"])
+        USER_CACHE_REQUESTS.labels("miss").set(stats["misses"])
+        USER_CACHE_EVICTIONS.labels("capacity").set(stats["evictions"])
+        USER_CACHE_EVICTIONS.labels("expired").set(stats["expirations"])
+    for read, count in user_service.flights.stats()["coalesced"].items():
+        USER_READS_COALESCED.labels(read).set(count)
+
+    return PlainTextResponse(await registry.exposition(), media_type=CONTENT_TYPE)
@@ -5,48 +5,291 @@ This module contains all user-related API endpoints including
 CRUD operations for user management.
 """
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from app.schemas.user import UserResponse, UserCreate, UserUpdate
+import math
+from datetime import datetime
+from typing import AsyncIterator, List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
+from app.core.conditional import Representation, if_none_match
+from app.core.responses import PydanticJSONResponse
+from app.core.pagination import decode_cursor
+from app.core.security import PasswordHasherBusyError
+from app.core.timing import TimedRoute
+from app.schemas.user import (
+    UserResponse,
+    UserCreate,
+    UserUpdate,
+    UserPage,
+    UserBulkCreate,
+    UserBulkUpdate,
+    UserBulkDelete,
+    BulkItemResult,
+    BulkResponse,
+)
 from app.schemas.base import SuccessResponse, ErrorResponse
+from app.repositories import UserAlreadyExistsError, UserQuery, VersionConflictError
 from app.services.user_service import UserService, get_user_service
 
-router = APIRouter(prefix="/users", tags=["Users"])
+# Handlers return PydanticJSONResponse so models built by UserService are
+# serialized once, without being validated again against response_model.
+router = APIRouter(
+    prefix="/users",
+    tags=["Users"],
+    default_response_class=PydanticJSONResponse,
+    route_class=TimedRoute,
+)
+
+
+def _conditional_response(
+    representation: Representation, if_none_match_header: Optional[str]
+) -> Response:
+    """Send a representation, or 304 Not Modified if the client has it."""
+    headers = {"ETag": representation.etag}
+    if if_none_match(if_none_match_header, representation.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=representation.body, media_type="application/json", headers=headers
+    )
+
+
+def _after_id(cursor: Optional[str]) -> Optional[int]:
+    """Decode a pagination cursor query parameter (400 if malformed)."""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def _precondition_failed(user_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"User with ID {user_id} does not match If-Match"
+    )
+
+
+def _hasher_busy(error: PasswordHasherBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password operations in progress, retry later",
+        headers={"Retry-After": str(math.ceil(error.retry_after))},
+    )
 
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
     skip: int = Query(0, ge=0, description="Number of users to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of users to return"),
+    if_none_match: Optional[str] = Header(None),
     user_service: UserService = Depends(get_user_service)
 ):
     """
     Get all users with pagination.
     
+    Responses carry an ETag that changes with any write to the user store;
+    send it back in If-None-Match to get 304 Not Modified.
+    
     - **skip**: Number of users to skip (for pagination)
     - **limit**: Maximum number of users to return
     """
-    users = await user_service.get_users(skip=skip, limit=limit)
-    return users
+    representation = await user_service.get_users_json(skip=skip, limit=limit)
+    return _conditional_response(representation, if_none_match)
+
+
+@router.get("/page", response_model=UserPage)
+async def get_users_page(
+    after: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of users to return"),
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Get users with cursor-based (keyset) pagination.
+    
+    Pages stay consistent while users are created or deleted, and deep
+    pages cost the same as the first one.
+    
+    - **after**: Cursor from the previous page's `next_cursor` (omit for the first page)
+    - **limit**: Maximum number of users to return
+    """
+    page = await user_service.get_users_page(after=_after_id(after), limit=limit)
+    return PydanticJSONResponse(page)
+
+
+@router.get("/search", response_model=UserPage)
+async def search_users(
+    username: Optional[str] = Query(None, min_length=1, description="Username prefix"),
+    email: Optional[str] = Query(None, min_length=1, description="Email prefix"),
+    name: Optional[str] = Query(None, min_length=1, description="Words starting words of the full name"),
+    is_active: Optional[bool] = Query(None, description="Only active or inactive users"),
+    created_from: Optional[datetime] = Query(None, description="Created at or after"),
+    created_to: Optional[datetime] = Query(None, description="Created before"),
+    after: Optional[str] = Query(None, description="Cursor returned by the previous page"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of users to return"),
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Search users.
+    
+    All given filters must match. Prefix and name matching ignore case.
+    Results are in ID order and paged with cursors like `/page`.
+    
+    - **username**: Username prefix, e.g. `adm`
+    - **email**: Email prefix, e.g. `admin@`
+    - **name**: Every word must start a word of the full name, e.g. `reg us`
+    - **is_active**: Filter on the active flag
+    - **created_from** / **created_to**: Creation time range (from inclusive, to exclusive)
+    - **after**: Cursor from the previous page's `next_cursor`
+    - **limit**: Maximum number of users to return
+    """
+    query = UserQuery(
+        username=username,
+        email=email,
+        name=name,
+        is_active=is_active,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    page = await user_service.search_users(query, after=_after_id(after), limit=limit)
+    return PydanticJSONResponse(page)
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+async def _stream_ndjson(
+    batches: AsyncIterator[List[UserResponse]],
+) -> AsyncIterator[bytes]:
+    """Serialize user batches as newline-delimited JSON."""
+    async for batch in batches:
+        yield b"".join(user.model_dump_json().encode() + b"\n" for user in batch)
+
+
+async def _stream_json_array(
+    batches: AsyncIterator[List[UserResponse]],
+) -> AsyncIterator[bytes]:
+    """Serialize user batches as a single streamed JSON array."""
+    separator = b"["
+    async for batch in batches:
+        yield separator + b",".join(user.model_dump_json().encode() for user in batch)
+        separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()},
+            "description": "All matching users, streamed",
+        }
+    },
+)
+async def export_users(
+    format: Literal["ndjson", "json"] = Query("ndjson", description="Output format"),
+    is_active: Optional[bool] = Query(None, description="Only export users with this active status"),
+    batch_size: int = Query(500, ge=1, le=10000, description="Users read from the store per batch"),
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Stream every user without building the full list in memory.
+    
+    - **format**: `ndjson` (one user per line) or `json` (a streamed array)
+    - **is_active**: Optional filter on the user's active status
+    - **batch_size**: Number of users read from the store per batch
+    """
+    batches = user_service.iter_users(is_active=is_active, batch_size=batch_size)
+    body = _stream_ndjson(batches) if format == "ndjson" else _stream_json_array(batches)
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+
+def _bulk_response(results: List[BulkItemResult]) -> BulkResponse:
+    """Summarize per-item bulk results."""
+    failed = sum(1 for result in results if result.status == "error")
+    return BulkResponse.model_construct(
+        succeeded=len(results) - failed, failed=failed, results=results
+    )
+
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_create_users(
+    payload: UserBulkCreate,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Create up to 1000 users in one request.
+    
+    Items with a username that already exists (or repeats within the batch)
+    are reported as errors; all other users are created in one transaction.
+    """
+    try:
+        results = await user_service.bulk_create_users(payload.items)
+    except PasswordHasherBusyError as error:
+        raise _hasher_busy(error)
+    return PydanticJSONResponse(_bulk_response(results))
+
+
+@router.patch("/bulk", response_model=BulkResponse)
+async def bulk_update_users(
+    payload: UserBulkUpdate,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Update up to 1000 users in one request.
+    
+    Each item carries the user `id` plus the fields to change. Unknown IDs
+    and username clashes are reported per item; all other updates are
+    applied in one transaction.
+    """
+    results = await user_service.bulk_update_users(payload.items)
+    return PydanticJSONResponse(_bulk_response(results))
+
+
+@router.delete("/bulk", response_model=BulkResponse)
+async def bulk_delete_users(
+    payload: UserBulkDelete,
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Delete up to 1000 users in one request.
+    
+    - **ids**: IDs of the users to delete; unknown IDs are reported per item
+    """
+    results = await user_service.bulk_delete_users(payload.ids)
+    return PydanticJSONResponse(_bulk_response(results))
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
+    if_none_match: Optional[str] = Header(None),
     user_service: UserService = Depends(get_user_service)
 ):
     """
     Get a specific user by ID.
     
+    Supports If-None-Match with the ETag from a previous response.
+    
     - **user_id**: The ID of the user to retrieve
     """
-    user = await user_service.get_user_by_id(user_id)
-    if not user:
+    representation = await user_service.get_user_json(user_id)
+    if representation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found"
         )
-    return user
+    return _conditional_response(representation, if_none_match)
 
 
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -59,75 +302,96 @@ async def create_user(
     
     - **user_data**: User information including username, email, and password
     """
-    # Check if username already exists
-    existing_user = await user_service.get_user_by_username(user_data.username)
-    if existing_user:
+    try:
+        new_user = await user_service.create_user(user_data)
+    except UserAlreadyExistsError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists"
         )
-    
-    new_user = await user_service.create_user(user_data)
-    return new_user
+    except PasswordHasherBusyError as error:
+        raise _hasher_busy(error)
+    return PydanticJSONResponse(new_user, status_code=status.HTTP_201_CREATED)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
+    if_match: Optional[str] = Header(None),
     user_service: UserService = Depends(get_user_service)
 ):
     """
     Update an existing user.
     
+    Send the user's ETag in If-Match to only update it if nobody else has
+    changed it since (412 Precondition Failed otherwise).
+    
     - **user_id**: The ID of the user to update
     - **user_data**: Updated user information
     """
-    updated_user = await user_service.update_user(user_id, user_data)
-    if not updated_user:
+    try:
+        representation = await user_service.update_user_json(user_id, user_data, if_match)
+    except UserAlreadyExistsError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already exists"
+        )
+    except VersionConflictError:
+        raise _precondition_failed(user_id)
+    if representation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found"
         )
-    return updated_user
+    return _conditional_response(representation, None)
 
 
 @router.delete("/{user_id}", response_model=SuccessResponse)
 async def delete_user(
     user_id: int,
+    if_match: Optional[str] = Header(None),
     user_service: UserService = Depends(get_user_service)
 ):
     """
     Delete a user.
     
+    Send the user's ETag in If-Match to only delete it if it is unchanged.
+    
     - **user_id**: The ID of the user to delete
     """
-    success = await user_service.delete_user(user_id)
+    try:
+        success = await user_service.delete_user(user_id, if_match)
+    except VersionConflictError:
+        raise _precondition_failed(user_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found"
         )
     
-    return SuccessResponse(
+    return PydanticJSONResponse(SuccessResponse(
         message=f"User with ID {user_id} successfully deleted"
-    )
+    ))
 
 
 @router.get("/username/{username}", response_model=UserResponse)
 async def get_user_by_username(
     username: str,
+    if_none_match: Optional[str] = Header(None),
     user_service: UserService = Depends(get_user_service)
 ):
     """
     Get a user by username.
     
+    Supports If-None-Match with the ETag from a previous response.
+    
     - **username**: The username to search for
     """
-    user = await user_service.get_user_by_username(username)
-    if not user:
+    representation = await user_service.get_user_by_username_json(username)
+    if representation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with username '{username}' not found"
         )
-    return user
+    return _conditional_response(representation, if_none_match)
@@ -0,0 +1,143 @@
+"""
+Response Cache
+
+This module contains the cache used in front of service reads.
+
+``CacheBackend`` is the interface a shared cache (for example Redis) would
+implement so every worker sees the same entries. ``LRUCache`` is the
+in-process default: it is bounded by entry count and optionally by total
+bytes, expires entries after a TTL and keeps hit, miss and eviction counters.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class CacheBackend(ABC):
+    """Interface for caches of serialized responses."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value, or None on a miss."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        """Store a value."""
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        """Remove entries if present."""
+
+    @abstractmethod
+    async def counter(self, key: str) -> int:
+        """Return the value of an integer counter (0 if unset).
+
+        Counters are never evicted, so they can version groups of entries.
+        """
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Atomically increment an integer counter, returning its new value."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+
+
+class LRUCache(CacheBackend):
+    """Bounded in-process LRU cache with per-entry TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: Optional[float] = 60.0,
+        max_bytes: Optional[int] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # key -> (expires_at, value); most recently used entries are last.
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at and expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store a value, evicting least recently used entries over the bounds."""
+        self._remove(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._entries[key] = (expires_at, value)
+        self._bytes += len(value)
+
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        """Remove entries if present."""
+        for key in keys:
+            self._remove(key)
+
+    async def counter(self, key: str) -> int:
+        """Return the value of an integer counter (0 if unset)."""
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        """Increment an integer counter kept outside the LRU entries."""
+        value = self._counters.get(key, 0) + 1
+        self._counters[key] = value
+        return value
+
+    async def clear(self) -> None:
+        """Remove every entry."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
@@ -0,0 +1,215 @@
+"""
+Response Compression
+
+This module contains ``CompressionMiddleware``, a pure ASGI middleware that
+compresses response bodies with gzip or, when the optional ``brotli``
+package is installed, brotli.
+
+Bodies are compressed as they are sent: each chunk of a streaming response
+is compressed and flushed on its own, so a client receives every chunk as
+soon as the application produces it and memory stays bounded however long
+the stream runs. Responses that are small, already encoded (static assets
+carry their own precompressed variants) or of an excluded content type are
+passed through untouched. Sizes before and after and the CPU time spent
+are recorded in the app's metrics.
+"""
+
+import time
+import zlib
+from typing import Callable, Iterable, List, Optional
+
+from app.core.conditional import encoded_etag
+from app.core.metrics import (
+    HTTP_COMPRESSION_CPU_SECONDS,
+    HTTP_COMPRESSION_INPUT_BYTES,
+    HTTP_COMPRESSION_OUTPUT_BYTES,
+    HTTP_COMPRESSION_RATIO,
+)
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(header: Optional[str]) -> List[str]:
+    """Return the content codings an Accept-Encoding header allows."""
+    if not header:
+        return []
+    accepted = []
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+class _Compressor:
+    """Incremental compressor with a common interface for each encoding."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            # Brotli quality runs 0-11; the zlib-style level is used as is
+            self._brotli = brotli.Compressor(quality=min(11, max(0, level)))
+        else:
+            # wbits 16 + MAX_WBITS writes a gzip header and trailer
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Compress a chunk, flushing so it can be sent immediately."""
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing eligible responses on the fly."""
+
+    def __init__(
+        self,
+        app: Callable,
+        algorithms: Iterable[str] = ("br", "gzip"),
+        minimum_size: int = 1024,
+        level: int = 6,
+        excluded_types: Iterable[str] = (),
+    ):
+        self.app = app
+        # Keep the configured preference order, dropping what is unavailable
+        self.algorithms = [a for a in algorithms if a in SUPPORTED_ENCODINGS]
+        self.minimum_size = minimum_size
+        self.level = level
+        self.excluded_types = tuple(t.lower() for t in excluded_types)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+        input_bytes = output_bytes = 0
+        cpu_seconds = 0.0
+
+        async def send_compressed(message) -> None:
+            nonlocal start_message, compressor, passthrough
+            nonlocal input_bytes, output_bytes, cpu_seconds
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if self._eligible(message):
+                    # Held until the first body chunk shows whether it is worth it
+                    start_message = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.level)
+
+            started = time.thread_time()
+            data = compressor.compress(body, final=not more_body)
+            cpu_seconds += time.thread_time() - started
+            input_bytes += len(body)
+            output_bytes += len(data)
+            if start_message is not None:
+                # A complete body keeps a Content-Length; a stream is chunked
+                length = None if more_body else len(data)
+                await send(self._compressed_start(start_message, encoding, length))
+                start_message = None
+            if data or not more_body:
+                await send({
+                    "type": "http.response.body", "body": data, "more_body": more_body
+                })
+            if not more_body:
+                _record(encoding, input_bytes, output_bytes, cpu_seconds)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _negotiate(self, scope) -> Optional[str]:
+        """Pick the preferred algorithm the client accepts, if any."""
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                header = value.decode("latin-1")
+                break
+        accepted = accepted_encodings(header)
+        for algorithm in self.algorithms:
+            if algorithm in accepted:
+                return algorithm
+        return None
+
+    def _eligible(self, message) -> bool:
+        """Check the response status and headers allow compression."""
+        if message["status"] < 200 or message["status"] in (204, 206, 304):
+            return False
+        content_type = b""
+        for name, value in message.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-length" and int(value) < self.minimum_size:
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        content_type = content_type.decode("latin-1")
+        return not content_type.startswith(self.excluded_types)
+
+    @staticmethod
+    def _compressed_start(message, encoding: str, length: Optional[int]):
+        """Rewrite the start message headers for a compressed body."""
+        headers = []
+        vary = None
+        for name, value in message.get("headers", []):
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"vary":
+                vary = value
+                continue
+            if lower == b"etag":
+                # The bytes differ from the uncompressed representation
+                value = encoded_etag(value.decode("latin-1"), encoding).encode("latin-1")
+            headers.append((name, value))
+        headers.append((b"content-encoding", encoding.encode()))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        vary = b"Accept-Encoding" if vary is None else vary + b", Accept-Encoding"
+        headers.append((b"vary", vary))
+        return {**message, "headers": headers}
+
+
+def _record(encoding: str, input_bytes: int, output_bytes: int, cpu_seconds: float):
+    HTTP_COMPRESSION_INPUT_BYTES.labels(encoding).inc(input_bytes)
+    HTTP_COMPRESSION_OUTPUT_BYTES.labels(encoding).inc(output_bytes)
+    HTTP_COMPRESSION_CPU_SECONDS.labels(encoding).inc(cpu_seconds)
+    if input_bytes:
+        HTTP_COMPRESSION_RATIO.labels(encoding).observe(output_bytes / input_bytes)
@@ -0,0 +1,93 @@
+"""
+Conditional Requests
+
+This module contains helpers for ETag validators and the If-None-Match /
+If-Match request headers.
+
+A compressed response carries the strong ETag of its uncompressed
+representation with the content coding appended (see ``encoded_etag``);
+both headers accept it in place of the original.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Content codings ``encoded_etag`` may append
+_CODINGS = ("br", "gzip")
+
+
+class Representation(NamedTuple):
+    """A serialized response body together with its ETag."""
+
+    body: bytes
+    etag: str
+
+    def pack(self) -> bytes:
+        """Encode as a single byte string for a cache backend."""
+        return self.etag.encode() + b"\n" + self.body
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Representation":
+        """Decode a value produced by ``pack``."""
+        etag, _, body = data.partition(b"\n")
+        return cls(body=body, etag=etag.decode())
+
+
+def user_etag(row: Dict[str, Any]) -> str:
+    """Return the strong ETag for a user row."""
+    return f'"u{row["id"]}.{row["version"]}.{row["updated_at"]:%Y%m%d%H%M%S%f}"'
+
+
+def collection_etag(revision: int, *params: Any) -> str:
+    """Return the strong ETag for a collection view at a revision."""
+    return '"c' + ".".join(str(part) for part in (revision, *params)) + '"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Return the ETag for ``etag``'s representation compressed with ``encoding``.
+
+    Weak ETags are returned unchanged.
+    """
+    if etag.startswith("W/") or encoding not in _CODINGS:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _parse_etags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _matches(tag: str, etag: str) -> bool:
+    """Compare strongly, also accepting ``etag`` with a content coding appended."""
+    if tag == etag:
+        return True
+    for coding in _CODINGS:
+        suffix = f'-{coding}"'
+        if tag.endswith(suffix) and tag[: -len(suffix)] + '"' == etag:
+            return True
+    return False
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """Return True if If-None-Match matches, i.e. 304 should be sent.
+
+    Uses the weak comparison required for If-None-Match.
+    """
+    if not header:
+        return False
+    for tag in _parse_etags(header):
+        if tag == "*" or _matches(tag.removeprefix("W/"), etag):
+            return True
+    return False
+
+
+def if_match(header: Optional[str], etag: Optional[str]) -> bool:
+    """Return True if If-Match allows the request to proceed.
+
+    Uses the strong comparison required for If-Match; ``etag`` is None
+    when the resource does not exist.
+    """
+    if header is None:
+        return True
+    if etag is None:
+        return False
+    return any(tag == "*" or _matches(tag, etag) for tag in _parse_etags(header))
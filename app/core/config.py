@@ -5,11 +5,16 @@ This module handles all configuration settings for the FastAPI application,
 including environment variables, database settings, and other configuration options.
 """
 
+import json
 import os
-from typing import List, Optional
-from pydantic_settings import BaseSettings
+from typing import Annotated, Dict, List, Optional
+from pydantic_settings import BaseSettings, NoDecode
 from pydantic import field_validator
 
+# A list setting parsed by ``Settings.parse_list`` rather than as JSON only
+StrList = Annotated[List[str], NoDecode]
+IntList = Annotated[List[int], NoDecode]
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
@@ -26,43 +31,133 @@ class Settings(BaseSettings):
     environment: str = "development"
     
     # CORS Configuration
-    allowed_origins: List[str] = [
+    allowed_origins: StrList = [
         "http://localhost:3000",
         "http://localhost:8000", 
         "http://127.0.0.1:8000"
     ]
-    allowed_methods: List[str] = ["*"]
-    allowed_headers: List[str] = ["*"]
+    allowed_methods: StrList = ["*"]
+    allowed_headers: StrList = ["*"]
     
     # Logging Configuration
     log_level: str = "INFO"
-    
+
+    # Startup Configuration
+    # Serve /docs, /redoc and /openapi.json; disable to skip building the schema
+    docs_enabled: bool = True
+    # File the OpenAPI schema is cached in across restarts (see app.core.openapi)
+    openapi_cache_path: Optional[str] = None
+    # Compile templates and build the static manifest at startup, not first use
+    preload_assets: bool = False
+    # Log how long each startup step took
+    startup_profile: bool = False
+
     # Database Configuration (Optional)
     database_url: Optional[str] = None
+    database_pool_size: int = 5
+    
+    # Durable In-Memory Store (used when DATABASE_URL is unset)
+    # Directory for the write-ahead log and snapshots; unset keeps users in memory
+    wal_dir: Optional[str] = None
+    # "always" (a write returns once fsynced), "interval" or "never"
+    wal_fsync: str = "always"
+    # Seconds between batched writes for the "interval" and "never" policies
+    wal_fsync_interval: float = 1.0
+    # Seconds between snapshot checks; 0 only snapshots on shutdown
+    snapshot_interval_seconds: float = 300.0
+    # Log records needed since the last snapshot before a new one is taken
+    snapshot_min_records: int = 10000
+    
+    # Read Cache Configuration
+    cache_enabled: bool = True
+    cache_max_entries: int = 10000
+    cache_max_bytes: Optional[int] = 64 * 1024 * 1024
+    cache_ttl_seconds: float = 60.0
+    
+    # Response Compression Configuration
+    compression_enabled: bool = True
+    # In order of preference; "br" needs the optional brotli package
+    compression_algorithms: StrList = ["br", "gzip"]
+    compression_minimum_size: int = 1024
+    compression_level: int = 6
+    # Content type prefixes that are sent uncompressed
+    compression_excluded_types: StrList = [
+        "image/", "video/", "audio/", "application/zip", "application/gzip",
+        "text/event-stream",
+    ]
+    
+    # Metrics Configuration
+    metrics_enabled: bool = True
+    # Shared directory for per-worker snapshots when running several workers
+    metrics_multiprocess_dir: Optional[str] = None
+    metrics_flush_interval: float = 5.0
+    
+    # Request Timing Configuration
+    # Send a Server-Timing header breaking each response down by phase
+    server_timing_enabled: bool = True
+    # Log a JSON timing record for requests at least this slow (ms); 0 logs none
+    server_timing_log_threshold_ms: float = 1000.0
+    
+    # Request Profiling Configuration
+    # IDs of the users whose bearer token may profile a request with
+    # "X-Profile: 1" or "?profile=1"; empty disables per-request profiling.
+    # IDs, unlike usernames, cannot be claimed by renaming or registering.
+    profiling_admin_ids: IntList = []
+    # Where request profiles and sampled stacks are written
+    profile_dir: Optional[str] = None
+    # Seconds between samples of the event loop's stack; 0 disables sampling
+    profile_sample_interval: float = 0.0
+    # Seconds between rewrites of the collapsed-stack file
+    profile_sample_flush_seconds: float = 60.0
     
     # Security Configuration (Optional)
     secret_key: Optional[str] = None
     access_token_expire_minutes: int = 30
+    # Names the signing key in issued tokens; change it when rotating keys
+    secret_key_id: str = "default"
+    # Retired keys still accepted for verification, as {"key id": "key"}
+    previous_secret_keys: Dict[str, str] = {}
+    # Recently verified tokens remembered to skip re-verification
+    token_cache_size: int = 1024
     
-    @field_validator('allowed_origins', mode='before')
-    @classmethod
-    def parse_cors_origins(cls, v):
-        if isinstance(v, str):
-            return [origin.strip() for origin in v.split(',')]
-        return v
+    # Password Hashing Configuration
+    # "thread" or "process"; scrypt releases the GIL, so threads run in parallel
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = max(1, min(4, os.cpu_count() or 1))
+    # Calls allowed to wait for a worker before logins get 503
+    password_hash_queue_size: int = 64
+    # scrypt CPU/memory cost (a power of two); 2**14 takes ~50ms and 16 MB
+    password_scrypt_n: int = 2 ** 14
     
-    @field_validator('allowed_methods', mode='before')
-    @classmethod
-    def parse_cors_methods(cls, v):
-        if isinstance(v, str):
-            return [method.strip() for method in v.split(',')]
-        return v
+    # Request Rate Limiting (per client and route template); off by default
+    rate_limit_enabled: bool = False
+    # "token_bucket" (allows bursts up to the limit) or "sliding_window"
+    rate_limit_algorithm: str = "token_bucket"
+    # Quota for routes without their own, as "requests/period" (e.g. "100/60s")
+    rate_limit_default: Optional[str] = "600/60s"
+    # Per-route quotas keyed by "METHOD /route/template" or "/route/template"
+    rate_limit_routes: Dict[str, str] = {"GET /api/users/": "120/60s"}
+    # Buckets kept per worker before the least recently used are dropped
+    rate_limit_max_keys: int = 100000
+    # Path prefixes that are never limited
+    rate_limit_exempt_paths: StrList = ["/api/health", "/metrics", "/static"]
+    
+    # Login Rate Limiting (per username)
+    login_rate_limit_attempts: int = 5
+    login_rate_limit_window_seconds: float = 60.0
     
-    @field_validator('allowed_headers', mode='before')
+    @field_validator(
+        'allowed_origins', 'allowed_methods', 'allowed_headers',
+        'compression_algorithms', 'compression_excluded_types',
+        'rate_limit_exempt_paths', 'profiling_admin_ids', mode='before'
+    )
     @classmethod
-    def parse_cors_headers(cls, v):
+    def parse_list(cls, v):
+        # From the environment, lists are JSON arrays or comma-separated
         if isinstance(v, str):
-            return [header.strip() for header in v.split(',')]
+            if v.lstrip().startswith('['):
+                return json.loads(v)
+            return [item.strip() for item in v.split(',') if item.strip()]
         return v
     
     model_config = {
@@ -0,0 +1,64 @@
+"""
+Striped Locks
+
+This module contains ``StripedLock``, a fixed set of asyncio locks that
+keys are hashed onto.
+
+Writes to different keys usually take different stripes and run
+concurrently, while writes to the same key are serialized. Memory stays
+constant however many keys exist, unlike a lock per key. Multi-key writes
+take their stripes in index order, so two writers can never deadlock.
+
+Locks are created on first use, inside the running event loop: before
+Python 3.10 an ``asyncio.Lock`` binds to the loop current when it is
+created, so locks made at import time would belong to the wrong loop. A
+pool used from a new event loop starts over with fresh locks.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable, Iterable, List, Optional
+
+
+class StripedLock:
+    """A fixed pool of asyncio locks selected by key hash."""
+
+    def __init__(self, stripes: int = 256):
+        if stripes < 1:
+            raise ValueError("stripes must be at least 1")
+        self._locks: List[Optional[asyncio.Lock]] = [None] * stripes
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def stripe(self, key: Hashable) -> int:
+        """Return the stripe index guarding ``key``."""
+        return hash(key) % len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *keys: Hashable) -> AsyncIterator[None]:
+        """Hold the locks for every key for the duration of the block."""
+        async with self.hold_all(keys):
+            yield
+
+    @asynccontextmanager
+    async def hold_all(self, keys: Iterable[Hashable]) -> AsyncIterator[None]:
+        """Hold the locks for an iterable of keys, acquired in stripe order."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._locks = [None] * len(self._locks)
+            self._loop = loop
+        locks = self._locks
+        acquired: List[asyncio.Lock] = []
+        try:
+            for index in sorted({self.stripe(key) for key in keys}):
+                lock = locks[index]
+                if lock is None:
+                    lock = locks[index] = asyncio.Lock()
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
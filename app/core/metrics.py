@@ -0,0 +1,527 @@
+"""
+Application Metrics
+
+This module contains a small Prometheus-compatible metrics registry, the
+ASGI middleware that records per-route HTTP metrics and the metric
+definitions used by the application.
+
+Metrics are kept in process memory and updated from the event loop. When
+several uvicorn workers serve the app, set ``METRICS_MULTIPROCESS_DIR`` to a
+directory shared by the workers (and emptied before they start): each
+worker then writes a snapshot of its metrics to ``metrics_<pid>.json``
+every ``METRICS_FLUSH_INTERVAL`` seconds, and a scrape of ``/metrics`` on
+any worker aggregates every snapshot. Counters and histograms are summed
+across workers, including workers that have exited; gauges are combined
+per their ``multiprocess_mode`` and dropped for exited workers.
+"""
+
+import asyncio
+import functools
+import json
+import math
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+LabelValues = Tuple[str, ...]
+
+# Prometheus' default buckets, extended below 5ms for in-process latencies.
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _ValueChild:
+    """A single counter or gauge time series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class _HistogramChild:
+    """A single histogram time series."""
+
+    __slots__ = ("upper_bounds", "buckets", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # Per-bucket (non-cumulative) counts; the last bucket is +Inf.
+        self.buckets = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """Base class for a metric family with optional labels."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        """Return the child time series for the given label values."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def _unlabelled(self) -> Any:
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels; use .labels()")
+        return self.labels()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable copy of every time series."""
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [
+                [list(values), self._dump_child(child)]
+                for values, child in self._children.items()
+            ],
+        }
+
+    def _dump_child(self, child: Any) -> Any:
+        return child.value
+
+
+class Counter(Metric):
+    """A monotonically increasing total."""
+
+    type = "counter"
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+
+class Gauge(Metric):
+    """A value that can go up and down.
+
+    ``multiprocess_mode`` says how values from several workers combine:
+    ``"sum"``, ``"max"`` or ``"all"`` (one series per worker, with a ``pid``
+    label).
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        multiprocess_mode: str = "sum",
+    ):
+        if multiprocess_mode not in ("sum", "max", "all"):
+            raise ValueError(f"Unknown multiprocess_mode: {multiprocess_mode}")
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def _new_child(self) -> _ValueChild:
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["mode"] = self.multiprocess_mode
+        return data
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.upper_bounds)
+        return data
+
+    def _dump_child(self, child: _HistogramChild) -> Any:
+        return {"buckets": list(child.buckets), "sum": child.sum, "count": child.count}
+
+
+def render_snapshot(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """Render a registry snapshot in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for name, family in snapshot.items():
+        labelnames = family["labelnames"]
+        lines.append(f"# HELP {name} {_escape(family['help'])}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for values, sample in family["samples"]:
+            if family["type"] != "histogram":
+                labels = _format_labels(labelnames, values)
+                lines.append(f"{name}{labels} {_format_value(sample)}")
+                continue
+
+            cumulative = 0
+            bounds = family["buckets"] + [math.inf]
+            for bound, count in zip(bounds, sample["buckets"]):
+                cumulative += count
+                labels = _format_labels(
+                    labelnames + ["le"], values + [_format_value(bound)]
+                )
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(labelnames, values)
+            lines.append(f"{name}_sum{labels} {_format_value(sample['sum'])}")
+            lines.append(f"{name}_count{labels} {sample['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Aggregate per-worker snapshots into one registry snapshot.
+
+    Each item is a ``{"pid": ..., "live": ..., "metrics": ...}`` document as
+    written by ``MetricsRegistry.write_snapshot``.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    series: Dict[str, Dict[LabelValues, Any]] = {}
+
+    for document in snapshots:
+        for name, family in document["metrics"].items():
+            kind = family["type"]
+            if kind == "gauge" and not document["live"]:
+                continue
+            if name not in merged:
+                merged[name] = dict(family, samples=[])
+                series[name] = {}
+                if kind == "gauge" and family["mode"] == "all":
+                    merged[name]["labelnames"] = family["labelnames"] + ["pid"]
+            by_labels = series[name]
+
+            for values, sample in family["samples"]:
+                if kind == "gauge" and family["mode"] == "all":
+                    values = values + [str(document["pid"])]
+                key = tuple(values)
+                current = by_labels.get(key)
+                if current is None:
+                    by_labels[key] = (
+                        dict(sample, buckets=list(sample["buckets"]))
+                        if kind == "histogram" else sample
+                    )
+                elif kind == "histogram":
+                    for i, count in enumerate(sample["buckets"]):
+                        current["buckets"][i] += count
+                    current["sum"] += sample["sum"]
+                    current["count"] += sample["count"]
+                elif kind == "gauge" and family["mode"] == "max":
+                    by_labels[key] = max(current, sample)
+                else:
+                    by_labels[key] = current + sample
+
+    for name, by_labels in series.items():
+        merged[name]["samples"] = [
+            [list(values), sample] for values, sample in by_labels.items()
+        ]
+    return merged
+
+
+class MetricsRegistry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        self.multiprocess_dir = Path(multiprocess_dir) if multiprocess_dir else None
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric; names must be unique."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        multiprocess_mode: str = "sum",
+    ):
+        return self.register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return a JSON-serializable copy of every metric."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def render(self) -> str:
+        """Render this process' metrics in the Prometheus text format."""
+        return render_snapshot(self.snapshot())
+
+    async def exposition(self) -> str:
+        """Render the metrics to serve from ``/metrics``.
+
+        In multiprocess mode this writes this worker's snapshot and
+        aggregates the snapshots of every worker; file I/O runs in a thread.
+        """
+        if self.multiprocess_dir is None:
+            return self.render()
+        document = self._document(live=True)
+        return await asyncio.to_thread(self._aggregate, document)
+
+    async def write_snapshot(self, live: bool = True) -> None:
+        """Write this worker's snapshot to the multiprocess directory.
+
+        ``live=False`` marks the worker as exited so its gauges are ignored.
+        """
+        if self.multiprocess_dir is not None:
+            await asyncio.to_thread(self._write, self._document(live))
+
+    async def flush_periodically(self, interval: float) -> None:
+        """Write snapshots every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.write_snapshot()
+
+    def _document(self, live: bool) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "live": live, "metrics": self.snapshot()}
+
+    def _write(self, document: Dict[str, Any]) -> None:
+        self.multiprocess_dir.mkdir(parents=True, exist_ok=True)
+        path = self.multiprocess_dir / f"metrics_{document['pid']}.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(document))
+        os.replace(temporary, path)
+
+    def _aggregate(self, document: Dict[str, Any]) -> str:
+        self._write(document)
+        documents = []
+        for path in sorted(self.multiprocess_dir.glob("metrics_*.json")):
+            try:
+                documents.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # Being replaced or removed by its worker
+        return render_snapshot(merge_snapshots(documents))
+
+
+def _route_template(scope: Dict[str, Any]) -> str:
+    """Return the full path template of the route that served a request."""
+    # FastAPI resolves included routers lazily; the matched APIRoute's own
+    # path then lacks the include prefix, which the route context carries.
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route HTTP metrics.
+
+    Requests are labelled with the route's path template (for example
+    ``/api/users/{user_id}``) so label cardinality stays bounded; requests
+    that match no route are labelled ``unmatched``.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            route = _route_template(scope)
+            HTTP_REQUESTS_TOTAL.labels(method, route, str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(duration)
+
+
+def timed(operation: str) -> Callable:
+    """Decorate a coroutine method to record its duration by operation."""
+    child = SERVICE_OPERATION_DURATION.labels(operation)
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+# Application metrics
+registry = MetricsRegistry(multiprocess_dir=settings.metrics_multiprocess_dir)
+
+HTTP_REQUESTS_TOTAL = registry.counter(
+    "http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served.",
+    ["method"],
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method and route template.",
+    ["method", "route"],
+)
+SERVICE_OPERATION_DURATION = registry.histogram(
+    "user_service_operation_duration_seconds",
+    "UserService operation latency.",
+    ["operation"],
+)
+USER_STORE_USERS = registry.gauge(
+    "user_store_users",
+    "Users in the user store.",
+    multiprocess_mode="max",
+)
+USER_CACHE_ENTRIES = registry.gauge("user_cache_entries", "Entries in the read cache.")
+USER_CACHE_BYTES = registry.gauge("user_cache_bytes", "Bytes held by the read cache.")
+USER_CACHE_REQUESTS = registry.counter(
+    "user_cache_requests_total", "Read cache lookups by result.", ["result"]
+)
+USER_CACHE_EVICTIONS = registry.counter(
+    "user_cache_evictions_total", "Read cache removals by reason.", ["reason"]
+)
+USER_READS_COALESCED = registry.counter(
+    "user_reads_coalesced_total",
+    "JSON reads that joined an identical read already in flight, by read.",
+    ["read"],
+)
+PASSWORD_HASH_PENDING = registry.gauge(
+    "password_hash_pending", "Password hash calls running or queued."
+)
+PASSWORD_HASH_REJECTED = registry.counter(
+    "password_hash_rejected_total", "Password hash calls rejected at capacity."
+)
+HTTP_RATE_LIMITED = registry.counter(
+    "http_rate_limited_total",
+    "Requests rejected by the rate limiter, by route template.",
+    ["route"],
+)
+LOGIN_RATE_LIMITED = registry.counter(
+    "login_rate_limited_total", "Login attempts rejected by the rate limiter."
+)
+HTTP_COMPRESSION_INPUT_BYTES = registry.counter(
+    "http_compression_input_bytes_total",
+    "Response bytes before compression, by encoding.",
+    ["encoding"],
+)
+HTTP_COMPRESSION_OUTPUT_BYTES = registry.counter(
+    "http_compression_output_bytes_total",
+    "Response bytes after compression, by encoding.",
+    ["encoding"],
+)
+HTTP_COMPRESSION_RATIO = registry.histogram(
+    "http_compression_ratio",
+    "Compressed size over original size per response, by encoding.",
+    ["encoding"],
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0),
+)
+HTTP_COMPRESSION_CPU_SECONDS = registry.counter(
+    "http_compression_cpu_seconds_total",
+    "CPU time spent compressing responses, by encoding.",
+    ["encoding"],
+)
+APP_STARTUP_SECONDS = registry.gauge(
+    "app_startup_seconds",
+    "Seconds from process start until the app was ready to serve.",
+    multiprocess_mode="all",
+)
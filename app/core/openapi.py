@@ -0,0 +1,115 @@
+"""
+OpenAPI Schema Cache
+
+This module contains ``install_openapi_cache``, which keeps the app's
+OpenAPI schema in a JSON file across restarts.
+
+FastAPI builds the schema on the first request to ``/docs`` or
+``/openapi.json``, walking every route and model; for this app that takes
+about as long as importing FastAPI itself. With a cache file the schema is
+read back instead, as long as its fingerprint (the FastAPI version, the app
+version, the routes mounted and a hash of the application sources) still
+matches; settings that add or remove routes change the route list. Otherwise it
+is generated as usual and the file rewritten. Build it ahead of deployment
+with::
+
+    python -m app.core.openapi openapi.json
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import fastapi
+import fastapi.routing
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+
+def schema_fingerprint(app: FastAPI, source_dir: Path = APP_DIR) -> str:
+    """Hash everything the generated schema depends on."""
+    digest = hashlib.sha256()
+    digest.update(f"{fastapi.__version__}\0{app.title}\0{app.version}".encode())
+    for route in _routes(app):
+        path = getattr(route, "path", None)
+        methods = ",".join(sorted(getattr(route, "methods", None) or ()))
+        included = getattr(route, "include_in_schema", True)
+        digest.update(f"\0{path}\0{methods}\0{included}".encode())
+    for path in sorted(source_dir.rglob("*.py")):
+        digest.update(str(path.relative_to(source_dir)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _routes(app: FastAPI) -> Iterable[Any]:
+    """Return every route, including those of routers FastAPI mounts lazily."""
+    # Newer FastAPI versions keep included routers as nodes of app.routes
+    iter_route_contexts = getattr(fastapi.routing, "iter_route_contexts", None)
+    if iter_route_contexts is None:
+        return app.routes
+    return iter_route_contexts(app.routes)
+
+
+def _load(path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as file:
+            cached = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("fingerprint") != fingerprint:
+        return None
+    return cached.get("schema")
+
+
+def _store(path: str, fingerprint: str, schema: Dict[str, Any]) -> None:
+    # Written to a temporary file first so readers never see half a file
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as file:
+            json.dump({"fingerprint": fingerprint, "schema": schema}, file)
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.warning(f"Could not write OpenAPI cache {path}: {e}")
+
+
+def install_openapi_cache(app: FastAPI, path: str) -> None:
+    """Make ``app.openapi()`` read and write the schema cache at ``path``."""
+    generate = app.openapi
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            fingerprint = schema_fingerprint(app)
+            schema = _load(path, fingerprint)
+            if schema is None:
+                schema = generate()
+                _store(path, fingerprint, schema)
+            app.openapi_schema = schema
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+def main() -> int:
+    """Write the schema cache for ``app.main:app``."""
+    if len(sys.argv) != 2:
+        print("usage: python -m app.core.openapi PATH", file=sys.stderr)
+        return 2
+    from app.main import app
+
+    path = sys.argv[1]
+    app.openapi_schema = None
+    install_openapi_cache(app, path)
+    app.openapi()
+    print(f"Wrote OpenAPI schema cache to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
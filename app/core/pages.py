@@ -0,0 +1,165 @@
+"""
+Page Rendering
+
+This module contains ``PageRenderer``, which serves the HTML pages from
+memory.
+
+The pages only depend on settings that are fixed at runtime, so rendering
+them on every request repeats the same work. ``PageRenderer`` compiles the
+templates once at startup and caches each fully rendered page, keyed by
+template name, a hash of the context and the request's base URL (which
+``url_for`` bakes into static links). Every cached page carries its body,
+ETag and Content-Length already encoded, so a hit costs one dictionary
+lookup. In debug mode the template files are checked on every request and
+the cache is dropped when any of them changes.
+
+The Jinja environment itself is only created (and jinja2 only imported)
+when a page is first rendered or ``precompile`` is called, so processes
+that never serve HTML do not pay for it at startup.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.core.conditional import if_none_match
+
+
+class RenderedPage(NamedTuple):
+    """A rendered page with its ETag and encoded headers."""
+
+    body: bytes
+    etag: str
+    raw_headers: List[Tuple[bytes, bytes]]
+
+
+class PageResponse(Response):
+    """HTML response for a cached page, reusing its encoded headers."""
+
+    media_type = "text/html"
+
+    def __init__(self, page: RenderedPage, status_code: int = 200):
+        self.status_code = status_code
+        self.background = None
+        self.body = page.body
+        # Copied, because middleware may add headers to the list it is sent.
+        self.raw_headers = list(page.raw_headers)
+
+
+class PageRenderer:
+    """Render templates once and serve the results from an LRU cache."""
+
+    def __init__(
+        self,
+        directory: str,
+        debug: bool = False,
+        max_entries: int = 64,
+        setup: Optional[Callable[[Any], None]] = None,
+    ):
+        self.directory = directory
+        self.debug = debug
+        # Called with the Jinja2Templates once it exists, e.g. to add globals
+        self.setup = setup
+        self._templates: Optional[Any] = None
+        # Bounded, because the base URL comes from the client's Host header
+        self.max_entries = max_entries
+        self._pages: "OrderedDict[Tuple[str, str, str], RenderedPage]" = OrderedDict()
+        self._mtimes: Optional[Dict[str, float]] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def templates(self) -> Any:
+        """Return the Jinja2Templates, creating it on first use."""
+        if self._templates is None:
+            from fastapi.templating import Jinja2Templates
+
+            templates = Jinja2Templates(directory=self.directory)
+            if self.setup is not None:
+                self.setup(templates)
+            self._templates = templates
+        return self._templates
+
+    def precompile(self) -> List[str]:
+        """Compile every template into the environment's cache."""
+        names = self.templates.env.list_templates()
+        for name in names:
+            self.templates.get_template(name)
+        self._mtimes = self._template_mtimes()
+        return names
+
+    def render(
+        self, request: Request, name: str, context: Dict[str, Any]
+    ) -> RenderedPage:
+        """Return the rendered page, from the cache when possible."""
+        if self.debug:
+            self._check_templates()
+
+        digest = hashlib.sha1(
+            json.dumps(context, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        key = (name, digest, str(request.base_url))
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+        self.misses += 1
+        template = self.templates.get_template(name)
+        body = template.render({**context, "request": request}).encode()
+        etag = f'"p{hashlib.sha1(body).hexdigest()[:20]}"'
+        page = RenderedPage(body, etag, [
+            (b"content-length", str(len(body)).encode()),
+            (b"content-type", b"text/html; charset=utf-8"),
+            (b"etag", etag.encode()),
+        ])
+        self._pages[key] = page
+        if len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+        return page
+
+    def response(
+        self,
+        request: Request,
+        name: str,
+        context: Dict[str, Any],
+        status_code: int = 200,
+    ) -> Response:
+        """Serve a page, or 304 Not Modified if the client has it."""
+        page = self.render(request, name, context)
+        if status_code == 200 and if_none_match(
+            request.headers.get("if-none-match"), page.etag
+        ):
+            return Response(status_code=304, headers={"ETag": page.etag})
+        return PageResponse(page, status_code=status_code)
+
+    def clear(self) -> None:
+        """Drop every rendered page."""
+        self._pages.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return page cache counters."""
+        return {"entries": len(self._pages), "hits": self.hits, "misses": self.misses}
+
+    def _check_templates(self) -> None:
+        """Drop rendered pages and compiled templates if a file changed."""
+        mtimes = self._template_mtimes()
+        if mtimes != self._mtimes:
+            self._mtimes = mtimes
+            self.clear()
+            if self.templates.env.cache is not None:
+                self.templates.env.cache.clear()
+
+    def _template_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                mtimes[path] = os.stat(path).st_mtime
+        return mtimes
@@ -0,0 +1,266 @@
+"""
+Request Profiling
+
+This module contains ``ProfilingMiddleware``, which runs a single request
+under ``cProfile`` when an admin asks for it, and ``StackSampler``, which
+samples the event loop's stack at a low rate and aggregates the stacks
+into a collapsed-stack file for flame graphs.
+
+A request is profiled when it carries ``X-Profile: 1`` or ``?profile=1``
+and a valid bearer token of a user whose ID is listed in
+``PROFILING_ADMIN_IDS``; from anyone else the flag is ignored. Admins are
+matched by ID because usernames can change hands: anyone may register a
+free username, and tokens keep the name their user had when they were
+issued. The response is replaced by the profile,
+sorted by cumulative time, with the status the route returned in
+``X-Profiled-Status``. With a ``PROFILE_DIR`` the raw profile is also
+saved there, for ``pstats`` or snakeviz, and named in ``X-Profile-File``.
+``cProfile`` sees everything the event loop runs while the request is in
+flight, so concurrent requests show up in its profile too; on a quiet
+instance it is the request's own.
+
+Neither is installed unless configured, so when disabled they cost
+nothing. The sampler wakes every ``interval`` seconds from a thread of
+its own; at 100 samples a second (``PROFILE_SAMPLE_INTERVAL=0.01``) it
+adds well under one percent.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from app.core.tokens import InvalidTokenError, TokenManager
+
+logger = logging.getLogger(__name__)
+
+_FLAG_VALUES = {"1", "true", "yes"}
+# Innermost modules of an event loop waiting for I/O (uvloop waits in C)
+_IDLE_MODULES = frozenset({"selectors", "asyncio.base_events", "asyncio.runners"})
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests flagged by an admin."""
+
+    def __init__(
+        self,
+        app: Callable,
+        tokens: TokenManager,
+        admin_ids: Iterable[int],
+        directory: Optional[str] = None,
+        top: int = 40,
+    ):
+        self.app = app
+        self.tokens = tokens
+        self.admin_ids = frozenset(admin_ids)
+        self.directory = directory
+        # Functions listed in the returned report
+        self.top = top
+        # Only one profiler can be active on the event loop's thread
+        self._active = False
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            scope["type"] != "http"
+            or not _flagged(scope)
+            or not self._is_admin(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            await self.app(scope, receive, _with_header(send, b"x-profile", b"busy"))
+            return
+
+        status = [0]
+
+        async def capture(message) -> None:
+            # The route's response is discarded; the profile replaces it
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+        self._active = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.disable()
+            self._active = False
+        elapsed = time.perf_counter() - start
+
+        headers = [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"cache-control", b"no-store"),
+            (b"x-profiled-status", str(status[0]).encode()),
+        ]
+        if self.directory:
+            name = self._save(profiler, scope)
+            headers.append((b"x-profile-file", name.encode()))
+        body = self._report(profiler, scope, status[0], elapsed).encode()
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _is_admin(self, scope) -> bool:
+        """Whether the request carries a valid token of a profiling admin."""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() != "bearer" or not token:
+                    return False
+                try:
+                    return self.tokens.verify(token).user_id in self.admin_ids
+                except InvalidTokenError:
+                    return False
+        return False
+
+    def _report(self, profiler: cProfile.Profile, scope, status: int, elapsed: float) -> str:
+        stream = io.StringIO()
+        stream.write(
+            f"{scope['method']} {scope['path']} -> {status} "
+            f"in {elapsed * 1000:.1f}ms\n"
+        )
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        return stream.getvalue()
+
+    def _save(self, profiler: cProfile.Profile, scope) -> str:
+        """Write the raw profile to the profile directory; return its name."""
+        path = _UNSAFE.sub("_", scope["path"].strip("/")) or "root"
+        name = f"{int(time.time() * 1000)}-{scope['method']}-{path}.pstats"
+        os.makedirs(self.directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.directory, name))
+        return name
+
+
+def _flagged(scope) -> bool:
+    """Whether a request asks to be profiled, by header or query flag."""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1").strip().lower() in _FLAG_VALUES
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        for name, value in parse_qsl(query.decode("latin-1")):
+            if name == "profile":
+                return value.lower() in _FLAG_VALUES
+    return False
+
+
+def _with_header(send: Callable, name: bytes, value: bytes) -> Callable:
+    async def send_with_header(message) -> None:
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message["headers"], (name, value)]}
+        await send(message)
+    return send_with_header
+
+
+def _frame_name(frame: Any) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    # co_qualname is new in Python 3.11
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse_stack(frame: Any, max_depth: int = 128) -> Tuple[str, ...]:
+    """Return a frame's stack as names from the outermost call inwards."""
+    names: List[str] = []
+    while frame is not None and len(names) < max_depth:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return tuple(names)
+
+
+class StackSampler:
+    """Sample one thread's stack periodically into collapsed-stack counts.
+
+    Samples taken while the thread is an event loop waiting for I/O are
+    counted as idle but not kept, so the file shows where busy time goes.
+    The counts are rewritten to ``path`` every ``flush_interval`` seconds
+    and when stopped, one ``frame;frame;frame count`` line per stack, the
+    input of ``flamegraph.pl`` and speedscope. Counts add up over the
+    sampler's lifetime.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        path: str,
+        flush_interval: float = 60.0,
+        max_depth: int = 128,
+    ):
+        self.interval = interval
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_depth = max_depth
+        self.counts: "Counter[Tuple[str, ...]]" = Counter()
+        self.samples = 0
+        self.idle = 0
+        self._target: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, thread_id: Optional[int] = None) -> None:
+        """Start sampling a thread, by default the calling one."""
+        self._target = thread_id if thread_id is not None else threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and write the counts."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+
+    def sample(self) -> None:
+        """Take one sample of the target thread."""
+        frame = sys._current_frames().get(self._target)
+        if frame is None:
+            return
+        self.samples += 1
+        if frame.f_globals.get("__name__") in _IDLE_MODULES:
+            self.idle += 1
+            return
+        self.counts[collapse_stack(frame, self.max_depth)] += 1
+
+    def write(self) -> None:
+        """Replace the collapsed-stack file with the current counts."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            for stack, count in self.counts.most_common():
+                file.write(f"{';'.join(stack)} {count}\n")
+        os.replace(temporary, self.path)
+
+    def stats(self) -> Dict[str, int]:
+        """Return samples taken, idle samples and distinct busy stacks."""
+        return {"samples": self.samples, "idle": self.idle, "stacks": len(self.counts)}
+
+    def _run(self) -> None:
+        flushed = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.monotonic() - flushed >= self.flush_interval:
+                flushed = time.monotonic()
+                try:
+                    self.write()
+                except OSError as error:
+                    logger.warning(f"Could not write {self.path}: {error}")
@@ -0,0 +1,434 @@
+"""
+Rate Limiting
+
+This module contains ``KeyedRateLimiter``, a token bucket per key held in a
+bounded LRU map, and ``RateLimitMiddleware``, which applies per-client,
+per-route quotas to every HTTP request.
+
+Each key may burst up to ``capacity`` attempts, then earns them back at a
+steady rate over ``period`` seconds. Buckets that have refilled completely
+carry no state worth keeping, so the least recently used ones are simply
+dropped when the map is full; memory stays bounded however many keys
+(usernames, client addresses) are seen.
+
+The middleware keeps its counters in a ``RateLimitBackend``.
+``MemoryRateLimitBackend`` holds them in the worker process; a backend
+shared by every worker (for example Redis, running the same arithmetic in
+a script) makes a quota hold across workers rather than per worker.
+"""
+
+import json
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import (
+    Any, Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple,
+)
+
+from starlette.routing import Match
+
+from app.core.metrics import HTTP_RATE_LIMITED
+from app.core.tokens import InvalidTokenError, TokenManager
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a key has used up its attempts."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class KeyedRateLimiter:
+    """Token bucket rate limiter with one bucket per key."""
+
+    def __init__(
+        self,
+        capacity: int,
+        period: float,
+        max_keys: int = 100000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if capacity < 1 or period <= 0:
+            raise ValueError("capacity must be at least 1 and period positive")
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> (tokens, time of last refill)
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: Hashable) -> float:
+        """Take one attempt for ``key``.
+
+        Returns 0 if allowed, otherwise the seconds until the next attempt
+        is available (no attempt is taken).
+        """
+        now = self._clock()
+        tokens, last = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            return (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def check(self, key: Hashable) -> None:
+        """Take one attempt for ``key``, raising RateLimitExceeded if none is left."""
+        retry_after = self.acquire(key)
+        if retry_after:
+            raise RateLimitExceeded(retry_after)
+
+    def reset(self, key: Hashable) -> None:
+        """Forget a key's bucket, restoring its full capacity."""
+        self._buckets.pop(key, None)
+
+
+ALGORITHMS = ("token_bucket", "sliding_window")
+
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*\.?\d*)\s*([a-z]*)\s*$")
+_UNITS = {
+    "": 1, "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400,
+}
+
+
+class RateLimitRule(NamedTuple):
+    """A quota of ``limit`` requests per ``period`` seconds."""
+
+    limit: int
+    period: float
+    algorithm: str = "token_bucket"
+
+    @property
+    def policy(self) -> str:
+        """Describe the quota as a RateLimit-Policy header value."""
+        return f"{self.limit};w={math.ceil(self.period)}"
+
+
+class RateLimitDecision(NamedTuple):
+    """The outcome of counting one request against a rule."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the quota is fully available again
+    reset: float
+    # Seconds until a request would be allowed; 0 when allowed
+    retry_after: float
+
+
+def parse_rate(value: str, algorithm: str = "token_bucket") -> RateLimitRule:
+    """Parse a quota such as ``"100/60"``, ``"100/60s"`` or ``"5/minute"``."""
+    if algorithm not in ALGORITHMS:
+        choices = " or ".join(ALGORITHMS)
+        raise ValueError(f"Unknown rate limit algorithm {algorithm!r}; use {choices}")
+    match = _RATE.match(value.lower())
+    unit = match.group(3) if match else ""
+    if unit not in _UNITS and unit.endswith("s"):
+        unit = unit[:-1]
+    if not match or unit not in _UNITS:
+        raise ValueError(f"Invalid rate limit {value!r}; expected e.g. '100/60s'")
+    limit = int(match.group(1))
+    period = float(match.group(2) or 1) * _UNITS[unit]
+    if limit < 1 or period <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}; both parts must be positive")
+    return RateLimitRule(limit, period, algorithm)
+
+
+class RateLimitBackend(ABC):
+    """Interface for the counters behind ``RateLimitMiddleware``."""
+
+    @abstractmethod
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitDecision:
+        """Count one request for ``key`` under ``rule`` if the quota allows it."""
+
+    def stats(self) -> Dict[str, int]:
+        """Return backend counters."""
+        return {}
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process rate limit counters with bounded memory.
+
+    Every key holds a fixed-size state whichever algorithm it uses:
+
+    - ``token_bucket``: tokens left and the time they were counted. Bursts
+      of up to ``limit`` requests are allowed, then ``limit`` per ``period``.
+    - ``sliding_window``: request counts for the current and previous fixed
+      windows. The previous count is weighted by how much of it still
+      overlaps the sliding window, which approximates a log of every
+      request without storing one.
+
+    Keys are kept in least recently used order. A key idle long enough to
+    have its whole quota back (one period for a token bucket, two for a
+    sliding window) says nothing a fresh key would not, so each hit drops a
+    couple of such idle keys from the old end; the map is also capped at
+    ``max_keys``.
+    """
+
+    def __init__(
+        self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_keys = max_keys
+        self._clock = clock
+        # key -> [last request time, seconds until idle, state a, state b]
+        self._state: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    async def hit(self, key: str, rule: RateLimitRule) -> RateLimitDecision:
+        """Count one request for ``key`` under ``rule`` if the quota allows it."""
+        now = self._clock()
+        self._evict_idle(now)
+        state = self._state.get(key)
+        if state is None:
+            state = self._state[key] = [now, 0.0, 0.0, 0.0]
+            fresh = True
+            if len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._state.move_to_end(key)
+            fresh = False
+
+        if rule.algorithm == "sliding_window":
+            decision = self._sliding_window(state, rule, now, fresh)
+            state[1] = 2 * rule.period
+        else:
+            decision = self._token_bucket(state, rule, now, fresh)
+            state[1] = rule.period
+        state[0] = now
+        return decision
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of tracked keys and keys evicted."""
+        return {"keys": len(self._state), "evictions": self.evictions}
+
+    def _evict_idle(self, now: float) -> None:
+        """Drop up to two keys with their full quota back from the LRU end."""
+        for _ in range(2):
+            if not self._state:
+                return
+            key, state = next(iter(self._state.items()))
+            if now - state[0] < state[1]:
+                return
+            del self._state[key]
+            self.evictions += 1
+
+    @staticmethod
+    def _token_bucket(
+        state: List[float], rule: RateLimitRule, now: float, fresh: bool
+    ) -> RateLimitDecision:
+        rate = rule.limit / rule.period
+        tokens = rule.limit if fresh else min(
+            rule.limit, state[2] + (now - state[0]) * rate
+        )
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        state[2] = tokens
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=int(tokens),
+            reset=(rule.limit - tokens) / rate,
+            retry_after=0.0 if allowed else (1 - tokens) / rate,
+        )
+
+    @staticmethod
+    def _sliding_window(
+        state: List[float], rule: RateLimitRule, now: float, fresh: bool
+    ) -> RateLimitDecision:
+        period = rule.period
+        window = now // period
+        # state[2]: current window's count, state[3]: previous window's count
+        last_window = window if fresh else state[0] // period
+        if window - last_window >= 2:
+            state[2] = state[3] = 0.0
+        elif window - last_window == 1:
+            state[2], state[3] = 0.0, state[2]
+
+        elapsed = now - window * period
+        weight = 1 - elapsed / period
+        used = state[3] * weight + state[2]
+        allowed = used + 1 <= rule.limit
+        if allowed:
+            state[2] += 1
+            used += 1
+            retry_after = 0.0
+        elif state[2] + 1 <= rule.limit and state[3]:
+            # Wait until enough of the previous window has slid out
+            needed = (rule.limit - 1 - state[2]) / state[3]
+            retry_after = (1 - needed) * period - elapsed
+        else:
+            retry_after = period - elapsed
+        # Full quota once every counted request has slid out of the window
+        if state[2]:
+            reset = 2 * period - elapsed
+        else:
+            reset = period - elapsed if state[3] else 0.0
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=max(0, int(rule.limit - used)),
+            reset=reset,
+            retry_after=max(0.0, retry_after),
+        )
+
+
+def _flatten_routes(routes: List[Any]) -> Iterator[Any]:
+    """Yield routes with their full paths, descending into included routers."""
+    for route in routes:
+        # FastAPI resolves included routers lazily; their effective routes
+        # carry the include prefix in ``path``.
+        contexts = getattr(route, "effective_route_contexts", None)
+        if contexts is not None:
+            yield from contexts()
+        else:
+            yield route
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware enforcing a quota per client and route.
+
+    A request is counted against the bucket for its client and its route
+    template (for example ``/api/users/{user_id}``), under the quota set for
+    that route or else the default. Clients are identified by the user of a
+    valid bearer token when ``tokens`` is given, and otherwise by address;
+    behind a proxy, run uvicorn with ``--proxy-headers`` so the address is
+    the client's.
+
+    Allowed responses carry ``RateLimit-Limit``, ``RateLimit-Remaining``,
+    ``RateLimit-Reset`` and ``RateLimit-Policy``; rejected requests get 429
+    with ``Retry-After`` without reaching the application.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        router: Any,
+        backend: RateLimitBackend,
+        default: Optional[RateLimitRule],
+        routes: Optional[Dict[str, RateLimitRule]] = None,
+        exempt_paths: Tuple[str, ...] = (),
+        tokens: Optional[TokenManager] = None,
+    ):
+        self.app = app
+        self.router = router
+        self.backend = backend
+        self.default = default
+        # "METHOD /template" or "/template" -> rule
+        self.routes = routes or {}
+        self.exempt_paths = tuple(exempt_paths)
+        self.tokens = tokens
+        # (method, path) -> route template, for paths seen recently
+        self._templates: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        # Every route with its full path, collected on the first request
+        self._routes: Optional[List[Any]] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        template = self._route_template(scope)
+        rule = (
+            self.routes.get(f"{method} {template}")
+            or self.routes.get(template)
+            or self.default
+        )
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{self._client(scope)}|{method} {template}"
+        decision = await self.backend.hit(key, rule)
+        headers = [
+            (b"ratelimit-limit", str(decision.limit).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(decision.reset)).encode()),
+            (b"ratelimit-policy", rule.policy.encode()),
+        ]
+        if not decision.allowed:
+            HTTP_RATE_LIMITED.labels(template).inc()
+            await _reject(send, headers, decision.retry_after)
+            return
+
+        async def send_with_headers(message) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message["headers"], *headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _route_template(self, scope) -> str:
+        """Find the path template of the route a request will be served by."""
+        cache_key = (scope["method"], scope["path"])
+        template = self._templates.get(cache_key)
+        if template is not None:
+            self._templates.move_to_end(cache_key)
+            return template
+
+        if self._routes is None:
+            self._routes = list(_flatten_routes(self.router.routes))
+        template = "unmatched"
+        for route in self._routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = route.path
+                break
+            if match == Match.PARTIAL and template == "unmatched":
+                template = route.path
+        self._templates[cache_key] = template
+        if len(self._templates) > 4096:
+            self._templates.popitem(last=False)
+        return template
+
+    def _client(self, scope) -> str:
+        """Identify the client: its token's user, or else its address."""
+        if self.tokens is not None:
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.decode("latin-1").partition(" ")
+                    if scheme.lower() == "bearer" and token:
+                        try:
+                            return f"user:{self.tokens.verify(token).user_id}"
+                        except InvalidTokenError:
+                            pass
+                    break
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+async def _reject(
+    send: Callable, headers: List[Tuple[bytes, bytes]], retry_after: float
+) -> None:
+    """Send a 429 response with Retry-After and the rate limit headers."""
+    body = json.dumps({"detail": "Rate limit exceeded"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
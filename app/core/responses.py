@@ -0,0 +1,31 @@
+"""
+Response Classes
+
+This module contains response classes for the high-throughput JSON path.
+
+Handlers that return a FastAPI ``response_model`` get their return value
+validated against the model again and then encoded through
+``jsonable_encoder``. Models built by the service layer are already valid,
+so routes return ``PydanticJSONResponse`` instead: the content goes straight
+to pydantic-core's Rust serializer, and ``response_model`` is only used for
+the OpenAPI schema.
+"""
+
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+from app.core.timing import span
+
+
+class PydanticJSONResponse(JSONResponse):
+    """JSON response serialized directly by pydantic-core.
+
+    Accepts pydantic models, lists and dicts of models, and any value
+    pydantic-core can serialize (datetimes, UUIDs, ...).
+    """
+
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return pydantic_core.to_json(content)
@@ -0,0 +1,181 @@
+"""
+Password Hashing
+
+This module contains scrypt password hashing and ``PasswordHasher``, which
+runs it on a worker pool.
+
+Hashing is deliberately slow (tens of milliseconds of CPU and 16 MB of
+memory per call with the default cost), so it never runs on the event
+loop. ``hashlib.scrypt`` releases the GIL, so a thread pool hashes in
+parallel; a process pool isolates the work further at the price of
+pickling each call. Admission is bounded: once every worker is busy and
+the queue is full, new logins are rejected with ``PasswordHasherBusyError``
+instead of waiting, so a login burst cannot build an unbounded backlog.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Deque, List, Optional
+
+from app.core.metrics import PASSWORD_HASH_PENDING, PASSWORD_HASH_REJECTED
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def hash_password(password: str, n: int = 2 ** 14, salt: Optional[bytes] = None) -> str:
+    """Hash a password with scrypt.
+
+    Returns ``scrypt$<n>$<r>$<p>$<salt>$<key>`` so the cost parameters can
+    change without invalidating existing hashes.
+    """
+    salt = salt if salt is not None else os.urandom(SALT_BYTES)
+    key = hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=SCRYPT_R, p=SCRYPT_P,
+        maxmem=2 * 128 * SCRYPT_R * n, dklen=KEY_BYTES,
+    )
+    return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check a password against a hash from ``hash_password``."""
+    try:
+        scheme, n, r, p, salt, key = encoded.split("$")
+        n, r, p = int(n), int(r), int(p)
+        expected = _b64decode(key)
+        salt_bytes = _b64decode(salt)
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    actual = hashlib.scrypt(
+        password.encode(), salt=salt_bytes, n=n, r=r, p=p,
+        maxmem=2 * 128 * r * n, dklen=len(expected),
+    )
+    return hmac.compare_digest(actual, expected)
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when the hashing queue is full."""
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Password hashing is at capacity")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded worker pool."""
+
+    def __init__(
+        self,
+        executor: str = "thread",
+        workers: int = 2,
+        queue_size: int = 64,
+        cost: int = 2 ** 14,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+        self.executor_type = executor
+        self.workers = workers
+        self.cost = cost
+        # Calls running plus calls waiting for a worker
+        self.capacity = workers + queue_size
+        self._pending = 0
+        # Futures of hash_many calls waiting for a call to finish
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._executor: Optional[Executor] = None
+        self._dummy_hash: Optional[str] = None
+
+    @property
+    def pending(self) -> int:
+        """Return the number of calls running or queued."""
+        return self._pending
+
+    async def hash(self, password: str) -> str:
+        """Hash a password, raising PasswordHasherBusyError if at capacity."""
+        return await self._run(hash_password, password, self.cost)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash several passwords, waiting for capacity instead of failing.
+
+        At most ``workers`` of them are queued at a time, so a batch leaves
+        room in the queue for concurrent logins. When the queue is full
+        anyway, each waits to be woken by a call that finishes.
+        """
+        slots = asyncio.Semaphore(self.workers)
+
+        async def hash_one(password: str) -> str:
+            async with slots:
+                while self._pending >= self.capacity:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self._waiters.append(waiter)
+                    try:
+                        await waiter
+                    except asyncio.CancelledError:
+                        # Pass on a wakeup this call can no longer use
+                        if waiter.done() and not waiter.cancelled():
+                            self._wake_one()
+                        raise
+                return await self.hash(password)
+
+        return list(await asyncio.gather(*(hash_one(p) for p in passwords)))
+
+    async def verify(self, password: str, encoded: Optional[str]) -> bool:
+        """Verify a password, raising PasswordHasherBusyError if at capacity.
+
+        Without a stored hash, a dummy hash is verified instead so unknown
+        usernames take as long to reject as wrong passwords.
+        """
+        if encoded is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self._run(hash_password, "", self.cost)
+            await self._run(verify_password, password, self._dummy_hash)
+            return False
+        return await self._run(verify_password, password, encoded)
+
+    def shutdown(self) -> None:
+        """Stop the worker pool; it is recreated on the next call."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func: Callable, *args) -> object:
+        if self._pending >= self.capacity:
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusyError()
+        if self._executor is None:
+            pool = ThreadPoolExecutor if self.executor_type == "thread" else ProcessPoolExecutor
+            self._executor = pool(max_workers=self.workers)
+
+        self._pending += 1
+        PASSWORD_HASH_PENDING.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_PENDING.dec()
+            self._wake_one()
+
+    def _wake_one(self) -> None:
+        """Wake the longest waiting hash_many call, skipping cancelled ones."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
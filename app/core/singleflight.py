@@ -0,0 +1,88 @@
+"""
+Single-Flight Calls
+
+This module contains ``SingleFlight``, which runs concurrent identical
+calls once and gives every caller the same result.
+
+The first caller for a key starts the call as a task; callers arriving
+while it runs wait for that task instead of starting their own. The task
+is not owned by any caller: each waits on it through ``asyncio.shield``,
+so a caller that is cancelled (for example because its client went away)
+stops waiting without cancelling the call for the others. Only when every
+caller has given up is the call cancelled.
+
+Keys are tuples whose first item names the kind of call; counts of calls
+and of calls that joined one already running are kept per kind.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """A running call and the number of callers waiting for it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with equal keys into one."""
+
+    def __init__(self):
+        self._flights: Dict[Tuple[Hashable, ...], _Flight] = {}
+        # kind -> [calls, calls that joined a running one]
+        self._counts: Dict[Hashable, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(
+        self, key: Tuple[Hashable, ...], call: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Return the result of ``call``, shared with concurrent callers of ``key``."""
+        counts = self._counts.setdefault(key[0], [0, 0])
+        counts[0] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._discard(key, flight))
+        else:
+            counts[1] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller was cancelled; nobody wants the result.
+                self._discard(key, flight)
+                flight.task.cancel()
+
+    def forget(self) -> None:
+        """Detach running calls, so later callers start new ones.
+
+        Callers already waiting still get their call's result. Call this
+        after a write, so no read that starts afterwards is served a result
+        loaded before it.
+        """
+        self._flights.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return running calls and, per kind, calls made and calls coalesced."""
+        return {
+            "in_flight": len(self._flights),
+            "calls": {kind: counts[0] for kind, counts in self._counts.items()},
+            "coalesced": {kind: counts[1] for kind, counts in self._counts.items()},
+        }
+
+    def _discard(self, key: Tuple[Hashable, ...], flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,68 @@
+"""
+Startup Profiling
+
+This module contains ``StartupProfile``, which times the steps of the
+application lifespan, and ``process_age``, which measures how long ago the
+process was started.
+
+Together they answer how long a fresh worker takes to become ready: the
+process age when the lifespan finishes covers interpreter start, imports
+and every startup step. It is logged when ``STARTUP_PROFILE`` is enabled
+and always exported as the ``app_startup_seconds`` metric. For a per-module
+import breakdown, run ``python -m benchmarks.bench_startup``.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """Return seconds since this process started, or None if unknown.
+
+    Reads ``/proc``, so it is only available on Linux.
+    """
+    try:
+        with open("/proc/self/stat") as file:
+            # Fields after the parenthesized command name; starttime is 22nd
+            fields = file.read().rpartition(")")[2].split()
+        with open("/proc/uptime") as file:
+            uptime = float(file.read().split()[0])
+    except OSError:
+        return None
+    started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    return max(0.0, uptime - started)
+
+
+class StartupProfile:
+    """Durations of named startup steps."""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.steps: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def report(self, ready_after: Optional[float]) -> str:
+        """Format the steps and the total time to readiness."""
+        rows = list(self.steps)
+        if ready_after is not None:
+            rows.append(("ready after process start", ready_after))
+        lines = [f"  {name:<26} {seconds * 1000:8.1f} ms" for name, seconds in rows]
+        return "Startup profile:\n" + "\n".join(lines)
+
+    def log(self, ready_after: Optional[float]) -> None:
+        """Log the report if profiling is enabled."""
+        if self.enabled:
+            logger.info(self.report(ready_after))
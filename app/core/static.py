@@ -0,0 +1,343 @@
+"""
+Static Assets
+
+This module contains ``StaticAssets``, the ASGI app serving ``/static``.
+
+At startup, or on first use, it walks the static directory once and builds
+a manifest with every file's size, mtime, content hash and content type.
+``load`` builds it in a worker thread, so compression never blocks the
+event loop; concurrent first requests share one build. Files up to
+``memory_limit`` bytes are held in memory together with gzip (and, when the
+optional ``brotli`` package is installed, brotli) variants compressed once
+at build time; larger files are streamed from disk with ``FileResponse``,
+which uses zero-copy ``pathsend`` on servers that support it, and pick up
+``.gz``/``.br`` siblings pre-built next to them. Requests are answered from
+the manifest alone: lookup, Accept-Encoding negotiation and
+If-None-Match / If-Modified-Since checks never touch the disk.
+
+Every asset is also reachable under a hashed URL such as
+``css/main.3f2a9c1d0b4e.css``. Those URLs change whenever the content does,
+so they are served with an immutable one-year Cache-Control; the plain URLs
+must be revalidated. Templates get hashed URLs through ``static_url``. With
+``reload`` (debug mode) files are re-checked on every request in a worker
+thread, and only a file that changed is reloaded; new files are picked up
+on first request and templates keep the plain URLs, so edits show up
+without a restart.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastapi.responses import FileResponse, Response
+from starlette.exceptions import HTTPException
+
+from app.core.compression import accepted_encodings
+from app.core.conditional import if_none_match
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Compressing these gains little or nothing
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "font/woff", "application/zip")
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+SIBLING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class Variant(NamedTuple):
+    """One encoding of an asset, held in memory or on disk."""
+
+    encoding: str
+    etag: str
+    size: int
+    body: Optional[bytes] = None
+    path: Optional[str] = None
+
+
+class Asset(NamedTuple):
+    """Manifest entry for one static file."""
+
+    path: str
+    hashed_path: str
+    full_path: str
+    size: int
+    mtime: float
+    digest: str
+    content_type: str
+    last_modified: str
+    stat: os.stat_result
+    variants: Dict[str, Variant]
+
+
+def _hashed_name(path: str, digest: str) -> str:
+    """Insert the content hash before the extension: a/b.css -> a/b.<hash>.css."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def _route_path(scope: Dict[str, Any]) -> str:
+    """Return the request path below the mount point."""
+    path, root_path = scope["path"], scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    return path.lstrip("/")
+
+
+class StaticAssets:
+    """ASGI app serving static files from an in-memory manifest."""
+
+    def __init__(
+        self,
+        directory: str,
+        memory_limit: int = 256 * 1024,
+        min_compress_size: int = 256,
+        reload: bool = False,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.memory_limit = memory_limit
+        self.min_compress_size = min_compress_size
+        self.reload = reload
+        self._assets: Optional[Dict[str, Asset]] = None
+        self._hashed: Dict[str, Asset] = {}
+        self._building: Optional[asyncio.Future] = None
+
+    def build(self) -> Dict[str, Asset]:
+        """Scan the directory and (re)build the manifest."""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if filename.endswith(tuple(SIBLING_SUFFIXES.values())):
+                    continue
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                assets[path] = self._load(path, full_path)
+        self._assets = assets
+        self._hashed = {asset.hashed_path: asset for asset in assets.values()}
+        return assets
+
+    async def load(self) -> Dict[str, Asset]:
+        """Return the manifest, building it in a worker thread on first use."""
+        if self._assets is None:
+            if self._building is None:
+                self._building = asyncio.ensure_future(asyncio.to_thread(self.build))
+            building = self._building
+            try:
+                # Shielded: a cancelled request must not cancel a shared build
+                await asyncio.shield(building)
+            finally:
+                if building.done():
+                    self._building = None
+        return self._assets
+
+    @property
+    def manifest(self) -> Dict[str, Asset]:
+        """Return the manifest, building it on first use; prefer ``load``."""
+        if self._assets is None:
+            self.build()
+        return self._assets
+
+    def url_path(self, path: str) -> str:
+        """Return the path to link an asset by: hashed unless reloading."""
+        path = path.lstrip("/")
+        asset = self.manifest.get(path)
+        if asset is None or self.reload:
+            return path
+        return asset.hashed_path
+
+    def install(self, templates: Any, mount_name: str = "static") -> None:
+        """Add ``static_url(path)`` to a Jinja2Templates environment."""
+        from jinja2 import pass_context
+
+        @pass_context
+        def static_url(context: Dict[str, Any], path: str) -> str:
+            request = context["request"]
+            return str(request.url_for(mount_name, path="/" + self.url_path(path)))
+
+        templates.env.globals["static_url"] = static_url
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.load()
+        if self.reload:
+            # Checks and reloads changed files on disk
+            response = await asyncio.to_thread(self._respond, scope)
+        else:
+            response = self._respond(scope)
+        await response(scope, receive, send)
+
+    def _respond(self, scope: Dict[str, Any]) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405, headers={"Allow": "GET, HEAD"})
+
+        path = _route_path(scope)
+        hashed = False
+        asset = self.manifest.get(path)
+        if asset is None:
+            asset = self._hashed.get(path)
+            hashed = asset is not None
+        if self.reload:
+            asset = self._refresh(asset) if asset is not None else self._discover(path)
+            # A hashed URL of content that since changed is no longer immutable
+            hashed = hashed and asset is not None and asset.hashed_path == path
+        if asset is None:
+            # Raised like StaticFiles does, so the app's 404 handler applies
+            raise HTTPException(status_code=404)
+
+        headers = dict(scope["headers"])
+        variant = self._negotiate(asset, headers.get(b"accept-encoding"))
+        response_headers = {
+            "Cache-Control": IMMUTABLE if hashed else REVALIDATE,
+            "ETag": variant.etag,
+            "Last-Modified": asset.last_modified,
+        }
+        if len(asset.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+        if variant.encoding != "identity":
+            response_headers["Content-Encoding"] = variant.encoding
+
+        if self._not_modified(asset, variant, headers):
+            return Response(status_code=304, headers=response_headers)
+        if variant.body is not None:
+            # The server drops the body of HEAD responses
+            return Response(
+                variant.body, media_type=asset.content_type, headers=response_headers
+            )
+        stat_result = asset.stat if variant.path == asset.full_path else None
+        return FileResponse(
+            variant.path,
+            media_type=asset.content_type,
+            headers=response_headers,
+            stat_result=stat_result,
+        )
+
+    @staticmethod
+    def _negotiate(asset: Asset, accept_encoding: Optional[bytes]) -> Variant:
+        if len(asset.variants) > 1 and accept_encoding:
+            accepted = accepted_encodings(accept_encoding.decode("latin-1"))
+            for encoding in ENCODINGS:
+                if encoding in asset.variants and encoding in accepted:
+                    return asset.variants[encoding]
+        return asset.variants["identity"]
+
+    @staticmethod
+    def _not_modified(
+        asset: Asset, variant: Variant, headers: Dict[bytes, bytes]
+    ) -> bool:
+        etags = headers.get(b"if-none-match")
+        if etags is not None:
+            return if_none_match(etags.decode("latin-1"), variant.etag)
+        since = headers.get(b"if-modified-since")
+        if since is None:
+            return False
+        try:
+            return int(asset.mtime) <= parsedate_to_datetime(
+                since.decode("latin-1")
+            ).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def _refresh(self, asset: Asset) -> Optional[Asset]:
+        """Reload an asset whose file changed (reload mode only)."""
+        try:
+            stat_result = os.stat(asset.full_path)
+        except FileNotFoundError:
+            self._forget(asset)
+            return None
+        if (stat_result.st_mtime, stat_result.st_size) == (asset.mtime, asset.size):
+            return asset
+        self._forget(asset)
+        fresh = self.manifest[asset.path] = self._load(asset.path, asset.full_path)
+        self._hashed[fresh.hashed_path] = fresh
+        return fresh
+
+    def _forget(self, asset: Asset) -> None:
+        self.manifest.pop(asset.path, None)
+        self._hashed.pop(asset.hashed_path, None)
+
+    def _discover(self, path: str) -> Optional[Asset]:
+        """Add a file created since the manifest was built (reload mode only)."""
+        full_path = os.path.normpath(os.path.join(self.directory, path))
+        if (
+            not full_path.startswith(self.directory + os.sep)
+            or full_path.endswith(tuple(SIBLING_SUFFIXES.values()))
+            or not os.path.isfile(full_path)
+        ):
+            return None
+        path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        asset = self.manifest[path] = self._load(path, full_path)
+        self._hashed[asset.hashed_path] = asset
+        return asset
+
+    def _load(self, path: str, full_path: str) -> Asset:
+        """Build the manifest entry for one file."""
+        stat_result = os.stat(full_path)
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in (
+            "application/javascript", "application/json", "image/svg+xml"
+        ):
+            content_type += "; charset=utf-8"
+
+        sha = hashlib.sha256()
+        in_memory = stat_result.st_size <= self.memory_limit
+        with open(full_path, "rb") as file:
+            body = file.read() if in_memory else None
+            if body is not None:
+                sha.update(body)
+            else:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    sha.update(block)
+        digest = sha.hexdigest()[:12]
+
+        variants = {"identity": Variant(
+            "identity", f'"{digest}"', stat_result.st_size, body,
+            None if in_memory else full_path,
+        )}
+        compressible = stat_result.st_size >= self.min_compress_size and not (
+            content_type.startswith(INCOMPRESSIBLE_TYPES)
+        )
+        if compressible:
+            for encoding in ENCODINGS:
+                variant = self._compressed(encoding, digest, full_path, body)
+                if variant is not None and variant.size < stat_result.st_size:
+                    variants[encoding] = variant
+
+        return Asset(
+            path=path,
+            hashed_path=_hashed_name(path, digest),
+            full_path=full_path,
+            size=stat_result.st_size,
+            mtime=stat_result.st_mtime,
+            digest=digest,
+            content_type=content_type,
+            last_modified=formatdate(stat_result.st_mtime, usegmt=True),
+            stat=stat_result,
+            variants=variants,
+        )
+
+    @staticmethod
+    def _compressed(
+        encoding: str, digest: str, full_path: str, body: Optional[bytes]
+    ) -> Optional[Variant]:
+        """Compress an in-memory body, or find a pre-built sibling on disk."""
+        etag = f'"{digest}-{encoding}"'
+        if body is None:
+            sibling = full_path + SIBLING_SUFFIXES[encoding]
+            if not os.path.isfile(sibling):
+                return None
+            return Variant(encoding, etag, os.path.getsize(sibling), path=sibling)
+        if encoding == "gzip":
+            # mtime=0 keeps the output, and so the ETag, reproducible
+            data = gzip.compress(body, compresslevel=9, mtime=0)
+        elif brotli is not None:
+            data = brotli.compress(body, quality=11)
+        else:
+            return None
+        return Variant(encoding, etag, len(data), data)
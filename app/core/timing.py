@@ -0,0 +1,257 @@
+"""
+Request Timing
+
+This module contains ``ServerTimingMiddleware``, which breaks every request
+down into phases and sends the breakdown in a ``Server-Timing`` header,
+``TimedRoute``, the route class marking where FastAPI's phases begin and
+end, and ``span``, with which the service layer times its own steps.
+
+A request's time is split into exclusive entries that add up to about
+``total`` (which also covers sending the response and error handlers):
+
+- ``routing``: middleware and route matching, until the route handler runs.
+- ``body``: receiving the request body (form bodies are left to ``deps``).
+- ``deps``: resolving the endpoint's dependencies, including FastAPI's
+  per-request setup and parsing the body.
+- ``validate``: validating path, query, header and body parameters.
+- ``handler``: the endpoint itself, less any ``span`` inside it.
+- ``serialize``: turning the endpoint's result into the response body.
+- one entry per ``span`` name, such as ``cache``, ``store``, ``build`` and
+  ``hash`` in ``UserService``.
+
+Routes cost one extra (empty) dependency each, about 15µs, and nothing
+when ``SERVER_TIMING_ENABLED`` is off.
+
+The header is sent with the response start, so a streamed body is not in
+it; the timing record, logged once the response is sent, includes it.
+Spans are timed on the assumption that a request runs them one after
+another, not concurrently; when disabled, ``span`` only reads a context
+variable.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import (
+    Parameter, isasyncgenfunction, iscoroutinefunction, isgeneratorfunction, signature,
+)
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi import Depends, params
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+from app.core.metrics import _route_template
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["RequestTiming"]] = ContextVar(
+    "request_timing", default=None
+)
+
+
+class RequestTiming:
+    """The phases and spans of one request, in seconds by name."""
+
+    __slots__ = ("start", "entries", "phase", "_lap", "_nested")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.entries: Dict[str, float] = {}
+        # The phase running since the last lap
+        self.phase: Optional[str] = "routing"
+        self._lap = self.start
+        # Time spent in spans since the last lap or inside the running span
+        self._nested = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add time to an entry."""
+        self.entries[name] = self.entries.get(name, 0.0) + seconds
+
+    def lap(self, next_phase: Optional[str] = None) -> None:
+        """End the running phase, less the spans inside it, and start another."""
+        now = time.perf_counter()
+        if self.phase is not None:
+            self.add(self.phase, now - self._lap - self._nested)
+        self.phase = next_phase
+        self._lap = now
+        self._nested = 0.0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """Format the entries and the time so far as a Server-Timing value."""
+        metrics = [
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.entries.items()
+        ]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Return the timing of the request being served, if any."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the enclosed block as ``name`` in the current request's timing.
+
+    Outside a timed request this does nothing. Time in nested spans is
+    counted only in the innermost one.
+    """
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    outer = timing._nested
+    timing._nested = 0.0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timing.add(name, elapsed - timing._nested)
+        timing._nested = outer + elapsed
+
+
+def _lap(next_phase: str) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.lap(next_phase)
+
+
+async def _dependencies_solved() -> None:
+    _lap("validate")
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint to lap around its call and its dependencies.
+
+    The wrapper's signature gains a last, parameterless dependency marking
+    the end of dependency resolution; FastAPI validates the endpoint's own
+    parameters after solving every dependency.
+    """
+    if isgeneratorfunction(endpoint) or isasyncgenfunction(endpoint):
+        return endpoint
+    original = signature(endpoint)
+    # FastAPI passes arguments by keyword, so every parameter can become
+    # keyword-only and the marker can follow those with no default.
+    parameters = [
+        *(p.replace(kind=Parameter.KEYWORD_ONLY) for p in original.parameters.values()),
+        Parameter(
+            "_solved", Parameter.KEYWORD_ONLY, default=Depends(_dependencies_solved)
+        ),
+    ]
+
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed_endpoint(*, _solved=None, **kwargs):
+            _lap("handler")
+            result = await endpoint(**kwargs)
+            _lap("serialize")
+            return result
+    else:
+        @wraps(endpoint)
+        def timed_endpoint(*, _solved=None, **kwargs):
+            _lap("handler")
+            result = endpoint(**kwargs)
+            _lap("serialize")
+            return result
+
+    timed_endpoint.__signature__ = original.replace(parameters=parameters)
+    return timed_endpoint
+
+
+class TimedRoute(APIRoute):
+    """API route that records its request's phases in the request timing."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        if settings.server_timing_enabled:
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        # Starlette keeps the body once read, so FastAPI reuses it. Forms are
+        # parsed from the stream, spooling files to disk; leave them be.
+        reads_body = self.body_field is not None and not isinstance(
+            self.body_field.field_info, params.Form
+        )
+
+        async def timed_handler(request):
+            timing = _current.get()
+            if timing is None:
+                return await handler(request)
+            if reads_body:
+                timing.lap("body")
+                try:
+                    await request.body()
+                except Exception:
+                    pass  # FastAPI reads it again and reports the error
+            timing.lap("deps")
+            try:
+                return await handler(request)
+            finally:
+                # Ends "serialize", or the phase an exception was raised in
+                timing.lap()
+
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware timing requests and sending ``Server-Timing``.
+
+    Requests taking at least ``log_threshold`` seconds are logged as a JSON
+    timing record; ``None`` logs none.
+    """
+
+    def __init__(self, app: Callable, log_threshold: Optional[float] = None):
+        self.app = app
+        self.log_threshold = log_threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        status = [500]
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                timing.lap()
+                header = (b"server-timing", timing.header().encode())
+                message = {**message, "headers": [*message["headers"], header]}
+            await send(message)
+
+        token = _current.set(timing)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            timing.lap()
+            total = timing.elapsed()
+            if self.log_threshold is not None and total >= self.log_threshold:
+                logger.info(json.dumps(timing_record(scope, status[0], timing, total)))
+
+
+def timing_record(
+    scope: Dict[str, Any], status: int, timing: RequestTiming, total: float
+) -> Dict[str, Any]:
+    """Build the structured timing record of a served request."""
+    return {
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": _route_template(scope),
+        "status": status,
+        "total_ms": round(total * 1000, 3),
+        "phases_ms": {
+            name: round(seconds * 1000, 3) for name, seconds in timing.entries.items()
+        },
+    }
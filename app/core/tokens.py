@@ -0,0 +1,232 @@
+"""
+Access Tokens
+
+This module contains ``TokenManager``, which issues and verifies stateless
+HMAC-SHA256 signed access tokens using only the standard library.
+
+Tokens are compact JWTs (``header.payload.signature``, HS256). The header
+names the signing key (``kid``), so the active key can be rotated while
+tokens signed with previous keys stay valid until those keys are retired.
+
+Verification needs no store lookup: the claims travel in the token. A small
+LRU cache keyed by signature remembers recently verified tokens, so a hot
+client's token is checked with one dictionary lookup and a string compare
+instead of a MAC and two JSON decodes. Logout adds the token ID to an
+in-memory revocation list, which forgets each entry once the token would
+have expired anyway.
+"""
+
+import base64
+import hashlib
+import heapq
+import hmac
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidTokenError(Exception):
+    """Raised for malformed, forged, expired or revoked tokens."""
+
+
+class TokenClaims(NamedTuple):
+    """Verified contents of an access token."""
+
+    user_id: int
+    username: str
+    issued_at: int
+    expires_at: int
+    token_id: str
+    key_id: str
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _header(key_id: str) -> str:
+    header = {"alg": "HS256", "typ": "JWT", "kid": key_id}
+    return _b64encode(json.dumps(header, separators=(",", ":")).encode())
+
+
+class TokenManager:
+    """Issue, verify and revoke HMAC-signed access tokens."""
+
+    def __init__(
+        self,
+        keys: Dict[str, bytes],
+        active_key_id: str,
+        ttl_seconds: int = 1800,
+        cache_size: int = 1024,
+        clock: Callable[[], float] = time.time,
+    ):
+        if active_key_id not in keys:
+            raise ValueError(f"Unknown active key: {active_key_id}")
+        self._keys = dict(keys)
+        self.active_key_id = active_key_id
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._clock = clock
+        # signature -> (signed header.payload, claims)
+        self._verified: "OrderedDict[str, Tuple[str, TokenClaims]]" = OrderedDict()
+        # token ID -> expiry, plus a heap of (expiry, token ID) for pruning
+        self._revoked: Dict[str, int] = {}
+        self._revoked_expiry: List[Tuple[int, str]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def issue(self, user_id: int, username: str) -> Tuple[str, TokenClaims]:
+        """Issue a token for a user, signed with the active key."""
+        now = int(self._clock())
+        claims = TokenClaims(
+            user_id=user_id,
+            username=username,
+            issued_at=now,
+            expires_at=now + self.ttl_seconds,
+            token_id=_b64encode(os.urandom(12)),
+            key_id=self.active_key_id,
+        )
+        payload = {
+            "sub": str(user_id),
+            "name": username,
+            "iat": claims.issued_at,
+            "exp": claims.expires_at,
+            "jti": claims.token_id,
+        }
+        signing_input = (
+            f"{_header(self.active_key_id)}."
+            f"{_b64encode(json.dumps(payload, separators=(',', ':')).encode())}"
+        )
+        signature = self._sign(self._keys[self.active_key_id], signing_input)
+        return f"{signing_input}.{signature}", claims
+
+    def verify(self, token: str) -> TokenClaims:
+        """Return the claims of a valid token, or raise InvalidTokenError."""
+        signing_input, _, signature = token.rpartition(".")
+        cached = self._verified.get(signature)
+        if cached is not None and cached[0] == signing_input:
+            self._verified.move_to_end(signature)
+            self.hits += 1
+            claims = cached[1]
+        else:
+            self.misses += 1
+            claims = self._decode(signing_input, signature)
+            self._verified[signature] = (signing_input, claims)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+        if claims.key_id not in self._keys:
+            raise InvalidTokenError("Token signing key has been retired")
+        now = int(self._clock())
+        if claims.expires_at <= now:
+            raise InvalidTokenError("Token has expired")
+        if self._revoked and self.is_revoked(claims.token_id, now):
+            raise InvalidTokenError("Token has been revoked")
+        return claims
+
+    def revoke(self, claims: TokenClaims) -> None:
+        """Reject a token from now until it expires."""
+        now = int(self._clock())
+        self._prune(now)
+        if claims.expires_at > now and claims.token_id not in self._revoked:
+            self._revoked[claims.token_id] = claims.expires_at
+            heapq.heappush(self._revoked_expiry, (claims.expires_at, claims.token_id))
+
+    def is_revoked(self, token_id: str, now: Optional[int] = None) -> bool:
+        """Return whether a token ID is on the revocation list."""
+        self._prune(int(self._clock()) if now is None else now)
+        return token_id in self._revoked
+
+    def rotate(self, key_id: str, key: bytes) -> None:
+        """Sign new tokens with a new key; earlier keys keep verifying."""
+        self._keys[key_id] = key
+        self.active_key_id = key_id
+
+    def retire(self, key_id: str) -> None:
+        """Stop accepting tokens signed with a key."""
+        if key_id == self.active_key_id:
+            raise ValueError("Cannot retire the active key")
+        self._keys.pop(key_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return verification cache and revocation counters."""
+        return {
+            "cached": len(self._verified),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revoked": len(self._revoked),
+        }
+
+    @staticmethod
+    def _sign(key: bytes, signing_input: str) -> str:
+        return _b64encode(hmac.new(key, signing_input.encode(), hashlib.sha256).digest())
+
+    def _decode(self, signing_input: str, signature: str) -> TokenClaims:
+        """Check the signature and parse the claims of an uncached token."""
+        try:
+            header_segment, payload_segment = signing_input.split(".")
+            header = json.loads(_b64decode(header_segment))
+            key = self._keys.get(header.get("kid"))
+            if header.get("alg") != "HS256" or key is None:
+                raise InvalidTokenError("Unknown signing key or algorithm")
+            expected = self._sign(key, signing_input)
+            if not hmac.compare_digest(expected.encode(), signature.encode()):
+                raise InvalidTokenError("Invalid token signature")
+
+            payload = json.loads(_b64decode(payload_segment))
+            return TokenClaims(
+                user_id=int(payload["sub"]),
+                username=str(payload["name"]),
+                issued_at=int(payload["iat"]),
+                expires_at=int(payload["exp"]),
+                token_id=str(payload["jti"]),
+                key_id=header["kid"],
+            )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise InvalidTokenError("Malformed token")
+
+    def _prune(self, now: int) -> None:
+        """Drop revocations for tokens that have expired."""
+        expiry = self._revoked_expiry
+        while expiry and expiry[0][0] <= now:
+            _, token_id = heapq.heappop(expiry)
+            self._revoked.pop(token_id, None)
+
+
+def _create_token_manager() -> TokenManager:
+    """Create the token manager configured in settings."""
+    keys = {
+        key_id: key.encode() for key_id, key in settings.previous_secret_keys.items()
+    }
+    if settings.secret_key:
+        keys[settings.secret_key_id] = settings.secret_key.encode()
+    else:
+        # Tokens then neither survive a restart nor work across workers.
+        logger.warning("SECRET_KEY is not set; signing tokens with a random key")
+        keys[settings.secret_key_id] = os.urandom(32)
+    return TokenManager(
+        keys,
+        active_key_id=settings.secret_key_id,
+        ttl_seconds=settings.access_token_expire_minutes * 60,
+        cache_size=settings.token_cache_size,
+    )
+
+
+# Global token manager instance
+token_manager = _create_token_manager()
+
+
+def get_token_manager() -> TokenManager:
+    """Get token manager instance."""
+    return token_manager
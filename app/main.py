@@ -6,18 +6,38 @@ It sets up the FastAPI instance, includes routers, configures middleware,
 and provides template rendering capabilities.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 import logging
+import os
 from pathlib import Path
 
 from app.core.config import Settings, get_settings
-from app.api import health_router, users_router
+from app.api import auth_router, health_router, metrics_router, users_router
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import (
+    APP_STARTUP_SECONDS,
+    MetricsMiddleware,
+    registry as metrics_registry,
+)
+from app.core.openapi import install_openapi_cache
+from app.core.pages import PageRenderer
+from app.core.profiling import ProfilingMiddleware, StackSampler
+from app.core.ratelimit import MemoryRateLimitBackend, RateLimitMiddleware, parse_rate
+from app.core.startup import StartupProfile, process_age
+from app.core.static import StaticAssets
+from app.core.timing import ServerTimingMiddleware, TimedRoute
+from app.core.tokens import get_token_manager
+from app.repositories import (
+    DurableUserRepository,
+    RepositoryError,
+    create_user_repository,
+)
+from app.services.user_service import get_user_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,10 +55,70 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"Debug mode: {settings.debug}")
     
+    profile = StartupProfile(enabled=settings.startup_profile)
+    if settings.preload_assets:
+        # Otherwise both happen on first use, keeping startup short
+        with profile.step("templates"):
+            compiled = pages.precompile()
+        logger.info(f"Compiled templates: {', '.join(compiled)}")
+        with profile.step("static assets"):
+            assets = await static_assets.load()
+        logger.info(f"Static assets: {len(assets)} files")
+    
+    user_service = get_user_service()
+    repository = None
+    if settings.database_url:
+        repository = create_user_repository(
+            settings.database_url, pool_size=settings.database_pool_size
+        )
+    elif settings.wal_dir:
+        # The in-memory store, recovered from and logged to disk
+        repository = DurableUserRepository(
+            settings.wal_dir,
+            fsync=settings.wal_fsync,
+            fsync_interval=settings.wal_fsync_interval,
+            snapshot_interval=settings.snapshot_interval_seconds,
+            snapshot_min_records=settings.snapshot_min_records,
+        )
+    if repository is not None:
+        with profile.step("user store"):
+            await repository.connect()
+        user_service.repository = repository
+        logger.info(f"User store: {type(repository).__name__}")
+    
+    metrics_flusher = None
+    if settings.metrics_enabled and metrics_registry.multiprocess_dir:
+        metrics_flusher = asyncio.create_task(
+            metrics_registry.flush_periodically(settings.metrics_flush_interval)
+        )
+    
+    sampler = None
+    if settings.profile_sample_interval > 0 and settings.profile_dir:
+        # Samples the thread running the event loop, which is this one
+        sampler = StackSampler(
+            settings.profile_sample_interval,
+            os.path.join(settings.profile_dir, f"stacks-{os.getpid()}.folded"),
+            flush_interval=settings.profile_sample_flush_seconds,
+        )
+        sampler.start()
+        logger.info(f"Sampling stacks into {sampler.path}")
+    
+    ready_after = process_age()
+    if ready_after is not None:
+        APP_STARTUP_SECONDS.set(ready_after)
+    profile.log(ready_after)
+    
     yield
     
     # Shutdown
     logger.info(f"Shutting down {settings.app_name}")
+    if metrics_flusher is not None:
+        metrics_flusher.cancel()
+        await metrics_registry.write_snapshot(live=False)
+    if sampler is not None:
+        sampler.stop()
+    await user_service.repository.close()
+    user_service.hasher.shutdown()
 
 # Create FastAPI application instance
 app = FastAPI(
@@ -46,10 +126,52 @@ app = FastAPI(
     version=settings.app_version,
     description=settings.app_description,
     debug=settings.debug,
-    docs_url="/docs",
-    redoc_url="/redoc",
+    docs_url="/docs" if settings.docs_enabled else None,
+    redoc_url="/redoc" if settings.docs_enabled else None,
+    openapi_url="/openapi.json" if settings.docs_enabled else None,
     lifespan=lifespan,
 )
+if settings.docs_enabled and settings.openapi_cache_path:
+    install_openapi_cache(app, settings.openapi_cache_path)
+# Routes declared on the app itself record their phases like the API routers'
+app.router.route_class = TimedRoute
+
+# Profile requests flagged by an admin (innermost, so only the app is profiled)
+if settings.profiling_admin_ids:
+    app.add_middleware(
+        ProfilingMiddleware,
+        tokens=get_token_manager(),
+        admin_ids=settings.profiling_admin_ids,
+        directory=settings.profile_dir,
+    )
+
+# Compress responses (inside the rest, so they see the final body)
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        algorithms=settings.compression_algorithms,
+        minimum_size=settings.compression_minimum_size,
+        level=settings.compression_level,
+        excluded_types=settings.compression_excluded_types,
+    )
+
+# Limit requests per client and route (inside CORS, so 429s carry CORS headers)
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        router=app.router,
+        backend=MemoryRateLimitBackend(max_keys=settings.rate_limit_max_keys),
+        default=(
+            parse_rate(settings.rate_limit_default, settings.rate_limit_algorithm)
+            if settings.rate_limit_default else None
+        ),
+        routes={
+            route: parse_rate(rate, settings.rate_limit_algorithm)
+            for route, rate in settings.rate_limit_routes.items()
+        },
+        exempt_paths=tuple(settings.rate_limit_exempt_paths),
+        tokens=get_token_manager(),
+    )
 
 # Configure CORS middleware
 app.add_middleware(
@@ -60,19 +182,44 @@ app.add_middleware(
     allow_headers=settings.allowed_headers,
 )
 
-# Setup static files
-app.mount(
-    "/static", 
-    StaticFiles(directory=Path(__file__).parent / "static"), 
-    name="static"
+# Record per-route request metrics (so CORS time is included)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Break responses down by phase in Server-Timing (outermost, so its
+# "routing" phase covers every other middleware)
+if settings.server_timing_enabled:
+    threshold = settings.server_timing_log_threshold_ms
+    app.add_middleware(
+        ServerTimingMiddleware, log_threshold=threshold / 1000 if threshold else None
+    )
+
+# Setup static files (served from an in-memory manifest)
+static_assets = StaticAssets(Path(__file__).parent / "static", reload=settings.debug)
+app.mount("/static", static_assets, name="static")
+
+# Setup templates (Jinja2 is loaded on the first render)
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+pages = PageRenderer(
+    str(TEMPLATES_DIR), debug=settings.debug, setup=static_assets.install
 )
 
-# Setup templates
-templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
+
+def _page_context(settings: Settings) -> dict:
+    """Template context shared by the HTML pages."""
+    return {
+        "app_name": settings.app_name,
+        "app_version": settings.app_version,
+        "app_description": settings.app_description,
+        "environment": settings.environment,
+    }
 
 # Include API routers
 app.include_router(health_router, prefix="/api")
+app.include_router(auth_router, prefix="/api")
 app.include_router(users_router, prefix="/api")
+if settings.metrics_enabled:
+    app.include_router(metrics_router)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -84,17 +231,11 @@ async def read_root(
     Render the main template page.
     
     This endpoint serves the main HTML template with links to the API documentation.
+    The rendered page is cached and supports If-None-Match.
     """
-    return templates.TemplateResponse(
-        request=request,
-        name="index.html",
-        context={
-            "app_name": settings.app_name,
-            "app_version": settings.app_version,
-            "app_description": settings.app_description,
-            "environment": settings.environment,
-        }
-    )
+    # Links use hashed asset URLs, so build the manifest off the event loop first
+    await static_assets.load()
+    return pages.response(request, "index.html", _page_context(settings))
 
 
 @app.get("/favicon.ico")
@@ -114,16 +255,20 @@ async def not_found_handler(request: Request, exc):
             content={"detail": "Not found"}
         )
     
-    # For non-API requests, return HTML template
-    return templates.TemplateResponse(
-        request=request,
-        name="base.html",
-        context={
-            "app_name": settings.app_name,
-            "app_version": settings.app_version,
-            "environment": settings.environment,
-        },
-        status_code=404
+    # For non-API requests, return the (cached) HTML template
+    await static_assets.load()
+    return pages.response(
+        request, "base.html", _page_context(settings), status_code=404
+    )
+
+
+@app.exception_handler(RepositoryError)
+async def repository_error_handler(request: Request, exc: RepositoryError):
+    """Answer 503 when the user store cannot complete a read or write."""
+    logger.error(f"User store error on {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "User store unavailable, retry later"}
     )
 
 
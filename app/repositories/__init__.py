@@ -0,0 +1,30 @@
+"""
+Repositories package initialization.
+
+This module initializes the repositories package and provides
+access to the user storage backends.
+"""
+
+from .base import UserRepository
+from .durable import DurableUserRepository
+from .exceptions import (
+    RepositoryError,
+    UserAlreadyExistsError,
+    VersionConflictError,
+)
+from .factory import create_user_repository
+from .memory import InMemoryUserRepository
+from .query import UserQuery
+from .rows import UserRow
+
+__all__ = [
+    "UserRepository",
+    "DurableUserRepository",
+    "RepositoryError",
+    "UserAlreadyExistsError",
+    "VersionConflictError",
+    "create_user_repository",
+    "InMemoryUserRepository",
+    "UserQuery",
+    "UserRow",
+]
@@ -0,0 +1,135 @@
+"""
+Base Repository
+
+This module contains the interface every user storage backend implements.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .query import UserQuery
+
+
+class UserRepository(ABC):
+    """Abstract async user store.
+
+    Rows are plain dictionaries with the same keys as ``UserResponse`` plus
+    ``version``, which starts at 1 and increases with every update, and
+    ``password_hash``, which is ``None`` for users created without one.
+    """
+
+    async def connect(self) -> None:
+        """Open connections or other resources held by the backend."""
+
+    async def close(self) -> None:
+        """Release connections or other resources held by the backend."""
+
+    async def refresh(self) -> List[Tuple[int, str]]:
+        """Catch up with writes made by other processes.
+
+        Returns the ``(id, username)`` of every row those writes changed since
+        the last call, including the old username of a renamed row, so callers
+        can drop copies they cached. Backends that other processes cannot
+        write to behind the caller's back return an empty list.
+        """
+        return []
+
+    @abstractmethod
+    async def count(self) -> int:
+        """Return the number of stored users."""
+
+    @abstractmethod
+    async def revision(self) -> int:
+        """Return the collection revision, which changes on every write."""
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a user row by primary key."""
+
+    @abstractmethod
+    async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get a user row by its unique username."""
+
+    @abstractmethod
+    async def get_by_email(self, email: str) -> List[Dict[str, Any]]:
+        """Get all user rows with the given email address."""
+
+    @abstractmethod
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get the user rows that exist among ``user_ids``, keyed by ID."""
+
+    @abstractmethod
+    async def get_ids_by_username(self, usernames: Iterable[str]) -> Dict[str, int]:
+        """Map the usernames that are already taken to their user IDs."""
+
+    @abstractmethod
+    async def list(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """List user rows in ID order."""
+
+    @abstractmethod
+    async def list_after(
+        self, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` user rows with an ID greater than ``after_id``.
+
+        This is keyset pagination: backends serve it from an ordered index,
+        so a deep page costs the same as the first one.
+        """
+
+    @abstractmethod
+    async def search(
+        self, query: UserQuery, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` matching rows with an ID greater than ``after_id``.
+
+        Results are in ID order, so searches page like ``list_after``.
+        Backends answer from secondary indexes rather than scanning every row.
+        """
+
+    @abstractmethod
+    async def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new user row and return it with its allocated ID."""
+
+    @abstractmethod
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several user rows in one transaction.
+
+        Raises UserAlreadyExistsError, inserting nothing, if any username is
+        taken or repeated within the batch.
+        """
+
+    @abstractmethod
+    async def update(
+        self,
+        user_id: int,
+        changes: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply changes to a user row, returning None if it does not exist.
+
+        With ``expected_version`` the update only applies if the row still
+        has that version; otherwise VersionConflictError is raised.
+        """
+
+    @abstractmethod
+    async def update_many(
+        self, changes: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Apply changes to several user rows in one transaction.
+
+        Returns the updated rows keyed by ID, skipping IDs that do not exist.
+        Raises UserAlreadyExistsError, changing nothing, on a username clash.
+        """
+
+    @abstractmethod
+    async def delete(
+        self, user_id: int, expected_version: Optional[int] = None
+    ) -> bool:
+        """Delete a user row, returning False if it does not exist.
+
+        ``expected_version`` works as for ``update``.
+        """
+
+    @abstractmethod
+    async def delete_many(self, user_ids: Iterable[int]) -> List[int]:
+        """Delete several user rows in one transaction; return the IDs that existed."""
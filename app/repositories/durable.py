@@ -0,0 +1,282 @@
+"""
+Durable In-Memory User Repository
+
+This module contains ``DurableUserRepository``, the indexed in-memory store
+with a write-ahead log and snapshots, so its users survive restarts.
+
+Reads are served from memory exactly as by ``InMemoryUserRepository``.
+Every write is applied in memory and its rows appended to the log, which
+commits concurrent writes in groups (see ``app.repositories.wal``). With
+the ``always`` fsync policy a write returns only once it is on disk.
+
+If the log fails, the rows are reloaded from disk, which drops every write
+that did not reach it, and later writes raise ``RepositoryError`` without
+changing memory until the store is reconnected.
+
+Snapshots write every row in a compact binary format (see
+``app.repositories.snapshot``). Taking one rotates the log to a new segment
+and copies the rows in the same step, so the snapshot covers every older
+segment; those are then deleted. Snapshots are taken periodically once
+enough records were logged, and on close.
+
+Recovery at ``connect`` loads the latest snapshot and replays the log
+segments written after it. Replaying a record the snapshot already holds
+is harmless, since records carry whole rows. A record cut short at the
+end of the last segment, left by a crash during a write, is ignored.
+"""
+
+import asyncio
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .exceptions import RepositoryError
+from .memory import InMemoryUserRepository
+from .records import decode_entries, delete_entry, encode_entry, put_entry, replay
+from .snapshot import decode_snapshot, encode_snapshot, write_snapshot
+from .wal import WriteAheadLog, list_segments, segment_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = "snapshot-{:010d}.bin"
+_SNAPSHOT = re.compile(r"snapshot-(\d{10})\.bin$")
+
+
+class DurableUserRepository(InMemoryUserRepository):
+    """In-memory user store persisted through a write-ahead log and snapshots."""
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: str = "always",
+        fsync_interval: float = 1.0,
+        snapshot_interval: Optional[float] = 300.0,
+        snapshot_min_records: int = 10000,
+    ):
+        super().__init__()
+        self.directory = Path(directory)
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_min_records = snapshot_min_records
+        self._log = WriteAheadLog(self.directory, fsync, fsync_interval)
+        # Records logged since the last snapshot
+        self._unsnapshotted = 0
+        self._snapshot_lock = asyncio.Lock()
+        self._reload_lock = asyncio.Lock()
+        # Set once memory was reloaded after the log failed
+        self._reloaded = False
+        self._snapshotter: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        """Recover the rows from disk and start logging writes."""
+        if self._log.is_open:
+            return
+        rows, next_id, segment, replayed = await asyncio.to_thread(self._recover)
+        self._reset(rows, next_id)
+        self._unsnapshotted = replayed
+        self._reloaded = False
+        await self._log.open(segment)
+        logger.info(
+            f"Recovered {len(rows)} users from {self.directory} "
+            f"({replayed} log records replayed)"
+        )
+        if self.snapshot_interval:
+            self._snapshotter = asyncio.create_task(self._snapshot_periodically())
+
+    async def close(self) -> None:
+        """Stop logging, snapshotting first so the next start replays little."""
+        if not self._log.is_open:
+            return
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+            try:
+                await self._snapshotter
+            except asyncio.CancelledError:
+                pass
+            self._snapshotter = None
+        if self._unsnapshotted:
+            await self.snapshot()
+        await self._log.close()
+
+    async def snapshot(self) -> None:
+        """Write a snapshot of every row and drop the log it makes redundant."""
+        async with self._snapshot_lock:
+            segment = await self._log.rotate()
+            # No await between the rotation and the copy, so the snapshot
+            # holds every record in the segments before ``segment``. Rows are
+            # replaced rather than changed, so copying references suffices.
+            rows = list(self._rows.values())
+            next_id = self._next_id
+            logged, self._unsnapshotted = self._unsnapshotted, 0
+            try:
+                await asyncio.to_thread(self._write_snapshot, rows, next_id, segment)
+            except OSError:
+                self._unsnapshotted += logged
+                raise
+
+    def log_stats(self) -> Dict[str, int]:
+        """Return the write-ahead log's record, batch and fsync counts."""
+        return self._log.stats()
+
+    async def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new user row and log it."""
+        await self._check()
+        row = await super().add(data)
+        await self._append([put_entry(row)])
+        return row
+
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several user rows and log them as one batch."""
+        await self._check()
+        rows = await super().add_many(items)
+        await self._append([put_entry(row) for row in rows])
+        return rows
+
+    async def update(
+        self,
+        user_id: int,
+        changes: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply changes to an existing user row and log it."""
+        await self._check()
+        row = await super().update(user_id, changes, expected_version)
+        if row is not None:
+            await self._append([put_entry(row)])
+        return row
+
+    async def update_many(
+        self, changes: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Apply changes to several user rows and log them as one batch."""
+        await self._check()
+        rows = await super().update_many(changes)
+        await self._append([put_entry(row) for row in rows.values()])
+        return rows
+
+    async def delete(
+        self, user_id: int, expected_version: Optional[int] = None
+    ) -> bool:
+        """Delete a user row and log it."""
+        await self._check()
+        deleted = await super().delete(user_id, expected_version)
+        if deleted:
+            await self._append([delete_entry(user_id)])
+        return deleted
+
+    async def delete_many(self, user_ids: Iterable[int]) -> List[int]:
+        """Delete several user rows and log them as one batch."""
+        await self._check()
+        deleted = await super().delete_many(user_ids)
+        await self._append([delete_entry(user_id) for user_id in deleted])
+        return deleted
+
+    async def _append(self, entries: List[Dict[str, Any]]) -> None:
+        """Log entries for a write already applied in memory."""
+        if not entries:
+            return
+        # Encoded before the first await, while the rows match this write.
+        data = b"".join(encode_entry(entry) for entry in entries)
+        self._unsnapshotted += len(entries)
+        try:
+            await self._log.append(data, len(entries))
+        except RepositoryError:
+            await self._reload()
+            raise
+
+    async def _check(self) -> None:
+        """Raise RepositoryError, before any change, if the log cannot take it."""
+        try:
+            self._log.check()
+        except RepositoryError:
+            # With a lazy fsync policy the write that broke the log has
+            # already returned, so memory may still hold it.
+            await self._reload()
+            raise
+
+    async def _reload(self) -> None:
+        """Replace the rows in memory by those on disk, once per log failure."""
+        async with self._reload_lock:
+            if self._reloaded:
+                return
+            try:
+                rows, next_id, _, _ = await asyncio.to_thread(self._recover)
+            except (OSError, RepositoryError):
+                logger.exception(f"Reloading {self.directory} failed")
+                return
+            # Keep IDs already handed out from being reused
+            self._reset(rows, max(next_id, self._next_id))
+            self._reloaded = True
+            logger.warning(
+                f"Write-ahead log of {self.directory} failed; "
+                f"reloaded {len(rows)} users from disk"
+            )
+
+    async def _snapshot_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self._unsnapshotted < self.snapshot_min_records:
+                continue
+            try:
+                # Shielded: cancelling mid-rotation would drop a log batch.
+                await asyncio.shield(self.snapshot())
+            except (OSError, RepositoryError):
+                logger.exception(f"Snapshot of {self.directory} failed")
+
+    def _recover(self) -> Tuple[List[Dict[str, Any]], int, int, int]:
+        """Load the latest snapshot and replay the log written after it.
+
+        Returns the rows, the next user ID, the segment to log to next and
+        the number of log records replayed.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        rows: Dict[int, Dict[str, Any]] = {}
+        next_id, start = 1, 0
+        snapshots = self._snapshots()
+        if snapshots:
+            path = self.directory / SNAPSHOT_NAME.format(snapshots[-1])
+            try:
+                snapshot_rows, next_id, start = decode_snapshot(path.read_bytes())
+            except ValueError as exc:
+                raise RepositoryError(f"Cannot load {path}: {exc}") from exc
+            rows = {row["id"]: row for row in snapshot_rows}
+
+        segments = [n for n in list_segments(self.directory) if n >= start]
+        replayed = 0
+        for number in segments:
+            path = segment_path(self.directory, number)
+            data = path.read_bytes()
+            entries, size = decode_entries(data)
+            if size != len(data):
+                if number != segments[-1]:
+                    raise RepositoryError(f"Corrupt record at offset {size} in {path}")
+                logger.warning(
+                    f"Ignoring {len(data) - size} bytes of incomplete records "
+                    f"at the end of {path}"
+                )
+            next_id = max(next_id, replay(rows, entries))
+            replayed += len(entries)
+
+        ordered = sorted(rows.values(), key=lambda row: row["id"])
+        next_segment = max([start] + [number + 1 for number in segments])
+        return ordered, next_id, next_segment, replayed
+
+    def _write_snapshot(
+        self, rows: List[Dict[str, Any]], next_id: int, segment: int
+    ) -> None:
+        path = self.directory / SNAPSHOT_NAME.format(segment)
+        write_snapshot(path, encode_snapshot(rows, next_id, segment))
+        for number in self._snapshots():
+            if number < segment:
+                (self.directory / SNAPSHOT_NAME.format(number)).unlink()
+        for number in list_segments(self.directory):
+            if number < segment:
+                segment_path(self.directory, number).unlink()
+
+    def _snapshots(self) -> List[int]:
+        numbers = []
+        for path in self.directory.iterdir():
+            match = _SNAPSHOT.match(path.name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
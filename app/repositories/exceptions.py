@@ -0,0 +1,25 @@
+"""
+Repository Exceptions
+
+This module contains exceptions raised by user storage backends.
+"""
+
+
+class RepositoryError(Exception):
+    """Base class for storage backend errors."""
+
+
+class UserAlreadyExistsError(RepositoryError):
+    """Raised when a write would violate the unique username index."""
+
+    def __init__(self, username: str):
+        super().__init__(f"Username '{username}' already exists")
+        self.username = username
+
+
+class VersionConflictError(RepositoryError):
+    """Raised when a conditional write finds a different row version."""
+
+    def __init__(self, user_id: int):
+        super().__init__(f"User with ID {user_id} was modified concurrently")
+        self.user_id = user_id
@@ -0,0 +1,36 @@
+"""
+Repository Factory
+
+This module selects a user storage backend from the configured database URL.
+"""
+
+from typing import Optional
+
+from .base import UserRepository
+from .memory import InMemoryUserRepository
+
+
+def create_user_repository(
+    database_url: Optional[str], pool_size: int = 5
+) -> UserRepository:
+    """Create the user repository for a database URL.
+
+    No URL selects the in-memory store. ``sqlite://`` URLs select the
+    SQLite backend, which is imported lazily so aiosqlite stays optional.
+    ``shared://`` URLs select a log file shared by the worker processes on
+    one machine.
+    """
+    if not database_url:
+        return InMemoryUserRepository()
+
+    scheme = database_url.partition("://")[0]
+    if scheme in ("sqlite", "sqlite+aiosqlite"):
+        from .sql import SQLiteUserRepository
+
+        return SQLiteUserRepository(database_url, pool_size=pool_size)
+    if scheme == "shared":
+        from .shared import SharedUserRepository
+
+        return SharedUserRepository(database_url)
+
+    raise ValueError(f"Unsupported database URL: {database_url}")
@@ -0,0 +1,156 @@
+"""
+Secondary Indexes
+
+This module contains the secondary index structures used by the in-memory
+user store.
+
+``SortedIndex`` is a sorted multiset split into chunks of bounded size.
+Inserts and removals shift at most one chunk instead of the whole list, so
+they stay cheap at millions of entries, and range scans start with two
+binary searches. ``TokenIndex`` is an inverted index from word tokens to
+user IDs with a ``SortedIndex`` vocabulary for token prefix lookups.
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .query import PREFIX_END, tokenize
+
+
+class SortedIndex:
+    """Sorted multiset of comparable items stored in bounded chunks."""
+
+    def __init__(self, items: Iterable[Any] = (), load: int = 1000):
+        self._load = load
+        ordered = sorted(items)
+        self._chunks: List[List[Any]] = [
+            ordered[start:start + load] for start in range(0, len(ordered), load)
+        ]
+        # Last (largest) item of every chunk, for locating chunks by bisect
+        self._maxes: List[Any] = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self._chunks:
+            yield from chunk
+
+    def add(self, item: Any) -> None:
+        """Insert an item."""
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([item])
+            self._maxes.append(item)
+            return
+
+        index = min(bisect_left(self._maxes, item), len(self._chunks) - 1)
+        chunk = self._chunks[index]
+        insort(chunk, item)
+        self._maxes[index] = chunk[-1]
+        if len(chunk) > 2 * self._load:
+            half = len(chunk) // 2
+            self._chunks[index:index + 1] = [chunk[:half], chunk[half:]]
+            self._maxes[index:index + 1] = [chunk[half - 1], chunk[-1]]
+
+    def discard(self, item: Any) -> bool:
+        """Remove one occurrence of an item, returning whether it was present."""
+        index = bisect_left(self._maxes, item)
+        if index == len(self._chunks):
+            return False
+        chunk = self._chunks[index]
+        position = bisect_left(chunk, item)
+        if position == len(chunk) or chunk[position] != item:
+            return False
+
+        del chunk[position]
+        self._len -= 1
+        if chunk:
+            self._maxes[index] = chunk[-1]
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+        return True
+
+    def irange(
+        self, low: Optional[Any] = None, high: Optional[Any] = None
+    ) -> Iterator[Any]:
+        """Iterate over items with ``low <= item < high`` in order.
+
+        ``None`` leaves that end of the range open.
+        """
+        first = 0 if low is None else bisect_left(self._maxes, low)
+        for index in range(first, len(self._chunks)):
+            chunk = self._chunks[index]
+            start = 0
+            if index == first and low is not None:
+                start = bisect_left(chunk, low)
+            for item in chunk[start:]:
+                if high is not None and item >= high:
+                    return
+                yield item
+
+    def count(self, low: Optional[Any] = None, high: Optional[Any] = None) -> int:
+        """Count items with ``low <= item < high`` without visiting them."""
+        end = self._len if high is None else self._position(high)
+        return end - (0 if low is None else self._position(low))
+
+    def _position(self, item: Any) -> int:
+        """Return the number of items less than ``item``."""
+        index = bisect_left(self._maxes, item)
+        if index == len(self._chunks):
+            return self._len
+        before = sum(len(chunk) for chunk in self._chunks[:index])
+        return before + bisect_left(self._chunks[index], item)
+
+
+class TokenIndex:
+    """Inverted index from lowercase word tokens to user IDs."""
+
+    def __init__(self, documents: Iterable[Tuple[int, Optional[str]]] = ()):
+        postings: Dict[str, Set[int]] = {}
+        for user_id, text in documents:
+            for token in tokenize(text):
+                ids = postings.get(token)
+                if ids is None:
+                    postings[token] = {user_id}
+                else:
+                    ids.add(user_id)
+        self._postings = postings
+        self._vocabulary = SortedIndex(postings)
+
+    def add(self, user_id: int, text: Optional[str]) -> None:
+        """Index the tokens of ``text`` for a user."""
+        for token in set(tokenize(text)):
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                self._vocabulary.add(token)
+            ids.add(user_id)
+
+    def remove(self, user_id: int, text: Optional[str]) -> None:
+        """Unindex the tokens of ``text`` for a user."""
+        for token in set(tokenize(text)):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(user_id)
+            if not ids:
+                del self._postings[token]
+                self._vocabulary.discard(token)
+
+    def tokens_with_prefix(self, prefix: str) -> Iterator[str]:
+        """Iterate over indexed tokens starting with ``prefix``."""
+        return self._vocabulary.irange(prefix, prefix + PREFIX_END)
+
+    def count_prefix(self, prefix: str) -> int:
+        """Count the (user, token) pairs whose token starts with ``prefix``."""
+        return sum(len(self._postings[t]) for t in self.tokens_with_prefix(prefix))
+
+    def match_prefix(self, prefix: str) -> Set[int]:
+        """Return the IDs of users with a token starting with ``prefix``."""
+        matches: Set[int] = set()
+        for token in self.tokens_with_prefix(prefix):
+            matches.update(self._postings[token])
+        return matches
@@ -0,0 +1,462 @@
+"""
+In-Memory User Repository
+
+This module contains an indexed in-memory storage engine for users.
+
+Rows are kept in a dictionary keyed by primary key, so lookups, updates
+and deletes are O(1). Unique and secondary indexes map usernames and
+emails back to primary keys, and new IDs come from a monotonic allocator
+instead of scanning for the current maximum.
+
+Each row is a compact ``UserRow`` (see ``app.repositories.rows``) rather
+than a dict, and the indexes share its objects where they can: the email
+index holds a bare ID unless an address is shared, and lowercase search
+keys reuse the row's string when it is already lowercase.
+
+An ordered ID index backs pagination. Deletes only leave a tombstone in it,
+which keeps them O(1); the index is compacted once tombstones make up half
+of it, so both offset and keyset pages stay proportional to the page size.
+
+Search is served from sorted indexes on lowercase username, lowercase
+email and creation time, and from an inverted index of full-name tokens.
+A search picks the most selective index and checks the other criteria row
+by row. When that index matches many rows, walking the ordered ID index
+finds a page of matches sooner; the walk gives up and reads the index
+after visiting as many rows as the index holds, which bounds searches
+whose matches cluster at high IDs.
+"""
+
+import heapq
+import time
+from itertools import islice
+from bisect import bisect_right, insort
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .base import UserRepository
+from .exceptions import UserAlreadyExistsError, VersionConflictError
+from .indexes import SortedIndex, TokenIndex
+from .query import PREFIX_END, UserQuery
+from .rows import UserRow
+
+# A search plan: estimated matches and a function producing candidate IDs
+Plan = Tuple[int, Callable[[], Iterable[int]]]
+
+
+class InMemoryUserRepository(UserRepository):
+    """Indexed in-memory user store."""
+
+    def __init__(self, users: Optional[List[Dict[str, Any]]] = None):
+        self._reset(users or [])
+
+    def _reset(self, users: List[Dict[str, Any]], next_id: int = 1) -> None:
+        """Replace the contents with ``users``, building every index in bulk.
+
+        ``next_id`` is a lower bound for the next allocated ID, so IDs of
+        deleted users are not handed out again.
+        """
+        # Primary key index: id -> row. Dicts keep insertion order and IDs
+        # are allocated monotonically, so iteration order is ID order.
+        self._rows: Dict[int, UserRow] = {}
+        # Unique username index: username -> id
+        self._by_username: Dict[str, int] = {}
+        # Secondary email index: email -> id, or a set of ids for the few
+        # emails several users share
+        self._by_email: Dict[str, Union[int, Set[int]]] = {}
+        # Ordered ID index for pagination; may contain deleted IDs.
+        self._order: List[int] = []
+        self._tombstones = 0
+        self._next_id = next_id
+        # Collection revision, bumped by every write. It starts from the
+        # clock so a restarted process never reuses an earlier revision.
+        self._revision = time.time_ns() // 1000
+
+        for user in users:
+            self._insert(UserRow.from_row(user), index_search=False)
+        # Search indexes: sorted (key, id) pairs and full-name tokens, built
+        # in bulk rather than by one insert per seeded row
+        rows = list(self._rows.values())
+        self._username_index = SortedIndex((_fold(r.username), r.id) for r in rows)
+        self._email_index = SortedIndex((_fold(r.email), r.id) for r in rows)
+        self._created_index = SortedIndex((r.created_at, r.id) for r in rows)
+        self._names = TokenIndex((r.id, r.full_name) for r in rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    async def count(self) -> int:
+        """Return the number of stored users."""
+        return len(self._rows)
+
+    async def revision(self) -> int:
+        """Return the collection revision."""
+        return self._revision
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a user row by primary key."""
+        return self._rows.get(user_id)
+
+    async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get a user row through the unique username index."""
+        user_id = self._by_username.get(username)
+        return self._rows.get(user_id) if user_id is not None else None
+
+    async def get_by_email(self, email: str) -> List[Dict[str, Any]]:
+        """Get all user rows with the given email address."""
+        ids = self._by_email.get(email, ())
+        if isinstance(ids, int):
+            return [self._rows[ids]]
+        return [self._rows[user_id] for user_id in sorted(ids)]
+
+    async def list(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """List user rows in ID order."""
+        rows = self._rows
+        if not self._tombstones:
+            return [rows[user_id] for user_id in self._order[skip:skip + limit]]
+        # Tombstones are at most half the index, so skipping them at most
+        # doubles the walk
+        live = (rows[user_id] for user_id in self._order if user_id in rows)
+        return list(islice(live, skip, skip + limit))
+
+    async def list_after(
+        self, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` user rows with an ID greater than ``after_id``."""
+        start = bisect_right(self._order, after_id) if after_id is not None else 0
+        order = self._order
+        rows = []
+        for index in range(start, len(order)):
+            row = self._rows.get(order[index])
+            if row is not None:
+                rows.append(row)
+                if len(rows) == limit:
+                    break
+        return rows
+
+    async def search(
+        self, query: UserQuery, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` matching rows with an ID greater than ``after_id``."""
+        after = after_id if after_id is not None else 0
+        matches = query.matcher()
+        plan = self._plan(query)
+        if plan is None:
+            return self._scan(after, limit, matches)
+
+        size, candidates = plan
+        # With evenly spread matches a scan visits about limit * rows / size
+        # rows per page, against size candidates read from the index.
+        if size * size > limit * len(self._rows):
+            rows = self._scan(after, limit, matches, budget=size)
+            if rows is not None:
+                return rows
+
+        table = self._rows
+        ids = (
+            user_id for user_id in candidates()
+            if user_id > after and matches(table[user_id])
+        )
+        return [table[user_id] for user_id in heapq.nsmallest(limit, ids)]
+
+    def _scan(
+        self,
+        after: int,
+        limit: int,
+        matches: Callable[[Dict[str, Any]], bool],
+        budget: Optional[int] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Walk rows in ID order, or return None after ``budget`` rows."""
+        found = []
+        order = self._order
+        start = bisect_right(order, after)
+        end = len(order) if budget is None else min(len(order), start + budget)
+        for index in range(start, end):
+            row = self._rows.get(order[index])
+            if row is not None and matches(row):
+                found.append(row)
+                if len(found) == limit:
+                    return found
+        return found if end == len(order) else None
+
+    def _plan(self, query: UserQuery) -> Optional[Plan]:
+        """Pick the most selective index for a query, if any applies."""
+        options: List[Plan] = []
+        for index, prefix in (
+            (self._username_index, query.username),
+            (self._email_index, query.email),
+        ):
+            if prefix:
+                low, high = (prefix.lower(),), (prefix.lower() + PREFIX_END,)
+                options.append((
+                    index.count(low, high),
+                    lambda index=index, low=low, high=high: (
+                        user_id for _, user_id in index.irange(low, high)
+                    ),
+                ))
+        if query.created_from is not None or query.created_to is not None:
+            created = self._created_index
+            low = (query.created_from,) if query.created_from is not None else None
+            high = (query.created_to,) if query.created_to is not None else None
+            options.append((
+                created.count(low, high),
+                lambda: (user_id for _, user_id in created.irange(low, high)),
+            ))
+        for term in query.name_terms:
+            options.append((
+                self._names.count_prefix(term),
+                lambda term=term: self._names.match_prefix(term),
+            ))
+
+        return min(options, key=lambda option: option[0], default=None)
+
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get the user rows that exist among ``user_ids``."""
+        rows = self._rows
+        return {user_id: rows[user_id] for user_id in user_ids if user_id in rows}
+
+    async def get_ids_by_username(self, usernames: Iterable[str]) -> Dict[str, int]:
+        """Map the usernames that are taken to their user IDs."""
+        index = self._by_username
+        return {name: index[name] for name in usernames if name in index}
+
+    async def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new user row and allocate its ID."""
+        return self._insert(self._new_row(data, datetime.utcnow()))
+
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several user rows; none are inserted if any username is taken."""
+        seen: Set[str] = set()
+        for data in items:
+            if data["username"] in seen:
+                raise UserAlreadyExistsError(data["username"])
+            self._check_username(data["username"])
+            seen.add(data["username"])
+
+        now = datetime.utcnow()
+        return [self._insert(self._new_row(data, now)) for data in items]
+
+    async def update(
+        self,
+        user_id: int,
+        changes: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply changes to an existing user row."""
+        row = self._rows.get(user_id)
+        if row is None:
+            return None
+        self._check_version(row, expected_version)
+
+        username = changes.get("username", row.username)
+        if username != row.username:
+            self._check_username(username)
+        return self._apply(row, changes, datetime.utcnow())
+
+    async def update_many(
+        self, changes: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Apply changes to several user rows; none change on a username clash."""
+        claimed: Set[str] = set()
+        for user_id, user_changes in changes.items():
+            self._check_keys(user_id, user_changes)
+            username = user_changes.get("username")
+            if username is None:
+                continue
+            owner = self._by_username.get(username, user_id)
+            if owner != user_id or username in claimed:
+                raise UserAlreadyExistsError(username)
+            claimed.add(username)
+
+        now = datetime.utcnow()
+        return {
+            user_id: self._apply(self._rows[user_id], user_changes, now)
+            for user_id, user_changes in changes.items()
+            if user_id in self._rows
+        }
+
+    async def delete(
+        self, user_id: int, expected_version: Optional[int] = None
+    ) -> bool:
+        """Delete a user row by primary key."""
+        row = self._rows.get(user_id)
+        if row is None:
+            return False
+        self._check_version(row, expected_version)
+        return self._remove(user_id)
+
+    async def delete_many(self, user_ids: Iterable[int]) -> List[int]:
+        """Delete several user rows, returning the IDs that existed."""
+        return [user_id for user_id in user_ids if self._remove(user_id)]
+
+    def _new_row(self, data: Dict[str, Any], now: datetime) -> UserRow:
+        return UserRow(
+            self._next_id,
+            data["username"],
+            data["email"],
+            data.get("full_name"),
+            data.get("is_active", True),
+            now,
+            now,
+            password_hash=data.get("password_hash"),
+        )
+
+    def _insert(self, row: UserRow, index_search: bool = True) -> UserRow:
+        """Insert a fully formed row and update every index."""
+        self._check_username(row.username)
+
+        user_id = row.id
+        self._rows[user_id] = row
+        self._by_username[row.username] = user_id
+        self._index_email(row.email, user_id)
+        if index_search:
+            self._index_search(row)
+        if not self._order or user_id > self._order[-1]:
+            self._order.append(user_id)
+        else:
+            insort(self._order, user_id)
+        self._next_id = max(self._next_id, user_id + 1)
+        self._revision += 1
+        return row
+
+    def _store(self, row: Dict[str, Any]) -> UserRow:
+        """Insert or overwrite a complete row as it was written elsewhere.
+
+        Unlike ``update``, the row's version and timestamps are kept as given.
+        """
+        current = self._rows.get(row["id"])
+        if current is None:
+            return self._insert(UserRow.from_row(row))
+        changes = {
+            field: value for field, value in row.items() if current.get(field) != value
+        }
+        return self._apply(current, changes, row["updated_at"], row["version"])
+
+    def _apply(
+        self,
+        row: UserRow,
+        changes: Dict[str, Any],
+        now: datetime,
+        version: Optional[int] = None,
+    ) -> UserRow:
+        """Apply already validated changes to its indexes and replace a row.
+
+        The changes are checked and the new row built before any index
+        changes, so changes that cannot be stored leave every index as it was.
+        """
+        user_id = row.id
+        self._check_keys(user_id, changes)
+        updated = row.replace(changes, now, version)
+        moves = self._search_moves(row, updated)
+
+        if updated.username != row.username:
+            del self._by_username[row.username]
+            self._by_username[updated.username] = user_id
+        if updated.email != row.email:
+            self._unindex_email(row.email, user_id)
+            self._index_email(updated.email, user_id)
+
+        for index, old_key, new_key in moves:
+            index.discard(old_key)
+            index.add(new_key)
+        if updated.full_name != row.full_name:
+            self._names.remove(user_id, row.full_name)
+            self._names.add(user_id, updated.full_name)
+        self._rows[user_id] = updated
+        self._revision += 1
+        return updated
+
+    def _remove(self, user_id: int) -> bool:
+        """Remove a row and unindex it, leaving a tombstone in the order index."""
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return False
+
+        del self._by_username[row.username]
+        self._unindex_email(row.email, user_id)
+        self._unindex_search(row)
+        self._tombstones += 1
+        if self._tombstones * 2 > len(self._order):
+            self._compact()
+        self._revision += 1
+        return True
+
+    def _compact(self) -> None:
+        """Drop deleted IDs from the ordered index."""
+        self._order = [user_id for user_id in self._order if user_id in self._rows]
+        self._tombstones = 0
+
+    def _index_search(self, row: UserRow) -> None:
+        user_id = row.id
+        self._username_index.add((_fold(row.username), user_id))
+        self._email_index.add((_fold(row.email), user_id))
+        self._created_index.add((row.created_at, user_id))
+        self._names.add(user_id, row.full_name)
+
+    def _search_moves(
+        self, row: UserRow, updated: UserRow
+    ) -> List[Tuple[SortedIndex, Any, Any]]:
+        """List the sorted search index entries that change with a row.
+
+        Every key is computed here, so ``_apply`` can check an update fully
+        before it changes any index.
+        """
+        user_id = row.id
+        moves = []
+        for index, old, new in (
+            (self._username_index, _fold(row.username), _fold(updated.username)),
+            (self._email_index, _fold(row.email), _fold(updated.email)),
+            (self._created_index, row.created_at, updated.created_at),
+        ):
+            if new != old:
+                moves.append((index, (old, user_id), (new, user_id)))
+        return moves
+
+    def _unindex_search(self, row: UserRow) -> None:
+        user_id = row.id
+        self._username_index.discard((row.username.lower(), user_id))
+        self._email_index.discard((row.email.lower(), user_id))
+        self._created_index.discard((row.created_at, user_id))
+        self._names.remove(user_id, row.full_name)
+
+    @staticmethod
+    def _check_version(row: UserRow, expected_version: Optional[int]) -> None:
+        if expected_version is not None and row.version != expected_version:
+            raise VersionConflictError(row.id)
+
+    @staticmethod
+    def _check_keys(user_id: int, changes: Dict[str, Any]) -> None:
+        for field in ("username", "email"):
+            if field in changes and not isinstance(changes[field], str):
+                raise ValueError(f"User {user_id} needs a string {field}")
+
+    def _check_username(self, username: str) -> None:
+        if username in self._by_username:
+            raise UserAlreadyExistsError(username)
+
+    def _index_email(self, email: str, user_id: int) -> None:
+        ids = self._by_email.get(email)
+        if ids is None:
+            self._by_email[email] = user_id
+        elif isinstance(ids, int):
+            if ids != user_id:
+                self._by_email[email] = {ids, user_id}
+        else:
+            ids.add(user_id)
+
+    def _unindex_email(self, email: str, user_id: int) -> None:
+        ids = self._by_email.get(email)
+        if ids is None:
+            return
+        if isinstance(ids, int):
+            if ids == user_id:
+                del self._by_email[email]
+            return
+        ids.discard(user_id)
+        if len(ids) == 1:
+            self._by_email[email] = ids.pop()
+
+
+def _fold(value: str) -> str:
+    """Lowercase ``value`` for a search key, reusing it if already lowercase."""
+    folded = value.lower()
+    return value if folded == value else folded
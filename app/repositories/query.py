@@ -0,0 +1,71 @@
+"""
+User Search Queries
+
+This module contains ``UserQuery``, the search criteria every storage
+backend understands, and the tokenizer used for full-name search.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+_TOKEN = re.compile(r"\w+")
+
+# Sorts after every other character, so (prefix, prefix + PREFIX_END) bounds
+# all strings starting with prefix.
+PREFIX_END = "\U0010ffff"
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class UserQuery(NamedTuple):
+    """Search criteria for users; every given criterion must match.
+
+    - ``username`` / ``email``: case-insensitive prefix
+    - ``name``: every word must start a word of ``full_name``
+      (case-insensitive), so "ad" and "min ad" both match "Admin Adams"
+    - ``is_active``: exact match
+    - ``created_from`` / ``created_to``: half-open range on ``created_at``
+    """
+
+    username: Optional[str] = None
+    email: Optional[str] = None
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+    @property
+    def name_terms(self) -> List[str]:
+        """Return the distinct name search terms."""
+        return list(dict.fromkeys(tokenize(self.name)))
+
+    def matcher(self) -> Callable[[Dict[str, Any]], bool]:
+        """Return a function checking a row against every criterion."""
+        username = self.username.lower() if self.username else None
+        email = self.email.lower() if self.email else None
+        is_active, created_from, created_to = (
+            self.is_active, self.created_from, self.created_to
+        )
+        terms = self.name_terms
+
+        def matches(row: Dict[str, Any]) -> bool:
+            if username and not row["username"].lower().startswith(username):
+                return False
+            if email and not row["email"].lower().startswith(email):
+                return False
+            if is_active is not None and row["is_active"] != is_active:
+                return False
+            if created_from is not None and row["created_at"] < created_from:
+                return False
+            if created_to is not None and row["created_at"] >= created_to:
+                return False
+            if terms:
+                tokens = tokenize(row.get("full_name"))
+                return all(any(t.startswith(term) for t in tokens) for term in terms)
+            return True
+
+        return matches
@@ -0,0 +1,82 @@
+"""
+Log Records
+
+This module contains the record format shared by the file-backed stores.
+
+A log entry is ``{"put": row}``, carrying the full row after a create or
+update, or ``{"delete": id}``. Replaying either twice leaves the same
+state, so a reader that sees an entry again does no harm. Each entry is
+framed as its payload length and CRC-32 followed by the JSON payload.
+"""
+
+import json
+import struct
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+# Payload length and CRC-32 of the payload
+RECORD = struct.Struct("<II")
+
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def encode_entry(entry: Dict[str, Any]) -> bytes:
+    """Frame one log entry as a length- and checksum-prefixed record."""
+    payload = json.dumps(entry, separators=(",", ":")).encode()
+    return RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def put_entry(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the entry storing a full row."""
+    stored = dict(row)
+    for field in DATETIME_FIELDS:
+        stored[field] = stored[field].isoformat()
+    return {"put": stored}
+
+
+def delete_entry(user_id: int) -> Dict[str, Any]:
+    """Build the entry removing a row."""
+    return {"delete": user_id}
+
+
+def decode_entries(data: bytes) -> Tuple[List[Dict[str, Any]], int]:
+    """Decode the complete records at the start of ``data``.
+
+    Returns the entries and the number of bytes they took. Decoding stops at
+    the first record that is cut short or fails its checksum.
+    """
+    entries = []
+    position = 0
+    while position + RECORD.size <= len(data):
+        length, checksum = RECORD.unpack_from(data, position)
+        start = position + RECORD.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            break
+        entries.append(json.loads(payload))
+        position = start + length
+    return entries, position
+
+
+def replay(
+    rows: Dict[int, Dict[str, Any]], entries: List[Dict[str, Any]]
+) -> int:
+    """Apply entries to rows keyed by ID; return one past the largest ID seen."""
+    next_id = 1
+    for entry in entries:
+        if "put" in entry:
+            row = decode_row(entry["put"])
+            rows[row["id"]] = row
+            next_id = max(next_id, row["id"] + 1)
+        else:
+            rows.pop(entry["delete"], None)
+            next_id = max(next_id, entry["delete"] + 1)
+    return next_id
+
+
+def decode_row(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a stored row back into a user row."""
+    for field in DATETIME_FIELDS:
+        stored[field] = datetime.fromisoformat(stored[field])
+    return stored
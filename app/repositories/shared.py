@@ -0,0 +1,329 @@
+"""
+Shared User Repository
+
+This module contains a user store that several worker processes on one
+machine share through a file, so ``uvicorn --workers N`` serves the same
+users from every worker without an external database.
+
+The file is an append-only log of records, each the full row written by a
+create or update, or the ID removed by a delete. A fixed header holds the
+committed length of the log; it is memory-mapped, so checking for writes
+made by other workers is a memory read rather than a system call.
+
+Every process keeps the rows in an ``InMemoryUserRepository``, which serves
+reads and owns all the indexes. Before each call the process replays the
+log between its own position and the committed length, so it sees every
+write committed before the call started.
+
+Writes hold an exclusive ``flock`` on the file while they catch up, check
+and apply the write to the local store, append the records and advance the
+committed length. A bulk write commits with a single header update, so
+other workers see all of it or none of it. The critical section never
+yields to the event loop, which keeps writes from the same process from
+interleaving under the lock; it does block the loop while another worker
+holds the lock, which only lasts for that worker's append.
+
+The log is not fsynced, so it shares data between live processes but is
+not a durable database, and it is never compacted: every write grows the
+file and a starting worker replays all of it.
+"""
+
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .base import UserRepository
+from .exceptions import RepositoryError
+from .memory import InMemoryUserRepository
+from .query import UserQuery
+from .records import (
+    decode_entries,
+    decode_row,
+    delete_entry,
+    encode_entry,
+    put_entry,
+    replay,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+MAGIC = b"USERLOG1"
+# Magic, base revision and committed length of the log in bytes
+HEADER = struct.Struct("<8sQQ")
+
+
+def parse_shared_url(database_url: str) -> str:
+    """Return the log file path from a ``shared://`` URL."""
+    scheme, sep, path = database_url.partition("://")
+    if not sep or scheme != "shared":
+        raise ValueError(f"Unsupported database URL: {database_url}")
+    # shared:///./users.log -> ./users.log, shared:////abs/users.log -> /abs/...
+    path = path[1:] if path.startswith("/") else path
+    if not path:
+        raise ValueError(f"Missing file path in database URL: {database_url}")
+    return path
+
+
+class SharedUserRepository(UserRepository):
+    """User store shared by the processes that open the same log file."""
+
+    def __init__(self, database_url: str):
+        if fcntl is None:
+            raise RuntimeError("The shared store needs fcntl, which requires POSIX")
+        self.path = parse_shared_url(database_url)
+        self._fd: Optional[int] = None
+        self._header: Optional[mmap.mmap] = None
+        self._base = 0
+        # Log position this process has replayed up to
+        self._offset = HEADER.size
+        self._local = InMemoryUserRepository()
+        # (id, username) of rows changed by other processes since refresh()
+        self._changed: Set[Tuple[int, str]] = set()
+
+    async def connect(self) -> None:
+        """Open the log, creating it if needed, and load every row."""
+        if self._fd is not None:
+            return
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < HEADER.size:
+                    header = HEADER.pack(MAGIC, time.time_ns() // 1000, HEADER.size)
+                    os.pwrite(fd, header, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._header = mmap.mmap(fd, HEADER.size)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        magic, self._base, _ = HEADER.unpack_from(self._header)
+        if magic != MAGIC:
+            self._header.close()
+            os.close(fd)
+            raise RepositoryError(f"{self.path} is not a user store log")
+        self._fd = fd
+        self._load()
+
+    async def close(self) -> None:
+        """Unmap the header and close the log."""
+        if self._fd is None:
+            return
+        self._header.close()
+        os.close(self._fd)
+        self._header = None
+        self._fd = None
+
+    async def refresh(self) -> List[Tuple[int, str]]:
+        """Catch up with the log and return the rows other processes changed."""
+        self._sync()
+        changed = list(self._changed)
+        self._changed.clear()
+        return changed
+
+    async def count(self) -> int:
+        """Return the number of stored users."""
+        self._sync()
+        return len(self._local)
+
+    async def revision(self) -> int:
+        """Return the collection revision: the committed length of the log.
+
+        The base chosen when the file was created keeps a recreated log from
+        reusing an earlier revision.
+        """
+        return self._base + self._sync()
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a user row by primary key."""
+        self._sync()
+        return await self._local.get(user_id)
+
+    async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get a user row by its unique username."""
+        self._sync()
+        return await self._local.get_by_username(username)
+
+    async def get_by_email(self, email: str) -> List[Dict[str, Any]]:
+        """Get all user rows with the given email address."""
+        self._sync()
+        return await self._local.get_by_email(email)
+
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get the user rows that exist among ``user_ids``."""
+        self._sync()
+        return await self._local.get_many(user_ids)
+
+    async def get_ids_by_username(self, usernames: Iterable[str]) -> Dict[str, int]:
+        """Map the usernames that are taken to their user IDs."""
+        self._sync()
+        return await self._local.get_ids_by_username(usernames)
+
+    async def list(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """List user rows in ID order."""
+        self._sync()
+        return await self._local.list(skip, limit)
+
+    async def list_after(
+        self, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` user rows with an ID greater than ``after_id``."""
+        self._sync()
+        return await self._local.list_after(after_id, limit)
+
+    async def search(
+        self, query: UserQuery, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` matching rows with an ID greater than ``after_id``."""
+        self._sync()
+        return await self._local.search(query, after_id, limit)
+
+    # The in-memory store never suspends, so awaiting it inside _locked()
+    # does not let another coroutine of this process in.
+
+    async def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new user row, allocating its ID across every process."""
+        with self._locked():
+            row = await self._local.add(data)
+            self._commit([put_entry(row)])
+        return row
+
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several user rows; none are inserted if any username is taken."""
+        with self._locked():
+            rows = await self._local.add_many(items)
+            self._commit([put_entry(row) for row in rows])
+        return rows
+
+    async def update(
+        self,
+        user_id: int,
+        changes: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply changes to an existing user row."""
+        with self._locked():
+            row = await self._local.update(user_id, changes, expected_version)
+            if row is not None:
+                self._commit([put_entry(row)])
+        return row
+
+    async def update_many(
+        self, changes: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Apply changes to several user rows; none change on a username clash."""
+        with self._locked():
+            rows = await self._local.update_many(changes)
+            self._commit([put_entry(row) for row in rows.values()])
+        return rows
+
+    async def delete(
+        self, user_id: int, expected_version: Optional[int] = None
+    ) -> bool:
+        """Delete a user row by primary key."""
+        with self._locked():
+            deleted = await self._local.delete(user_id, expected_version)
+            if deleted:
+                self._commit([delete_entry(user_id)])
+        return deleted
+
+    async def delete_many(self, user_ids: Iterable[int]) -> List[int]:
+        """Delete several user rows, returning the IDs that existed."""
+        with self._locked():
+            deleted = await self._local.delete_many(user_ids)
+            self._commit([delete_entry(user_id) for user_id in deleted])
+        return deleted
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the log's exclusive lock, caught up with every committed write."""
+        if self._fd is None:
+            raise RepositoryError("Repository is not connected")
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._sync()
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _committed(self) -> int:
+        return HEADER.unpack_from(self._header)[2]
+
+    def _sync(self) -> int:
+        """Replay records committed by other processes; return the log length."""
+        if self._header is None:
+            raise RepositoryError("Repository is not connected")
+        end = self._committed()
+        if end != self._offset:
+            for entry in self._read(self._offset, end):
+                self._replay(entry)
+            self._offset = end
+        return end
+
+    def _load(self) -> None:
+        """Build the local store from the whole log in one bulk load."""
+        end = self._committed()
+        rows: Dict[int, Dict[str, Any]] = {}
+        next_id = replay(rows, self._read(HEADER.size, end))
+        # IDs are allocated in log order, so first appearance is ID order.
+        self._local = InMemoryUserRepository()
+        self._local._reset(list(rows.values()), next_id)
+        self._offset = end
+
+    def _read(self, start: int, end: int) -> List[Dict[str, Any]]:
+        """Decode the log entries between two offsets."""
+        data = os.pread(self._fd, end - start, start)
+        entries, size = decode_entries(data)
+        if size != end - start:
+            raise RepositoryError(
+                f"Corrupt or missing record at offset {start + size} in {self.path}"
+            )
+        return entries
+
+    def _replay(self, entry: Dict[str, Any]) -> None:
+        """Apply an entry written by another process to the local store."""
+        local = self._local
+        if "put" in entry:
+            row = decode_row(entry["put"])
+            current = local._rows.get(row["id"])
+            if current is not None:
+                self._changed.add((row["id"], current["username"]))
+            local._store(row)
+            self._changed.add((row["id"], row["username"]))
+        else:
+            user_id = entry["delete"]
+            current = local._rows.get(user_id)
+            if current is not None:
+                self._changed.add((user_id, current["username"]))
+                local._remove(user_id)
+
+    def _commit(self, entries: List[Dict[str, Any]]) -> None:
+        """Append records and publish them; call with the lock held.
+
+        The records are written past the committed length before the header
+        moves, so readers never see a partly written record. If the append
+        fails, the local store is rebuilt from the log, which never saw the
+        write.
+        """
+        if not entries:
+            return
+        data = b"".join(encode_entry(entry) for entry in entries)
+        try:
+            written = os.pwrite(self._fd, data, self._offset)
+            if written != len(data):
+                raise OSError(f"short write to {self.path}")
+        except OSError as exc:
+            self._load()
+            raise RepositoryError(f"Failed to write to {self.path}: {exc}") from exc
+        self._offset += len(data)
+        struct.pack_into("<Q", self._header, HEADER.size - 8, self._offset)
+
@@ -0,0 +1,116 @@
+"""
+User Snapshots
+
+This module reads and writes compact binary snapshots of every user row.
+
+A snapshot is a header (magic, next user ID, row count and the first log
+segment not covered by the snapshot), then one record per row and a CRC-32
+of everything before it. A row record is its fixed-width fields (ID,
+version, timestamps as microseconds since the epoch and the active flag)
+followed by its strings, each prefixed by its UTF-8 length, or -1 for None.
+
+Snapshots are written to a temporary file, fsynced and renamed into place,
+so a crash leaves either the old snapshot or the new one, never a mix.
+"""
+
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+MAGIC = b"USERSNP1"
+# Magic, next user ID, row count and first uncovered log segment
+HEADER = struct.Struct("<8sQQQ")
+# ID, version, created_at, updated_at and is_active
+ROW = struct.Struct("<qqqq?")
+LENGTH = struct.Struct("<i")
+CHECKSUM = struct.Struct("<I")
+
+STRING_FIELDS = ("username", "email", "full_name", "password_hash")
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_snapshot(
+    rows: List[Dict[str, Any]], next_id: int, segment: int
+) -> bytes:
+    """Encode rows as a snapshot covering the log up to ``segment``."""
+    parts = [HEADER.pack(MAGIC, next_id, len(rows), segment)]
+    for row in rows:
+        parts.append(ROW.pack(
+            row["id"],
+            row["version"],
+            (row["created_at"] - EPOCH) // MICROSECOND,
+            (row["updated_at"] - EPOCH) // MICROSECOND,
+            row["is_active"],
+        ))
+        for field in STRING_FIELDS:
+            value = row.get(field)
+            if value is None:
+                parts.append(LENGTH.pack(-1))
+            else:
+                encoded = value.encode()
+                parts.append(LENGTH.pack(len(encoded)))
+                parts.append(encoded)
+    data = b"".join(parts)
+    return data + CHECKSUM.pack(zlib.crc32(data))
+
+
+def decode_snapshot(data: bytes) -> Tuple[List[Dict[str, Any]], int, int]:
+    """Decode a snapshot into its rows, next user ID and log segment.
+
+    Raises ValueError if the data is not an intact snapshot.
+    """
+    if len(data) < HEADER.size + CHECKSUM.size:
+        raise ValueError("Snapshot is truncated")
+    body, (checksum,) = data[:-CHECKSUM.size], CHECKSUM.unpack(data[-CHECKSUM.size:])
+    if zlib.crc32(body) != checksum:
+        raise ValueError("Snapshot checksum mismatch")
+    magic, next_id, count, segment = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Not a user snapshot")
+
+    rows = []
+    position = HEADER.size
+    for _ in range(count):
+        user_id, version, created, updated, is_active = ROW.unpack_from(body, position)
+        position += ROW.size
+        row = {
+            "id": user_id,
+            "version": version,
+            "created_at": EPOCH + created * MICROSECOND,
+            "updated_at": EPOCH + updated * MICROSECOND,
+            "is_active": is_active,
+        }
+        for field in STRING_FIELDS:
+            (length,) = LENGTH.unpack_from(body, position)
+            position += LENGTH.size
+            if length < 0:
+                row[field] = None
+            else:
+                row[field] = body[position:position + length].decode()
+                position += length
+        rows.append(row)
+    return rows, next_id, segment
+
+
+def write_snapshot(path: Path, data: bytes) -> None:
+    """Atomically replace the file at ``path`` with ``data``."""
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    sync_directory(path.parent)
+
+
+def sync_directory(directory: Path) -> None:
+    """Make file creations, renames and removals in ``directory`` durable."""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,507 @@
+"""
+SQL User Repository
+
+This module contains an async SQLite storage backend for users built on
+aiosqlite.
+
+Connections are opened once and shared through a small pool. Every hot
+query is a module-level constant, so each pooled connection prepares it
+once and reuses the compiled statement from its statement cache.
+
+Searches use expression indexes on ``lower(username)`` and ``lower(email)``
+for prefixes, an index on ``created_at`` for ranges and a ``user_tokens``
+table of full-name tokens, kept in step with every write. SQLite's
+``lower()`` only folds ASCII letters, so prefix searches on non-ASCII
+characters are case-sensitive with this backend.
+"""
+
+import asyncio
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .base import UserRepository
+from .exceptions import RepositoryError, UserAlreadyExistsError, VersionConflictError
+from .query import PREFIX_END, UserQuery, tokenize
+
+try:
+    import aiosqlite
+except ImportError:  # pragma: no cover - optional dependency
+    aiosqlite = None
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    full_name TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    password_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS ix_users_username_lower ON users (lower(username));
+CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email));
+CREATE INDEX IF NOT EXISTS ix_users_created_at ON users (created_at);
+CREATE TABLE IF NOT EXISTS user_tokens (
+    token TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (token, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_user_tokens_user_id ON user_tokens (user_id);
+CREATE TABLE IF NOT EXISTS user_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+COLUMNS = (
+    "id, username, email, full_name, is_active, created_at, updated_at, version, "
+    "password_hash"
+)
+UPDATABLE_COLUMNS = ("username", "email", "full_name", "is_active")
+
+SELECT_BY_ID = f"SELECT {COLUMNS} FROM users WHERE id = ?"
+SELECT_BY_USERNAME = f"SELECT {COLUMNS} FROM users WHERE username = ?"
+SELECT_BY_EMAIL = f"SELECT {COLUMNS} FROM users WHERE email = ? ORDER BY id"
+SELECT_PAGE = f"SELECT {COLUMNS} FROM users ORDER BY id LIMIT ? OFFSET ?"
+SELECT_FIRST = f"SELECT {COLUMNS} FROM users ORDER BY id LIMIT ?"
+SELECT_AFTER = f"SELECT {COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?"
+SELECT_COUNT = "SELECT COUNT(*) FROM users"
+INSERT_USER = (
+    "INSERT INTO users "
+    "(username, email, full_name, is_active, created_at, updated_at, password_hash) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+DELETE_BY_ID = "DELETE FROM users WHERE id = ?"
+DELETE_BY_ID_AND_VERSION = "DELETE FROM users WHERE id = ? AND version = ?"
+SELECT_EXISTS = "SELECT 1 FROM users WHERE id = ?"
+# The revision starts from the clock so a recreated database never reuses one.
+INIT_REVISION = "INSERT OR IGNORE INTO user_meta (name, value) VALUES ('revision', ?)"
+SELECT_REVISION = "SELECT value FROM user_meta WHERE name = 'revision'"
+BUMP_REVISION = "UPDATE user_meta SET value = value + 1 WHERE name = 'revision'"
+INSERT_TOKEN = "INSERT OR IGNORE INTO user_tokens (token, user_id) VALUES (?, ?)"
+DELETE_TOKENS = "DELETE FROM user_tokens WHERE user_id = ?"
+SELECT_TOKENS_INDEXED = "SELECT value FROM user_meta WHERE name = 'tokens_indexed'"
+MARK_TOKENS_INDEXED = "INSERT INTO user_meta (name, value) VALUES ('tokens_indexed', 1)"
+
+STATEMENT_CACHE_SIZE = 256
+
+
+def parse_sqlite_url(database_url: str) -> str:
+    """Return the database path from a ``sqlite://`` style URL."""
+    scheme, sep, path = database_url.partition("://")
+    if not sep or scheme not in ("sqlite", "sqlite+aiosqlite"):
+        raise ValueError(f"Unsupported database URL: {database_url}")
+    # sqlite:///./app.db -> ./app.db, sqlite:////abs/app.db -> /abs/app.db
+    path = path[1:] if path.startswith("/") else path
+    return path or ":memory:"
+
+
+def _to_row(record: sqlite3.Row) -> Dict[str, Any]:
+    """Convert a database record into a user row."""
+    return {
+        "id": record[0],
+        "username": record[1],
+        "email": record[2],
+        "full_name": record[3],
+        "is_active": bool(record[4]),
+        "created_at": datetime.fromisoformat(record[5]),
+        "updated_at": datetime.fromisoformat(record[6]),
+        "version": record[7],
+        "password_hash": record[8],
+    }
+
+
+def _new_row(user_id: int, data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Build the row for a freshly inserted user."""
+    return {
+        "id": user_id,
+        "username": data["username"],
+        "email": data["email"],
+        "full_name": data.get("full_name"),
+        "is_active": bool(data.get("is_active", True)),
+        "created_at": now,
+        "updated_at": now,
+        "version": 1,
+        "password_hash": data.get("password_hash"),
+    }
+
+
+def _insert_params(data: Dict[str, Any], now: datetime) -> tuple:
+    return (
+        data["username"],
+        data["email"],
+        data.get("full_name"),
+        int(data.get("is_active", True)),
+        now.isoformat(),
+        now.isoformat(),
+        data.get("password_hash"),
+    )
+
+
+def _update_statement(
+    changes: Dict[str, Any], conditional: bool = False
+) -> Tuple[str, list]:
+    """Build an UPDATE for the changed columns.
+
+    The SQL only depends on which columns changed, so the statement cache
+    holds one prepared statement per combination.
+    """
+    columns = [column for column in UPDATABLE_COLUMNS if column in changes]
+    assignments = "".join(f"{column} = ?, " for column in columns)
+    params = [
+        int(changes[column]) if column == "is_active" else changes[column]
+        for column in columns
+    ]
+    sql = (
+        f"UPDATE users SET {assignments}updated_at = ?, version = version + 1 "
+        "WHERE id = ?"
+    )
+    return sql + " AND version = ?" if conditional else sql, params
+
+
+def _token_params(user_id: int, full_name: Optional[str]) -> List[tuple]:
+    return [(token, user_id) for token in set(tokenize(full_name))]
+
+
+def _search_statement(
+    query: UserQuery, after_id: Optional[int], limit: int
+) -> Tuple[str, list]:
+    """Build a SELECT for a search.
+
+    Like ``_update_statement``, the SQL only depends on which criteria are
+    set, so the statement cache keeps one prepared statement per shape.
+    """
+    clauses = ["id > ?"]
+    params: list = [after_id if after_id is not None else 0]
+    for column, prefix in (("username", query.username), ("email", query.email)):
+        if prefix:
+            clauses.append(f"lower({column}) >= ? AND lower({column}) < ?")
+            params += [prefix.lower(), prefix.lower() + PREFIX_END]
+    if query.is_active is not None:
+        clauses.append("is_active = ?")
+        params.append(int(query.is_active))
+    if query.created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(query.created_from.isoformat())
+    if query.created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(query.created_to.isoformat())
+    for term in query.name_terms:
+        clauses.append(
+            "id IN (SELECT user_id FROM user_tokens WHERE token >= ? AND token < ?)"
+        )
+        params += [term, term + PREFIX_END]
+
+    where = " AND ".join(clauses)
+    params.append(limit)
+    return f"SELECT {COLUMNS} FROM users WHERE {where} ORDER BY id LIMIT ?", params
+
+
+def _username_taken(error: sqlite3.IntegrityError) -> bool:
+    """Whether an integrity error is a clash on the unique username index."""
+    return str(error) == "UNIQUE constraint failed: users.username"
+
+
+def _placeholders(values: list) -> str:
+    return ", ".join("?" * len(values))
+
+
+def _chunks(values: list, size: int = 500) -> Iterator[list]:
+    """Split values to stay under SQLite's bound parameter limit."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SQLiteUserRepository(UserRepository):
+    """User store backed by SQLite through a pool of aiosqlite connections."""
+
+    def __init__(self, database_url: str, pool_size: int = 5):
+        if aiosqlite is None:
+            raise RuntimeError(
+                "The SQLite backend requires aiosqlite: pip install aiosqlite"
+            )
+        self.database = parse_sqlite_url(database_url)
+        # Every connection to ":memory:" is a separate database.
+        self.pool_size = 1 if self.database == ":memory:" else max(1, pool_size)
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[Any] = []
+
+    async def connect(self) -> None:
+        """Open the connection pool and create the schema."""
+        if self._pool is not None:
+            return
+
+        self._pool = asyncio.Queue()
+        for _ in range(self.pool_size):
+            conn = await aiosqlite.connect(
+                self.database, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA busy_timeout=5000")
+            self._connections.append(conn)
+            self._pool.put_nowait(conn)
+
+        async with self._connection() as conn:
+            await conn.executescript(SCHEMA)
+            async with conn.execute("PRAGMA table_info(users)") as cursor:
+                columns = {record[1] for record in await cursor.fetchall()}
+            if "version" not in columns:
+                # Databases created before row versions were tracked
+                await conn.execute(
+                    "ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+                )
+            if "password_hash" not in columns:
+                # Databases created before passwords were stored
+                await conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT")
+            await conn.execute(INIT_REVISION, (time.time_ns() // 1000,))
+            await self._index_tokens(conn)
+            await conn.commit()
+
+    @staticmethod
+    async def _index_tokens(conn: Any) -> None:
+        """Fill user_tokens for databases created before name search."""
+        async with conn.execute(SELECT_TOKENS_INDEXED) as cursor:
+            if await cursor.fetchone() is not None:
+                return
+        async with conn.execute("SELECT id, full_name FROM users") as cursor:
+            users = await cursor.fetchall()
+        await conn.executemany(
+            INSERT_TOKEN,
+            [param for user in users for param in _token_params(*user)],
+        )
+        await conn.execute(MARK_TOKENS_INDEXED)
+
+    async def close(self) -> None:
+        """Close every pooled connection."""
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._pool = None
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[Any]:
+        """Borrow a connection from the pool."""
+        if self._pool is None:
+            raise RepositoryError("Repository is not connected")
+        conn = await self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put_nowait(conn)
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[Any]:
+        """Borrow a connection and run a write transaction on it.
+
+        BEGIN IMMEDIATE takes the write lock up front, so every statement in
+        the block commits or rolls back together.
+        """
+        async with self._connection() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                await conn.execute(BUMP_REVISION)
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    async def revision(self) -> int:
+        """Return the collection revision."""
+        async with self._connection() as conn:
+            async with conn.execute(SELECT_REVISION) as cursor:
+                (revision,) = await cursor.fetchone()
+        return revision
+
+    async def _fetch_one(self, sql: str, params: tuple) -> Optional[Dict[str, Any]]:
+        async with self._connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                record = await cursor.fetchone()
+        return _to_row(record) if record else None
+
+    async def _fetch_all(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        async with self._connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                records = await cursor.fetchall()
+        return [_to_row(record) for record in records]
+
+    async def count(self) -> int:
+        """Return the number of stored users."""
+        async with self._connection() as conn:
+            async with conn.execute(SELECT_COUNT) as cursor:
+                (total,) = await cursor.fetchone()
+        return total
+
+    async def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get a user row by primary key."""
+        return await self._fetch_one(SELECT_BY_ID, (user_id,))
+
+    async def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        """Get a user row by its unique username."""
+        return await self._fetch_one(SELECT_BY_USERNAME, (username,))
+
+    async def get_by_email(self, email: str) -> List[Dict[str, Any]]:
+        """Get all user rows with the given email address."""
+        return await self._fetch_all(SELECT_BY_EMAIL, (email,))
+
+    async def list(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """List user rows in ID order."""
+        return await self._fetch_all(SELECT_PAGE, (limit, skip))
+
+    async def list_after(
+        self, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` user rows with an ID greater than ``after_id``."""
+        if after_id is None:
+            return await self._fetch_all(SELECT_FIRST, (limit,))
+        return await self._fetch_all(SELECT_AFTER, (after_id, limit))
+
+    async def search(
+        self, query: UserQuery, after_id: Optional[int] = None, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """List up to ``limit`` matching rows with an ID greater than ``after_id``."""
+        sql, params = _search_statement(query, after_id, limit)
+        return await self._fetch_all(sql, tuple(params))
+
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get the user rows that exist among ``user_ids``, keyed by ID."""
+        rows = {}
+        for chunk in _chunks(list(user_ids)):
+            sql = f"SELECT {COLUMNS} FROM users WHERE id IN ({_placeholders(chunk)})"
+            for row in await self._fetch_all(sql, tuple(chunk)):
+                rows[row["id"]] = row
+        return rows
+
+    async def get_ids_by_username(self, usernames: Iterable[str]) -> Dict[str, int]:
+        """Map the usernames that are already taken to their user IDs."""
+        taken = {}
+        async with self._connection() as conn:
+            for chunk in _chunks(list(usernames)):
+                sql = (
+                    "SELECT username, id FROM users "
+                    f"WHERE username IN ({_placeholders(chunk)})"
+                )
+                async with conn.execute(sql, tuple(chunk)) as cursor:
+                    taken.update(await cursor.fetchall())
+        return taken
+
+    async def add(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Insert a new user row and return it with its allocated ID."""
+        return (await self.add_many([data]))[0]
+
+    async def add_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert several user rows in one transaction."""
+        now = datetime.utcnow()
+        rows = []
+        async with self._transaction() as conn:
+            for data in items:
+                try:
+                    cursor = await conn.execute(INSERT_USER, _insert_params(data, now))
+                except sqlite3.IntegrityError as exc:
+                    if not _username_taken(exc):
+                        raise
+                    raise UserAlreadyExistsError(data["username"]) from exc
+                row = _new_row(cursor.lastrowid, data, now)
+                await conn.executemany(
+                    INSERT_TOKEN, _token_params(row["id"], row["full_name"])
+                )
+                rows.append(row)
+        return rows
+
+    async def update(
+        self,
+        user_id: int,
+        changes: Dict[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Apply changes to a user row, returning None if it does not exist."""
+        rows = await self._update_rows({user_id: changes}, {user_id: expected_version})
+        return rows.get(user_id)
+
+    async def update_many(
+        self, changes: Dict[int, Dict[str, Any]]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Apply changes to several user rows in one transaction."""
+        return await self._update_rows(changes, {})
+
+    async def _update_rows(
+        self,
+        changes: Dict[int, Dict[str, Any]],
+        expected_versions: Dict[int, Optional[int]],
+    ) -> Dict[int, Dict[str, Any]]:
+        now = datetime.utcnow().isoformat()
+        rows = {}
+        async with self._transaction() as conn:
+            for user_id, user_changes in changes.items():
+                expected = expected_versions.get(user_id)
+                sql, params = _update_statement(user_changes, expected is not None)
+                params = (*params, now, user_id)
+                if expected is not None:
+                    params += (expected,)
+                try:
+                    cursor = await conn.execute(sql, params)
+                except sqlite3.IntegrityError as exc:
+                    # Only a change of username can clash on its unique index
+                    if not _username_taken(exc):
+                        raise
+                    raise UserAlreadyExistsError(user_changes.get("username")) from exc
+                if cursor.rowcount == 0:
+                    if expected is not None and await self._exists(conn, user_id):
+                        raise VersionConflictError(user_id)
+                    continue
+                async with conn.execute(SELECT_BY_ID, (user_id,)) as cursor:
+                    row = rows[user_id] = _to_row(await cursor.fetchone())
+                if "full_name" in user_changes:
+                    await conn.execute(DELETE_TOKENS, (user_id,))
+                    await conn.executemany(
+                        INSERT_TOKEN, _token_params(user_id, row["full_name"])
+                    )
+        return rows
+
+    async def delete(
+        self, user_id: int, expected_version: Optional[int] = None
+    ) -> bool:
+        """Delete a user row, returning False if it does not exist."""
+        if expected_version is None:
+            return bool(await self.delete_many([user_id]))
+
+        async with self._transaction() as conn:
+            cursor = await conn.execute(
+                DELETE_BY_ID_AND_VERSION, (user_id, expected_version)
+            )
+            if cursor.rowcount == 0 and await self._exists(conn, user_id):
+                raise VersionConflictError(user_id)
+            await conn.execute(DELETE_TOKENS, (user_id,))
+        return cursor.rowcount > 0
+
+    @staticmethod
+    async def _exists(conn: Any, user_id: int) -> bool:
+        async with conn.execute(SELECT_EXISTS, (user_id,)) as cursor:
+            return await cursor.fetchone() is not None
+
+    async def delete_many(self, user_ids: Iterable[int]) -> List[int]:
+        """Delete several user rows in one transaction; return the IDs that existed."""
+        deleted = []
+        async with self._transaction() as conn:
+            for user_id in user_ids:
+                cursor = await conn.execute(DELETE_BY_ID, (user_id,))
+                if cursor.rowcount:
+                    await conn.execute(DELETE_TOKENS, (user_id,))
+                    deleted.append(user_id)
+        return deleted
@@ -0,0 +1,217 @@
+"""
+Write-Ahead Log
+
+This module contains ``WriteAheadLog``, an append-only log of user store
+records split into numbered segment files, with group commit.
+
+Appends only queue their records. A background task writes everything
+queued so far with a single ``write`` and, depending on the fsync policy,
+a single ``fsync`` in a worker thread. Writes that arrive while a batch is
+being synced form the next batch, so under load many writes share one
+fsync instead of paying for one each.
+
+Fsync policies:
+
+- ``always``: an append returns once its batch is fsynced. Nothing that was
+  acknowledged is lost, even if the machine crashes.
+- ``interval``: batches are written and fsynced every ``interval`` seconds
+  and appends return at once. A crash loses at most that window.
+- ``never``: batches are written every ``interval`` seconds and the
+  operating system decides when they reach the disk.
+
+``rotate`` starts a new segment, so a snapshot can make the older ones
+redundant.
+
+Once a batch fails to be written, the log refuses every later batch and
+append until it is reopened, so it never has a gap in the middle.
+"""
+
+import asyncio
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .exceptions import RepositoryError
+from .snapshot import sync_directory
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+SEGMENT_NAME = "wal-{:010d}.log"
+_SEGMENT = re.compile(r"wal-(\d{10})\.log$")
+
+
+def list_segments(directory: Path) -> List[int]:
+    """Return the numbers of the log segments in ``directory``, in order."""
+    numbers = []
+    for path in directory.iterdir():
+        match = _SEGMENT.match(path.name)
+        if match:
+            numbers.append(int(match.group(1)))
+    return sorted(numbers)
+
+
+def segment_path(directory: Path, number: int) -> Path:
+    return directory / SEGMENT_NAME.format(number)
+
+
+class WriteAheadLog:
+    """Segmented append-only log with batched writes and fsyncs."""
+
+    def __init__(
+        self, directory: Path, fsync: str = "always", interval: float = 1.0
+    ):
+        if fsync not in FSYNC_POLICIES:
+            choices = ", ".join(FSYNC_POLICIES)
+            raise ValueError(f"Unknown fsync policy {fsync!r}; use one of {choices}")
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.interval = interval
+        self.segment: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._pending: List[bytes] = []
+        self._waiters: List[asyncio.Future] = []
+        self._wake = asyncio.Event()
+        # Held while a batch is written, so rotation never splits one
+        self._io = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._stats = {"records": 0, "batches": 0, "fsyncs": 0}
+
+    @property
+    def is_open(self) -> bool:
+        return self._fd is not None
+
+    async def open(self, segment: int) -> None:
+        """Start appending to a new segment and start the background writer."""
+        self._fd = await asyncio.to_thread(self._create, segment)
+        self.segment = segment
+        self._closing = False
+        self._error = None
+        self._flusher = asyncio.create_task(self._run())
+
+    async def append(self, data: bytes, records: int = 1) -> None:
+        """Queue encoded records; with ``always``, wait until they are fsynced."""
+        self.check()
+        self._pending.append(data)
+        self._stats["records"] += records
+        if self.fsync != "always":
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._wake.set()
+        await waiter
+
+    def check(self) -> None:
+        """Raise RepositoryError unless records can be appended."""
+        if self._fd is None:
+            raise RepositoryError("Write-ahead log is not open")
+        if self._error is not None:
+            raise RepositoryError(f"Write-ahead log failed: {self._error}")
+
+    async def flush(self) -> None:
+        """Write, and unless the policy is ``never`` fsync, every queued record."""
+        async with self._io:
+            await self._write_pending()
+
+    async def rotate(self) -> int:
+        """Finish the current segment and start the next; return its number.
+
+        Records queued before the call end up in the finished segment or the
+        new one; records queued after it always go to the new one.
+        """
+        async with self._io:
+            await self._write_pending()
+            segment = self.segment + 1
+            fd = await asyncio.to_thread(self._create, segment)
+            old, self._fd, self.segment = self._fd, fd, segment
+            await asyncio.to_thread(self._close_fd, old, self.fsync != "always")
+        return segment
+
+    async def close(self) -> None:
+        """Stop the background writer, then write and fsync what is queued."""
+        if self._fd is None:
+            return
+        # Not cancelled: a batch being written must still resolve its waiters.
+        self._closing = True
+        self._wake.set()
+        await self._flusher
+        async with self._io:
+            await self._write_pending()
+            await asyncio.to_thread(self._close_fd, self._fd, True)
+        self._fd = None
+
+    def stats(self) -> Dict[str, int]:
+        """Return counts of records appended, batches written and fsyncs."""
+        return dict(self._stats)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            if self.fsync == "always":
+                await self._wake.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                # Keep running: writers waiting on a batch must be answered
+                self._error = self._error or exc
+                self._fail(self._waiters)
+                self._pending, self._waiters = [], []
+
+    async def _write_pending(self) -> None:
+        """Write the queued batch; call with ``_io`` held."""
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        waiters = self._waiters
+        self._pending, self._waiters = [], []
+        sync = self.fsync != "never"
+        if self._error is None:
+            try:
+                await asyncio.to_thread(self._write, self._fd, data, sync)
+            except Exception as exc:
+                # Later batches fail too rather than leave a gap in the log.
+                self._error = exc
+        if self._error is not None:
+            self._fail(waiters)
+            return
+        self._stats["batches"] += 1
+        self._stats["fsyncs"] += sync
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _fail(self, waiters: List[asyncio.Future]) -> None:
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(
+                    RepositoryError(f"Write-ahead log failed: {self._error}")
+                )
+
+    def _create(self, segment: int) -> int:
+        path = segment_path(self.directory, segment)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        sync_directory(self.directory)
+        return fd
+
+    @staticmethod
+    def _write(fd: int, data: bytes, sync: bool) -> None:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if sync:
+            os.fsync(fd)
+
+    @staticmethod
+    def _close_fd(fd: int, sync: bool) -> None:
+        try:
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -7,6 +7,7 @@ access to all Pydantic models used in the application.
 
 from .base import (
     BaseSchema,
+    ResponseSchema,
     TimestampMixin,
     HealthCheckResponse,
     ErrorResponse,
@@ -17,12 +18,21 @@ from .user import (
     UserCreate,
     UserUpdate,
     UserResponse,
+    UserPage,
+    UserBulkCreate,
+    UserBulkUpdateItem,
+    UserBulkUpdate,
+    UserBulkDelete,
+    BulkItemResult,
+    BulkResponse,
     UserLogin,
+    TokenResponse,
 )
 
 __all__ = [
     # Base schemas
     "BaseSchema",
+    "ResponseSchema",
     "TimestampMixin", 
     "HealthCheckResponse",
     "ErrorResponse",
@@ -32,5 +42,13 @@ __all__ = [
     "UserCreate",
     "UserUpdate", 
     "UserResponse",
+    "UserPage",
+    "UserBulkCreate",
+    "UserBulkUpdateItem",
+    "UserBulkUpdate",
+    "UserBulkDelete",
+    "BulkItemResult",
+    "BulkResponse",
     "UserLogin",
+    "TokenResponse",
 ]
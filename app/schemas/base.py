@@ -20,6 +20,16 @@ class BaseSchema(BaseModel):
     }
 
 
+class ResponseSchema(BaseSchema):
+    """Base schema for response-only models.
+    
+    Responses are built once and serialized, never assigned to afterwards,
+    so they skip the per-assignment validation of ``BaseSchema``.
+    """
+    
+    model_config = {"validate_assignment": False}
+
+
 class TimestampMixin(BaseModel):
     """Mixin for timestamp fields."""
     
@@ -27,7 +37,7 @@ class TimestampMixin(BaseModel):
     updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
 
 
-class HealthCheckResponse(BaseSchema):
+class HealthCheckResponse(ResponseSchema):
     """Health check response schema."""
     
     status: str = Field(..., description="Application status")
@@ -36,7 +46,7 @@ class HealthCheckResponse(BaseSchema):
     environment: str = Field(..., description="Current environment")
 
 
-class ErrorResponse(BaseSchema):
+class ErrorResponse(ResponseSchema):
     """Standard error response schema."""
     
     error: bool = True
@@ -45,7 +55,7 @@ class ErrorResponse(BaseSchema):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
-class SuccessResponse(BaseSchema):
+class SuccessResponse(ResponseSchema):
     """Standard success response schema."""
     
     success: bool = True
@@ -4,9 +4,9 @@ User Schemas
 This module contains Pydantic models for user-related operations.
 """
 
-from typing import Optional
-from pydantic import BaseModel, Field, EmailStr
-from .base import BaseSchema, TimestampMixin
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from .base import BaseSchema, ResponseSchema, TimestampMixin
 
 
 class UserBase(BaseSchema):
@@ -32,6 +32,14 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = Field(None, max_length=100)
     is_active: Optional[bool] = None
 
+    @field_validator("username", "email", "is_active")
+    @classmethod
+    def reject_null(cls, v):
+        """Allow these fields to be left out, but not set to null."""
+        if v is None:
+            raise ValueError("may be omitted but cannot be null")
+        return v
+
 
 class UserResponse(UserBase, TimestampMixin):
     """Schema for user response."""
@@ -41,8 +49,72 @@ class UserResponse(UserBase, TimestampMixin):
     model_config = {"from_attributes": True}
 
 
+class UserPage(ResponseSchema):
+    """Schema for a keyset-paginated page of users."""
+    
+    items: List[UserResponse] = Field(..., description="Users on this page")
+    next_cursor: Optional[str] = Field(
+        None, description="Cursor for the next page, or null on the last page"
+    )
+
+
+MAX_BULK_ITEMS = 1000
+
+
+class UserBulkCreate(BaseModel):
+    """Schema for creating users in one batch."""
+    
+    items: List[UserCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class UserBulkUpdateItem(UserUpdate):
+    """Schema for one user update in a batch."""
+    
+    id: int = Field(..., description="ID of the user to update")
+
+
+class UserBulkUpdate(BaseModel):
+    """Schema for updating users in one batch."""
+    
+    items: List[UserBulkUpdateItem] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class UserBulkDelete(BaseModel):
+    """Schema for deleting users in one batch."""
+    
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+class BulkItemResult(ResponseSchema):
+    """Outcome of one item in a bulk operation."""
+    
+    index: int = Field(..., description="Position of the item in the request")
+    status: Literal["created", "updated", "deleted", "error"]
+    status_code: int = Field(..., description="HTTP status the item would have on its own")
+    id: Optional[int] = Field(None, description="User ID, if known")
+    user: Optional[UserResponse] = None
+    error: Optional[str] = None
+
+
+class BulkResponse(ResponseSchema):
+    """Schema for bulk operation results."""
+    
+    succeeded: int = Field(..., description="Number of items applied")
+    failed: int = Field(..., description="Number of items rejected")
+    results: List[BulkItemResult]
+
+
 class UserLogin(BaseModel):
     """Schema for user login."""
     
     username: str = Field(..., description="Username or email")
     password: str = Field(..., description="User password")
+
+
+class TokenResponse(ResponseSchema):
+    """Schema for an issued access token."""
+    
+    access_token: str = Field(..., description="Bearer token for the Authorization header")
+    token_type: Literal["bearer"] = "bearer"
+    expires_in: int = Field(..., description="Seconds until the token expires")
+    user: UserResponse
@@ -4,111 +4,712 @@ User Service
 This module contains business logic for user-related operations.
 """
 
-from typing import List, Optional
-from datetime import datetime
-from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+)
+from datetime import datetime, timezone
+from pydantic import TypeAdapter
+from app.core.cache import CacheBackend, LRUCache
+from app.core.conditional import Representation, collection_etag, if_match, user_etag
+from app.core.config import settings
+from app.core.locks import StripedLock
+from app.core.metrics import LOGIN_RATE_LIMITED, timed
+from app.core.pagination import encode_cursor
+from app.core.ratelimit import KeyedRateLimiter, RateLimitExceeded
+from app.core.security import PasswordHasher
+from app.core.singleflight import SingleFlight
+from app.core.timing import span
+from app.repositories import (
+    InMemoryUserRepository,
+    UserAlreadyExistsError,
+    UserQuery,
+    UserRepository,
+    UserRow,
+    VersionConflictError,
+)
+from app.schemas.user import (
+    BulkItemResult,
+    UserBulkUpdateItem,
+    UserCreate,
+    UserPage,
+    UserResponse,
+    UserUpdate,
+)
+
+
+# Bumped on every write; versions cached lists and guards read-through fills.
+USERS_GENERATION_KEY = "users:generation"
+
+_user_list_adapter = TypeAdapter(List[UserResponse])
+
+
+def _default_users() -> List[dict]:
+    """Seed users for the default in-memory store."""
+    return [
+        {
+            "id": 1,
+            "username": "admin",
+            "email": "admin@example.com",
+            "full_name": "Administrator",
+            "is_active": True,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        },
+        {
+            "id": 2,
+            "username": "user",
+            "email": "user@example.com",
+            "full_name": "Regular User",
+            "is_active": True,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        },
+    ]
 
 
 class UserService:
-    """Service class for user operations."""
-    
-    def __init__(self):
-        # In a real application, this would be a database
-        self._users_db = [
-            {
-                "id": 1,
-                "username": "admin",
-                "email": "admin@example.com",
-                "full_name": "Administrator",
-                "is_active": True,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            },
-            {
-                "id": 2,
-                "username": "user",
-                "email": "user@example.com", 
-                "full_name": "Regular User",
-                "is_active": True,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow(),
-            }
-        ]
+    """Service class for user operations.
+    
+    Writes hold striped locks on the user IDs and usernames they touch, so
+    each write's read-check-write sequence (and its cache invalidation) runs
+    without interleaving with other writes to the same user or name, while
+    writes to unrelated users proceed concurrently. The locks are per
+    process; across workers the repository's unique username index and
+    version checks remain the guarantee.
+    
+    Passwords are hashed and verified on ``hasher``'s worker pool, never
+    on the event loop, and login attempts are rate limited per username.
+    
+    Concurrent identical JSON reads that miss the cache share one load and
+    its serialized body through ``flights``.
+    """
     
+    def __init__(
+        self,
+        repository: Optional[UserRepository] = None,
+        cache: Optional[CacheBackend] = None,
+        locks: Optional[StripedLock] = None,
+        hasher: Optional[PasswordHasher] = None,
+        login_limiter: Optional[KeyedRateLimiter] = None,
+        flights: Optional[SingleFlight] = None,
+    ):
+        # Defaults to the in-memory store; lifespan swaps in the backend
+        # selected by DATABASE_URL.
+        if repository is None:
+            repository = InMemoryUserRepository(_default_users())
+        self.repository = repository
+        self.cache = cache
+        self.locks = locks if locks is not None else StripedLock()
+        self.hasher = hasher if hasher is not None else _create_hasher()
+        self.login_limiter = (
+            login_limiter if login_limiter is not None else _create_login_limiter()
+        )
+        self.flights = flights if flights is not None else SingleFlight()
+    
+    @timed("get_users_json")
+    async def get_users_json(self, skip: int = 0, limit: int = 100) -> Representation:
+        """Get a page of users as a JSON array with its ETag, through the cache."""
+        generation = 0
+        if self.cache is not None:
+            generation = await self.cache.counter(USERS_GENERATION_KEY)
+        
+        async def load() -> Representation:
+            # Read the revision first: a write racing the list can only make
+            # the ETag older than the body, never newer.
+            with span("store"):
+                revision = await self.repository.revision()
+            etag = collection_etag(revision, skip, limit)
+            users = await self.get_users(skip, limit)
+            with span("build"):
+                return Representation(_user_list_adapter.dump_json(users), etag)
+        
+        return await self._read_through(("users", generation, skip, limit), load)
+    
+    @timed("get_user_json")
+    async def get_user_json(self, user_id: int) -> Optional[Representation]:
+        """Get a user as JSON with its ETag, through the cache."""
+        async def load() -> Optional[Representation]:
+            with span("store"):
+                row = await self.repository.get(user_id)
+            with span("build"):
+                return _user_representation(row)
+        
+        return await self._read_through(("user", user_id), load)
+    
+    @timed("get_user_by_username_json")
+    async def get_user_by_username_json(
+        self, username: str
+    ) -> Optional[Representation]:
+        """Get a user by username as JSON with its ETag, through the cache."""
+        async def load() -> Optional[Representation]:
+            with span("store"):
+                row = await self.repository.get_by_username(username)
+            with span("build"):
+                return _user_representation(row)
+        
+        return await self._read_through(("username", username), load)
+    
+    @timed("get_users")
     async def get_users(self, skip: int = 0, limit: int = 100) -> List[UserResponse]:
         """Get all users with pagination."""
-        users = self._users_db[skip:skip + limit]
-        return [UserResponse(**user) for user in users]
+        with span("store"):
+            users = await self.repository.list(skip=skip, limit=limit)
+        with span("build"):
+            return [_user_response(user) for user in users]
+    
+    @timed("get_users_page")
+    async def get_users_page(
+        self, after: Optional[int] = None, limit: int = 100
+    ) -> UserPage:
+        """Get a page of users with an ID greater than ``after``."""
+        # Fetch one extra row to know whether another page follows.
+        with span("store"):
+            users = await self.repository.list_after(after, limit + 1)
+        next_cursor = None
+        if len(users) > limit:
+            next_cursor = encode_cursor(users[limit - 1]["id"])
+        with span("build"):
+            return UserPage(
+                items=[_user_response(user) for user in users[:limit]],
+                next_cursor=next_cursor,
+            )
+    
+    @timed("search_users")
+    async def search_users(
+        self, query: UserQuery, after: Optional[int] = None, limit: int = 100
+    ) -> UserPage:
+        """Search users, returning a page in ID order with a cursor to the next."""
+        query = query._replace(
+            created_from=_naive_utc(query.created_from),
+            created_to=_naive_utc(query.created_to),
+        )
+        with span("store"):
+            users = await self.repository.search(query, after, limit + 1)
+        next_cursor = None
+        if len(users) > limit:
+            next_cursor = encode_cursor(users[limit - 1]["id"])
+        with span("build"):
+            return UserPage(
+                items=[_user_response(user) for user in users[:limit]],
+                next_cursor=next_cursor,
+            )
     
+    async def iter_users(
+        self, is_active: Optional[bool] = None, batch_size: int = 500
+    ) -> AsyncIterator[List[UserResponse]]:
+        """Iterate over all users in ID order, one batch at a time.
+        
+        Batches are read with keyset pagination, so memory stays bounded by
+        ``batch_size`` however many users are stored.
+        """
+        after = None
+        while True:
+            users = await self.repository.list_after(after, batch_size)
+            if not users:
+                return
+            after = users[-1]["id"]
+            batch = [
+                _user_response(user)
+                for user in users
+                if is_active is None or user["is_active"] == is_active
+            ]
+            if batch:
+                yield batch
+            if len(users) < batch_size:
+                return
+    
+    @timed("get_user_by_id")
     async def get_user_by_id(self, user_id: int) -> Optional[UserResponse]:
         """Get user by ID."""
-        user = next((u for u in self._users_db if u["id"] == user_id), None)
-        return UserResponse(**user) if user else None
+        with span("store"):
+            user = await self.repository.get(user_id)
+        return _user_response(user) if user else None
     
+    @timed("get_user_by_username")
     async def get_user_by_username(self, username: str) -> Optional[UserResponse]:
         """Get user by username."""
-        user = next((u for u in self._users_db if u["username"] == username), None)
-        return UserResponse(**user) if user else None
+        with span("store"):
+            user = await self.repository.get_by_username(username)
+        return _user_response(user) if user else None
     
+    @timed("create_user")
     async def create_user(self, user_data: UserCreate) -> UserResponse:
-        """Create a new user."""
-        new_id = max(u["id"] for u in self._users_db) + 1 if self._users_db else 1
-        new_user = {
-            "id": new_id,
-            "username": user_data.username,
-            "email": user_data.email,
-            "full_name": user_data.full_name,
-            "is_active": user_data.is_active,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
-        }
-        self._users_db.append(new_user)
-        return UserResponse(**new_user)
+        """Create a new user if the username is free.
+        
+        The check and the insert are one atomic step: raises
+        UserAlreadyExistsError if the username is taken, or
+        PasswordHasherBusyError if the hashing pool is at capacity.
+        """
+        # A taken username is rejected before any work goes into hashing;
+        # it is checked again under the lock. Hash before locking so the
+        # slow part never holds a stripe.
+        with span("store"):
+            if await self.repository.get_by_username(user_data.username) is not None:
+                raise UserAlreadyExistsError(user_data.username)
+        with span("hash"):
+            password_hash = await self.hasher.hash(user_data.password)
+        async with self.locks.hold(_username_key(user_data.username)):
+            with span("store"):
+                new_user = await self.repository.add(
+                    self._new_user_data(user_data, password_hash)
+                )
+            await self._invalidate([new_user["id"]], [new_user["username"]])
+        return _user_response(new_user)
     
-    async def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[UserResponse]:
-        """Update an existing user."""
-        user_index = next(
-            (i for i, u in enumerate(self._users_db) if u["id"] == user_id), None
-        )
+    @timed("bulk_create_users")
+    async def bulk_create_users(self, users: List[UserCreate]) -> List[BulkItemResult]:
+        """Create several users in one transaction.
         
-        if user_index is None:
-            return None
+        Usernames that already exist or repeat within the batch are rejected
+        per item; the remaining users are inserted together.
+        """
+        # Reject duplicates before hashing so no work goes into their
+        # passwords. Usernames are checked again under their locks, since
+        # they may be taken while the batch is being hashed.
+        candidates = _unclaimed(
+            users, await self.repository.get_ids_by_username({u.username for u in users})
+        )
+        with span("hash"):
+            hashes = await self.hasher.hash_many([users[i].password for i in candidates])
+        password_hashes = dict(zip(candidates, hashes))
+        usernames = {users[index].username for index in candidates}
+        async with self.locks.hold_all(map(_username_key, usernames)):
+            taken = await self.repository.get_ids_by_username(usernames)
+            accepted = [i for i in candidates if users[i].username not in taken]
+            rows = await self.repository.add_many(
+                [
+                    self._new_user_data(users[index], password_hashes[index])
+                    for index in accepted
+                ]
+            )
+            await self._invalidate(
+                [row["id"] for row in rows], [row["username"] for row in rows]
+            )
+        results: List[Optional[BulkItemResult]] = [None] * len(users)
+        for index, row in zip(accepted, rows):
+            results[index] = BulkItemResult(
+                index=index, status="created", status_code=201,
+                id=row["id"], user=_user_response(row),
+            )
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = _bulk_error(index, 400, "Username already exists")
+        return results
+    
+    @timed("update_user")
+    async def update_user(
+        self,
+        user_id: int,
+        user_data: UserUpdate,
+        if_match_header: Optional[str] = None,
+    ) -> Optional[UserResponse]:
+        """Update an existing user.
         
-        user = self._users_db[user_index]
+        With ``if_match_header`` (an If-Match value) the update only applies
+        if the user's current ETag matches; otherwise VersionConflictError
+        is raised.
+        """
+        row = await self._update_row(user_id, user_data, if_match_header)
+        return _user_response(row) if row is not None else None
+    
+    @timed("update_user_json")
+    async def update_user_json(
+        self,
+        user_id: int,
+        user_data: UserUpdate,
+        if_match_header: Optional[str] = None,
+    ) -> Optional[Representation]:
+        """Update a user like ``update_user``; return it as JSON with its ETag."""
+        row = await self._update_row(user_id, user_data, if_match_header)
+        with span("build"):
+            return _user_representation(row)
+    
+    async def _update_row(
+        self,
+        user_id: int,
+        user_data: UserUpdate,
+        if_match_header: Optional[str],
+    ) -> Optional[Mapping[str, Any]]:
         update_data = user_data.model_dump(exclude_unset=True)
+        async with self._update_locks(user_id, update_data):
+            current = None
+            if if_match_header is not None or (
+                self.cache is not None and "username" in update_data
+            ):
+                current = await self.repository.get(user_id)
+                if current is None:
+                    return None
+            return await self._apply_update(
+                user_id,
+                update_data,
+                current,
+                self._expected_version(current, if_match_header),
+            )
+    
+    @timed("compare_and_set_user")
+    async def compare_and_set_user(
+        self, user_id: int, expected_version: int, user_data: UserUpdate
+    ) -> Optional[UserResponse]:
+        """Update a user only if its stored version is ``expected_version``.
         
-        for field, value in update_data.items():
-            user[field] = value
-        
-        user["updated_at"] = datetime.utcnow()
-        self._users_db[user_index] = user
+        Raises VersionConflictError if another write got there first;
+        returns None if the user does not exist.
+        """
+        update_data = user_data.model_dump(exclude_unset=True)
+        async with self._update_locks(user_id, update_data):
+            current = None
+            if self.cache is not None and "username" in update_data:
+                current = await self.repository.get(user_id)
+                if current is None:
+                    return None
+            row = await self._apply_update(
+                user_id, update_data, current, expected_version
+            )
+        return _user_response(row) if row is not None else None
+    
+    @timed("bulk_update_users")
+    async def bulk_update_users(
+        self, updates: List[UserBulkUpdateItem]
+    ) -> List[BulkItemResult]:
+        """Update several users in one transaction.
         
-        return UserResponse(**user)
+        Unknown IDs, IDs repeated within the batch and renames to a taken
+        username are rejected per item; the remaining updates apply together.
+        """
+        changes = [
+            item.model_dump(exclude_unset=True, exclude={"id"}) for item in updates
+        ]
+        keys = [_user_key(item.id) for item in updates]
+        keys.extend(_username_key(c["username"]) for c in changes if "username" in c)
+        async with self.locks.hold_all(keys):
+            return await self._bulk_update(updates, changes)
     
-    async def delete_user(self, user_id: int) -> bool:
-        """Delete a user."""
-        user_index = next(
-            (i for i, u in enumerate(self._users_db) if u["id"] == user_id), None
+    async def _bulk_update(
+        self, updates: List[UserBulkUpdateItem], changes: List[dict]
+    ) -> List[BulkItemResult]:
+        """Validate and apply bulk updates; call with locks held."""
+        existing = await self.repository.get_many({item.id for item in updates})
+        owners = await self.repository.get_ids_by_username(
+            {c["username"] for c in changes if "username" in c}
         )
         
-        if user_index is None:
-            return False
+        results: List[Optional[BulkItemResult]] = [None] * len(updates)
+        accepted: Dict[int, int] = {}
+        claimed = set()
+        for index, (item, item_changes) in enumerate(zip(updates, changes)):
+            username = item_changes.get("username")
+            if item.id not in existing:
+                results[index] = _bulk_error(
+                    index, 404, f"User with ID {item.id} not found", item.id
+                )
+            elif item.id in accepted:
+                results[index] = _bulk_error(index, 400, "Duplicate user ID", item.id)
+            elif username is not None and (
+                owners.get(username, item.id) != item.id or username in claimed
+            ):
+                results[index] = _bulk_error(
+                    index, 400, "Username already exists", item.id
+                )
+            else:
+                accepted[item.id] = index
+                claimed.add(username)
         
-        del self._users_db[user_index]
-        return True
+        old_usernames = [existing[user_id]["username"] for user_id in accepted]
+        rows = await self.repository.update_many(
+            {user_id: changes[index] for user_id, index in accepted.items()}
+        )
+        await self._invalidate(
+            accepted, old_usernames + [row["username"] for row in rows.values()]
+        )
+        for user_id, index in accepted.items():
+            results[index] = BulkItemResult(
+                index=index, status="updated", status_code=200,
+                id=user_id, user=_user_response(rows[user_id]),
+            )
+        return results
+    
+    @timed("delete_user")
+    async def delete_user(
+        self, user_id: int, if_match_header: Optional[str] = None
+    ) -> bool:
+        """Delete a user, optionally only if its ETag matches ``if_match_header``."""
+        async with self.locks.hold(_user_key(user_id)):
+            current = None
+            if self.cache is not None or if_match_header is not None:
+                current = await self.repository.get(user_id)
+                if current is None:
+                    return False
+            deleted = await self.repository.delete(
+                user_id, self._expected_version(current, if_match_header)
+            )
+            if deleted:
+                username = current["username"] if current else None
+                await self._invalidate([user_id], [username])
+        return deleted
     
+    @timed("bulk_delete_users")
+    async def bulk_delete_users(self, user_ids: List[int]) -> List[BulkItemResult]:
+        """Delete several users in one transaction."""
+        unique_ids = list(dict.fromkeys(user_ids))
+        async with self.locks.hold_all(map(_user_key, unique_ids)):
+            existing = {}
+            if self.cache is not None:
+                existing = await self.repository.get_many(unique_ids)
+            usernames = [row["username"] for row in existing.values()]
+            deleted = set(await self.repository.delete_many(unique_ids))
+            await self._invalidate(deleted, usernames)
+        
+        results = []
+        reported = set()
+        for index, user_id in enumerate(user_ids):
+            if user_id in reported:
+                results.append(_bulk_error(index, 400, "Duplicate user ID", user_id))
+            elif user_id in deleted:
+                results.append(BulkItemResult(
+                    index=index, status="deleted", status_code=200, id=user_id
+                ))
+            else:
+                results.append(_bulk_error(
+                    index, 404, f"User with ID {user_id} not found", user_id
+                ))
+            reported.add(user_id)
+        return results
+    
+    @timed("authenticate_user")
     async def authenticate_user(self, username: str, password: str) -> Optional[UserResponse]:
-        """Authenticate user (mock implementation)."""
-        # In a real application, you would verify the password hash
-        user = await self.get_user_by_username(username)
-        if user and user.is_active:
-            # Mock password check - in real app, use proper password hashing
-            return user
+        """Authenticate a user by username (or unique email) and password.
+        
+        Returns None for unknown users, wrong passwords and inactive users
+        alike. Raises RateLimitExceeded once the username has used up its
+        attempts, and PasswordHasherBusyError if the hashing pool is at
+        capacity.
+        """
+        key = username.lower()
+        retry_after = self.login_limiter.acquire(key)
+        if retry_after:
+            LOGIN_RATE_LIMITED.inc()
+            raise RateLimitExceeded(retry_after)
+        
+        with span("store"):
+            user = await self.repository.get_by_username(username)
+            if user is None and "@" in username:
+                matches = await self.repository.get_by_email(username)
+                user = matches[0] if len(matches) == 1 else None
+        # Unknown users still pay for a verification, so response time does
+        # not reveal which usernames exist.
+        password_hash = user.get("password_hash") if user else None
+        with span("hash"):
+            verified = await self.hasher.verify(password, password_hash)
+        if not verified:
+            return None
+        if not user["is_active"]:
+            return None
+        self.login_limiter.reset(key)
+        return _user_response(user)
+    
+    def _update_locks(self, user_id: int, update_data: dict):
+        """Hold the locks for updating a user, and for a username it claims."""
+        keys = [_user_key(user_id)]
+        if "username" in update_data:
+            keys.append(_username_key(update_data["username"]))
+        return self.locks.hold_all(keys)
+    
+    async def _apply_update(
+        self,
+        user_id: int,
+        update_data: dict,
+        current: Optional[dict],
+        expected_version: Optional[int],
+    ) -> Optional[Mapping[str, Any]]:
+        """Write an update and invalidate the cache; call with locks held."""
+        # The cache entry under the old name must go too.
+        old_username = current["username"] if current else None
+        user = await self.repository.update(user_id, update_data, expected_version)
+        if user is None:
+            return None
+        await self._invalidate([user_id], [old_username, user["username"]])
+        return user
+    
+    @staticmethod
+    def _expected_version(
+        current: Optional[dict], if_match_header: Optional[str]
+    ) -> Optional[int]:
+        """Check an If-Match header against the current row."""
+        if if_match_header is None or current is None:
+            return None
+        if not if_match(if_match_header, user_etag(current)):
+            raise VersionConflictError(current["id"])
+        # The repository re-checks the version atomically with the write.
+        return current["version"]
+    
+    async def _read_through(
+        self,
+        call: tuple,
+        load: Callable[[], Awaitable[Optional[Representation]]],
+    ) -> Optional[Representation]:
+        """Return a cached representation, loading and caching it on a miss.
+        
+        ``call`` names the read and its arguments; its parts joined by
+        colons form the cache key. Concurrent misses for the same call
+        share one load.
+        
+        A body is only cached if no write happened while it was loaded, so a
+        slow read can never repopulate the cache with data a write replaced.
+        """
+        if self.cache is None:
+            return await self.flights.do(call, load)
+        
+        with span("cache"):
+            # Drop entries that writes made by other workers have outdated.
+            changed = await self.repository.refresh()
+            if changed:
+                await self._invalidate(
+                    [user_id for user_id, _ in changed],
+                    [username for _, username in changed],
+                )
+            
+            key = ":".join(str(part) for part in call)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return Representation.unpack(cached)
+        
+        async def fill() -> Optional[Representation]:
+            generation = await self.cache.counter(USERS_GENERATION_KEY)
+            representation = await load()
+            if representation is not None and generation == await self.cache.counter(
+                USERS_GENERATION_KEY
+            ):
+                with span("cache"):
+                    await self.cache.set(key, representation.pack())
+            return representation
+        
+        return await self.flights.do(call, fill)
+    
+    async def _invalidate(
+        self, user_ids: Iterable[int], usernames: Iterable[Optional[str]]
+    ) -> None:
+        """Drop cached reads affected by a write."""
+        # Reads from now on must not join loads that began before the write.
+        self.flights.forget()
+        if self.cache is None:
+            return
+        keys = [f"user:{user_id}" for user_id in user_ids]
+        keys.extend(f"username:{name}" for name in usernames if name is not None)
+        await self.cache.delete(*keys)
+        # Every cached list may include the written users.
+        await self.cache.incr(USERS_GENERATION_KEY)
+    
+    @staticmethod
+    def _new_user_data(user_data: UserCreate, password_hash: str) -> dict:
+        """Build the stored fields for a new user."""
+        return {
+            "username": user_data.username,
+            "email": user_data.email,
+            "full_name": user_data.full_name,
+            "is_active": user_data.is_active,
+            "password_hash": password_hash,
+        }
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to the naive UTC used by stored rows."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _user_key(user_id: int) -> tuple:
+    return ("id", user_id)
+
+
+def _username_key(username: str) -> tuple:
+    return ("username", username)
+
+
+def _row_fields(row: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Unpack a compact in-memory row in one step; other rows are dicts."""
+    return row.to_dict() if isinstance(row, UserRow) else row
+
+
+def _user_response(row: Mapping[str, Any]) -> UserResponse:
+    """Build the response model for a stored row.
+    
+    Rows were validated when they were written, so this skips validation
+    (including the costly email check) instead of repeating it on every read.
+    """
+    return UserResponse.model_construct(**_row_fields(row))
+
+
+def _user_representation(
+    row: Optional[Mapping[str, Any]]
+) -> Optional[Representation]:
+    """Serialize a user row together with its ETag."""
+    if row is None:
+        return None
+    row = _row_fields(row)
+    body = _user_response(row).model_dump_json().encode()
+    return Representation(body, user_etag(row))
+
+
+def _unclaimed(users: List[UserCreate], taken: Mapping[str, int]) -> List[int]:
+    """Return the indexes of users whose username is free and first in the batch."""
+    seen = set()
+    indexes = []
+    for index, user_data in enumerate(users):
+        if user_data.username not in taken and user_data.username not in seen:
+            seen.add(user_data.username)
+            indexes.append(index)
+    return indexes
+
+
+def _bulk_error(
+    index: int, status_code: int, error: str, user_id: Optional[int] = None
+) -> BulkItemResult:
+    """Build the result for a rejected bulk item."""
+    return BulkItemResult(
+        index=index, status="error", status_code=status_code, id=user_id, error=error
+    )
+
+
+def _create_cache() -> Optional[CacheBackend]:
+    """Create the read cache configured in settings."""
+    if not settings.cache_enabled:
         return None
+    return LRUCache(
+        max_entries=settings.cache_max_entries,
+        ttl=settings.cache_ttl_seconds,
+        max_bytes=settings.cache_max_bytes,
+    )
+
+
+def _create_hasher() -> PasswordHasher:
+    """Create the password hasher configured in settings."""
+    return PasswordHasher(
+        executor=settings.password_hash_executor,
+        workers=settings.password_hash_workers,
+        queue_size=settings.password_hash_queue_size,
+        cost=settings.password_scrypt_n,
+    )
+
+
+def _create_login_limiter() -> KeyedRateLimiter:
+    """Create the per-username login rate limiter configured in settings."""
+    return KeyedRateLimiter(
+        capacity=settings.login_rate_limit_attempts,
+        period=settings.login_rate_limit_window_seconds,
+    )
 
 
 # Global service instance
-user_service = UserService()
+user_service = UserService(cache=_create_cache())
 
 
 def get_user_service() -> UserService:
@@ -0,0 +1,11 @@
+"""
+Benchmarks package.
+
+This package contains performance benchmarks for the application.
+They run in-process and are not part of the test suite.
+"""
+
+import os
+
+# The benchmarks drive one client far past any per-client quota
+os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
@@ -0,0 +1,158 @@
+"""
+Benchmark Runner
+
+Runs the benchmark suites and writes JSON results that can be compared
+between commits.
+
+Examples::
+
+    python -m benchmarks --sizes 1000,100000 --output results.json
+    python -m benchmarks --suite api --filter "/api/users/page"
+    python -m benchmarks --compare baseline.json --threshold 0.15
+
+With ``--compare``, every result is matched against the baseline by suite,
+store size and name, and the exit status is 1 if any ``ops_per_second``
+dropped by more than the threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from . import bench_api, bench_service
+
+SUITES = ("api", "service", "serialization")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suites(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the selected suites and return the results document."""
+    results: Dict[str, Any] = {}
+    for size in args.sizes:
+        key = str(size)
+        if "api" in args.suite:
+            print(f"api: {size} users", file=sys.stderr)
+            results.setdefault("api", {})[key] = await bench_api.run(
+                size, args.requests, args.concurrency, args.filter
+            )
+        if "service" in args.suite:
+            print(f"service: {size} users", file=sys.stderr)
+            results.setdefault("service", {})[key] = await bench_service.run(
+                size, args.iterations, args.filter
+            )
+    if "serialization" in args.suite:
+        print("serialization", file=sys.stderr)
+        results["serialization"] = {
+            "-": bench_service.run_serialization(args.iterations, args.filter)
+        }
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "requests": args.requests,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Print the throughput change per benchmark and return the regressions."""
+    regressions = []
+    for suite, by_size in current["results"].items():
+        for size, benchmarks in by_size.items():
+            old_benchmarks = baseline["results"].get(suite, {}).get(size, {})
+            for name, result in benchmarks.items():
+                old = old_benchmarks.get(name)
+                if not old or not old["ops_per_second"]:
+                    continue
+                change = result["ops_per_second"] / old["ops_per_second"] - 1
+                label = f"{suite} [{size}] {name}"
+                flag = ""
+                if change < -threshold:
+                    regressions.append(label)
+                    flag = "  REGRESSION"
+                print(
+                    f"{label:<60} {old['ops_per_second']:>10.1f} -> "
+                    f"{result['ops_per_second']:>10.1f} ops/s ({change:+.1%}){flag}"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the benchmark suites."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[1000, 10000],
+        help="comma-separated user store sizes (default: 1000,10000)",
+    )
+    parser.add_argument(
+        "--suite",
+        type=lambda value: value.split(","),
+        default=list(SUITES),
+        help=f"comma-separated suites to run (default: {','.join(SUITES)})",
+    )
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument(
+        "--iterations", type=int, default=2000, help="calls per micro-benchmark"
+    )
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent clients")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed fractional throughput drop with --compare (default: 0.10)",
+    )
+    args = parser.parse_args(argv)
+
+    unknown = set(args.suite) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    document = asyncio.run(run_suites(args))
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    elif not args.compare:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
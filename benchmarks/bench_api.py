@@ -0,0 +1,172 @@
+"""
+API Benchmarks
+
+Drives every route in ``app/api/users.py`` and ``app/api/health.py``
+in-process over ASGI against a user store of a given size.
+
+Read scenarios run first, then writes, then deletes, all against the same
+store, so each scenario sees roughly ``size`` users.
+"""
+
+import itertools
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+from app.core.pagination import encode_cursor
+
+from .harness import app_client, make_service, measure
+
+
+class Scenario(NamedTuple):
+    """One benchmarked request shape."""
+
+    name: str
+    method: str
+    # Called once per request with the request number; returns (path, json)
+    build: Callable[[int], tuple]
+    expected_status: int = 200
+    # Fraction of the requested iteration count (for very heavy routes)
+    weight: float = 1.0
+
+
+def _get(path: str) -> Callable[[int], tuple]:
+    return lambda i: (path, None)
+
+
+def scenarios(size: int, deep_cursor: Optional[str]) -> List[Scenario]:
+    """Build the scenarios for a store of ``size`` users, reads first."""
+    def spread(i: int) -> int:
+        """Spread request numbers over the whole ID range."""
+        return (i * 7919) % size + 1
+
+    new_ids = itertools.count()
+    delete_ids = itertools.count(size, -1)
+    bulk_delete_starts = itertools.count(size // 2, -100)
+
+    def new_user() -> dict:
+        n = next(new_ids)
+        return {
+            "username": f"bench_{n}",
+            "email": f"bench_{n}@example.com",
+            "full_name": "Bench User",
+            "password": "benchpassword",
+        }
+
+    def bulk_update(i: int) -> tuple:
+        items = [
+            {"id": spread(i * 100 + j), "full_name": f"Bulk {i}"} for j in range(100)
+        ]
+        return "/api/users/bulk", {"items": items}
+
+    def bulk_delete(i: int) -> tuple:
+        start = next(bulk_delete_starts)
+        return "/api/users/bulk", {"ids": list(range(start, max(start - 100, 0), -1))}
+
+    reads = [
+        Scenario("GET /", "GET", _get("/")),
+        Scenario("GET 404 page", "GET", _get("/missing"), expected_status=404),
+        Scenario("GET /static/css/main.css", "GET", _get("/static/css/main.css")),
+        Scenario("GET /api/health/", "GET", _get("/api/health/")),
+        Scenario("GET /api/health/ping", "GET", _get("/api/health/ping")),
+        Scenario("GET /api/health/info", "GET", _get("/api/health/info")),
+        Scenario("GET /api/health/cache", "GET", _get("/api/health/cache")),
+        Scenario("GET /api/users/ first", "GET", _get("/api/users/?limit=100")),
+        Scenario(
+            "GET /api/users/ deep offset", "GET",
+            _get(f"/api/users/?skip={size // 2}&limit=100"),
+        ),
+        Scenario("GET /api/users/page first", "GET", _get("/api/users/page?limit=100")),
+    ]
+    if deep_cursor:
+        reads.append(Scenario(
+            "GET /api/users/page deep", "GET",
+            _get(f"/api/users/page?limit=100&after={deep_cursor}"),
+        ))
+    reads += [
+        Scenario(
+            "GET /api/users/{user_id}", "GET",
+            lambda i: (f"/api/users/{spread(i)}", None),
+        ),
+        Scenario(
+            "GET /api/users/{user_id} 304", "GET",
+            _get("/api/users/1"), expected_status=304,
+        ),
+        Scenario(
+            "GET /api/users/{user_id} 404", "GET",
+            lambda i: (f"/api/users/{size * 10 + i}", None), expected_status=404,
+        ),
+        Scenario(
+            "GET /api/users/username/{username}", "GET",
+            lambda i: (f"/api/users/username/user{spread(i)}", None),
+        ),
+        Scenario(
+            "GET /api/users/export", "GET",
+            _get("/api/users/export?format=ndjson&batch_size=1000"), weight=0.02,
+        ),
+    ]
+    writes = [
+        Scenario(
+            "POST /api/users/", "POST",
+            lambda i: ("/api/users/", new_user()), expected_status=201,
+        ),
+        Scenario(
+            "PUT /api/users/{user_id}", "PUT",
+            lambda i: (f"/api/users/{spread(i)}", {"full_name": f"Updated {i}"}),
+        ),
+        Scenario(
+            "POST /api/users/bulk (100)", "POST",
+            lambda i: ("/api/users/bulk", {"items": [new_user() for _ in range(100)]}),
+            weight=0.1,
+        ),
+        Scenario("PATCH /api/users/bulk (100)", "PATCH", bulk_update, weight=0.1),
+    ]
+    deletes = [
+        Scenario(
+            "DELETE /api/users/{user_id}", "DELETE",
+            lambda i: (f"/api/users/{next(delete_ids)}", None),
+        ),
+        Scenario("DELETE /api/users/bulk (100)", "DELETE", bulk_delete, weight=0.1),
+    ]
+    return reads + writes + deletes
+
+
+async def _request(
+    client: httpx.AsyncClient, scenario: Scenario, i: int, headers: Dict[str, str]
+) -> None:
+    path, body = scenario.build(i)
+    response = await client.request(scenario.method, path, json=body, headers=headers)
+    if response.status_code != scenario.expected_status:
+        raise RuntimeError(
+            f"{scenario.name}: expected {scenario.expected_status}, "
+            f"got {response.status_code}: {response.text[:200]}"
+        )
+
+
+async def run(
+    size: int,
+    requests: int,
+    concurrency: int = 1,
+    name_filter: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Benchmark every route against a store of ``size`` users."""
+    service = make_service(size)
+    results: Dict[str, Any] = {}
+    async with app_client(service) as client:
+        etag = (await client.get("/api/users/1")).headers["etag"]
+        # The cursor after the first half of the store
+        deep_cursor = encode_cursor(size // 2) if size >= 200 else None
+
+        for scenario in scenarios(size, deep_cursor):
+            if name_filter and name_filter not in scenario.name:
+                continue
+            headers = {"If-None-Match": etag} if scenario.expected_status == 304 else {}
+            iterations = max(3, int(requests * scenario.weight))
+            results[scenario.name] = await measure(
+                lambda i, s=scenario, h=headers: _request(client, s, i, h),
+                iterations,
+                concurrency=concurrency,
+                # Only warm up reads: writes would change the store size
+                warmup=3 if scenario.method == "GET" else 0,
+            )
+    return results
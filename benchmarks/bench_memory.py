@@ -0,0 +1,102 @@
+"""
+Memory Benchmark
+
+Measures how many bytes the in-memory user store holds per user, rows and
+indexes included. Users are added one by one as the API would add them,
+each with its own timestamps and a password hash of realistic length,
+and the memory allocated meanwhile is traced with ``tracemalloc``.
+
+Examples::
+
+    python -m benchmarks.bench_memory --sizes 10000,100000,1000000
+    python -m benchmarks.bench_memory --sizes 100000 --output memory.json
+"""
+
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from app.repositories import InMemoryUserRepository
+
+FIRST_NAMES = ("Ada", "Alan", "Grace", "Linus", "Barbara", "Dennis", "Margaret")
+LAST_NAMES = ("Lovelace", "Turing", "Hopper", "Torvalds", "Liskov", "Ritchie")
+
+
+def _password_hash() -> str:
+    """Return a string shaped like ``hash_password``'s output, without the cost."""
+    salt = base64.b64encode(os.urandom(16)).decode().rstrip("=")
+    key = base64.b64encode(os.urandom(32)).decode().rstrip("=")
+    return f"scrypt$16384$8$1${salt}${key}"
+
+
+def _user(i: int) -> Dict[str, Any]:
+    return {
+        "username": f"user{i}",
+        "email": f"user{i}@example.com",
+        "full_name": f"{FIRST_NAMES[i % 7]} {LAST_NAMES[i % 6]}",
+        "is_active": i % 10 != 0,
+        "password_hash": _password_hash(),
+    }
+
+
+async def _fill(repository: InMemoryUserRepository, size: int) -> None:
+    for i in range(size):
+        await repository.add(_user(i))
+
+
+def measure(size: int) -> Dict[str, Any]:
+    """Trace the memory held by a store of ``size`` users."""
+    gc.collect()
+    tracemalloc.start()
+    repository = InMemoryUserRepository()
+    asyncio.run(_fill(repository, size))
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "size": size,
+        "bytes": held,
+        "bytes_per_user": round(held / size, 1),
+        "peak_bytes_per_user": round(peak / size, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_memory",
+        description="Measure the in-memory user store's bytes per user.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=[10000, 100000],
+        help="comma-separated user store sizes (default: 10000,100000)",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for size in args.sizes:
+        run = measure(size)
+        runs.append(run)
+        print(
+            f"  {size:>9} users {run['bytes'] / 2 ** 20:>9.1f} MiB"
+            f"  {run['bytes_per_user']:>7.1f} bytes/user",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": runs}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
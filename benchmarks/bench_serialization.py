@@ -0,0 +1,97 @@
+"""
+Serialization Benchmark
+
+Compares the default FastAPI response path with the fast path used by the
+API routers on a large user list:
+
+- ``validated``: the handler returns models validated from rows, and
+  ``response_model=List[UserResponse]`` validates and encodes them again.
+- ``fast``: the handler returns ``PydanticJSONResponse`` with models built
+  by ``model_construct``, serialized once by pydantic-core.
+
+Run with::
+
+    python -m benchmarks.bench_serialization --users 1000 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+from fastapi import FastAPI
+
+from app.core.responses import PydanticJSONResponse
+from app.schemas.user import UserResponse
+
+from .harness import make_rows
+
+
+def build_app(rows: List[dict]) -> FastAPI:
+    """Build an app exposing both response paths."""
+    app = FastAPI()
+
+    @app.get("/validated", response_model=List[UserResponse])
+    async def validated():
+        return [UserResponse(**row) for row in rows]
+
+    @app.get("/fast", response_model=List[UserResponse])
+    async def fast():
+        users = [UserResponse.model_construct(**row) for row in rows]
+        return PydanticJSONResponse(users)
+
+    return app
+
+
+async def time_route(client: httpx.AsyncClient, path: str, requests: int) -> dict:
+    """Time sequential requests to one route."""
+    await client.get(path)  # Warm up
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    total = sum(latencies)
+    latencies.sort()
+    return {
+        "requests_per_second": round(requests / total, 1),
+        "mean_ms": round(total / requests * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        "bytes": len(response.content),
+    }
+
+
+async def run(users: int, requests: int) -> dict:
+    """Run the benchmark and return the results."""
+    app = build_app(make_rows(users))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        validated = (await client.get("/validated")).json()
+        assert validated == (await client.get("/fast")).json()
+        results = {
+            path: await time_route(client, f"/{path}", requests)
+            for path in ("validated", "fast")
+        }
+    results["speedup"] = round(
+        results["fast"]["requests_per_second"]
+        / results["validated"]["requests_per_second"],
+        2,
+    )
+    return {"users": users, "requests": requests, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.users, args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
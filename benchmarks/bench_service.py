@@ -0,0 +1,93 @@
+"""
+Service Benchmarks
+
+Micro-benchmarks of ``UserService`` methods and of user schema
+serialization, without the HTTP layer.
+"""
+
+import itertools
+from typing import Any, Dict, List, Optional
+
+from app.schemas.user import UserCreate, UserResponse, UserUpdate
+from app.services.user_service import _user_list_adapter
+
+from .harness import make_rows, make_service, measure, measure_sync
+
+
+async def run(
+    size: int,
+    iterations: int,
+    name_filter: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Benchmark service methods against a store of ``size`` users."""
+    cold = make_service(size, cache=False)
+    cached = make_service(size)
+
+    def spread(i: int) -> int:
+        return (i * 7919) % size + 1
+
+    new_ids = itertools.count()
+
+    def new_user(i: int) -> UserCreate:
+        n = next(new_ids)
+        return UserCreate(
+            username=f"bench_{n}",
+            email=f"bench_{n}@example.com",
+            password="benchpassword",
+        )
+
+    cases: List[tuple] = [
+        ("get_user_by_id", lambda i: cold.get_user_by_id(spread(i))),
+        (
+            "get_user_by_username",
+            lambda i: cold.get_user_by_username(f"user{spread(i)}"),
+        ),
+        ("get_users first", lambda i: cold.get_users(0, 100)),
+        ("get_users deep offset", lambda i: cold.get_users(size // 2, 100)),
+        ("get_users_page first", lambda i: cold.get_users_page(None, 100)),
+        ("get_user_json uncached", lambda i: cold.get_user_json(spread(i))),
+        ("get_user_json cached", lambda i: cached.get_user_json(1)),
+        ("get_users_json cached", lambda i: cached.get_users_json(0, 100)),
+        ("create_user", lambda i: cold.create_user(new_user(i))),
+        (
+            "update_user",
+            lambda i: cold.update_user(spread(i), UserUpdate(full_name=f"Updated {i}")),
+        ),
+    ]
+
+    results: Dict[str, Any] = {}
+    for name, call in cases:
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = await measure(call, iterations)
+    return results
+
+
+def run_serialization(
+    iterations: int, name_filter: Optional[str] = None
+) -> Dict[str, Any]:
+    """Benchmark building and encoding user responses."""
+    row = make_rows(1)[0]
+    page = make_rows(100)
+    user = UserResponse(**row)
+    users = [UserResponse.model_construct(**r) for r in page]
+
+    cases: List[tuple] = [
+        ("UserResponse validate", lambda i: UserResponse(**row)),
+        ("UserResponse model_construct", lambda i: UserResponse.model_construct(**row)),
+        ("UserResponse model_dump_json", lambda i: user.model_dump_json()),
+        ("list of 100 dump_json", lambda i: _user_list_adapter.dump_json(users)),
+        (
+            "list of 100 construct + dump_json",
+            lambda i: _user_list_adapter.dump_json(
+                [UserResponse.model_construct(**r) for r in page]
+            ),
+        ),
+    ]
+
+    results: Dict[str, Any] = {}
+    for name, call in cases:
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure_sync(call, iterations)
+    return results
@@ -0,0 +1,138 @@
+"""
+Startup Benchmark
+
+Measures how long a fresh process takes to serve its first request, the
+number that matters for autoscaling and serverless cold starts. Each run
+starts a new interpreter which imports ``app.main``, runs the lifespan and
+sends ``GET /api/health/ping`` through an in-process ASGI client; the
+parent times everything from spawning the process, so interpreter start is
+included. A final ``-X importtime`` run lists the slowest modules.
+
+Examples::
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --target-ms 1500 --top 15
+
+The exit status is 1 if the median time to first response exceeds
+``--target-ms``.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Run in the child process; prints one JSON line of timings in milliseconds
+CHILD = """
+import asyncio, json, time
+import httpx
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+async def first_request():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            response = await c.get("/api/health/ping")
+        assert response.status_code == 200, response.status_code
+        return ready, time.perf_counter()
+
+ready, responded = asyncio.run(first_request())
+print(json.dumps({
+    "import": (imported - start) * 1000,
+    "lifespan": (ready - imported) * 1000,
+    "first_request": (responded - ready) * 1000,
+}))
+"""
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("PASSWORD_SCRYPT_N", "1024")
+    env.setdefault("SECRET_KEY", "benchmark")
+    return env
+
+
+def measure_once() -> Dict[str, float]:
+    """Start one process and return its timings in milliseconds."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        capture_output=True, text=True, check=True, env=_environment(),
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    # Spawn to exit, so interpreter start and teardown are included
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def import_profile() -> List[Tuple[str, int, int]]:
+    """Return (module, self us, cumulative us) from ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True, env=_environment(),
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def print_import_profile(modules: List[Tuple[str, int, int]], top: int) -> None:
+    """Print the slowest modules and the import time per top-level package."""
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"\nSlowest modules (self time, of {len(modules)} imported):")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[1])[:top]:
+        print(
+            f"  {name:<48} {self_us / 1000:7.1f} ms  ({cumulative_us / 1000:.1f} ms)"
+        )
+    print("\nImport time by package:")
+    for package, self_us in sorted(by_package.items(), key=lambda p: -p[1])[:top]:
+        print(f"  {package:<48} {self_us / 1000:7.1f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_startup",
+        description="Measure the time from process start to the first response.",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="processes to start")
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=2000.0,
+        help="allowed median time to first response (default: 2000)",
+    )
+    parser.add_argument("--top", type=int, default=10, help="modules to list")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.runs)]
+    print(f"Median of {args.runs} runs:")
+    medians = {}
+    for key in ("import", "lifespan", "first_request", "total"):
+        medians[key] = statistics.median(run[key] for run in runs)
+        print(f"  {key:<16} {medians[key]:8.1f} ms")
+
+    print_import_profile(import_profile(), args.top)
+
+    if medians["total"] > args.target_ms:
+        print(f"\nOver target: {medians['total']:.1f} ms > {args.target_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Worker Scaling Benchmark
+
+Measures how read throughput of the shared user store grows with the
+number of worker processes. A log of ``--size`` users is written once; then,
+for each worker count, that many processes open it as
+``SharedUserRepository``, wait for each other and call
+``UserService.get_user_by_id`` (without the read cache) for ``--duration``
+seconds. With ``--write-fraction`` some calls are updates instead, so the
+cost of replaying other workers' writes shows up in the numbers.
+
+Examples::
+
+    python -m benchmarks.bench_workers --workers 1,2,4,8 --size 100000
+    python -m benchmarks.bench_workers --write-fraction 0.01 --output workers.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from app.repositories.shared import SharedUserRepository
+from app.schemas.user import UserUpdate
+from app.services.user_service import UserService
+
+from .harness import make_rows
+
+
+async def _fill(url: str, size: int, batch_size: int = 10000) -> None:
+    """Write ``size`` users to a new shared log."""
+    repository = SharedUserRepository(url)
+    await repository.connect()
+    rows = make_rows(size)
+    for start in range(0, size, batch_size):
+        await repository.add_many([
+            {key: row[key] for key in ("username", "email", "full_name", "is_active")}
+            for row in rows[start:start + batch_size]
+        ])
+    await repository.close()
+
+
+async def _work(
+    url: str, size: int, duration: float, write_fraction: float, barrier: Any
+) -> Dict[str, float]:
+    repository = SharedUserRepository(url)
+    await repository.connect()
+    service = UserService(repository=repository, cache=None)
+    write_every = round(1 / write_fraction) if write_fraction else 0
+    update = UserUpdate(full_name=f"Updated by {os.getpid()}")
+
+    barrier.wait()
+    calls = writes = 0
+    start = time.perf_counter()
+    deadline = start + duration
+    while True:
+        # Check the clock every 100 calls to keep it out of the loop
+        for _ in range(100):
+            user_id = (calls * 7919) % size + 1
+            if write_every and calls % write_every == 0:
+                await service.update_user(user_id, update)
+                writes += 1
+            else:
+                await service.get_user_by_id(user_id)
+            calls += 1
+        if time.perf_counter() >= deadline:
+            break
+    elapsed = time.perf_counter() - start
+    await repository.close()
+    return {"calls": calls, "writes": writes, "elapsed": elapsed}
+
+
+def _worker(
+    url: str,
+    size: int,
+    duration: float,
+    write_fraction: float,
+    barrier: Any,
+    results: Any,
+) -> None:
+    results.put(asyncio.run(_work(url, size, duration, write_fraction, barrier)))
+
+
+def measure(
+    url: str, size: int, workers: int, duration: float, write_fraction: float
+) -> Dict[str, float]:
+    """Run ``workers`` processes against the log and return their throughput."""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(url, size, duration, write_fraction, barrier, results),
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    runs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    calls = sum(run["calls"] for run in runs)
+    elapsed = max(run["elapsed"] for run in runs)
+    return {
+        "workers": workers,
+        "calls": calls,
+        "writes": sum(run["writes"] for run in runs),
+        "ops_per_second": round(calls / elapsed, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_workers",
+        description="Measure shared store read throughput per worker count.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=lambda value: [int(count) for count in value.split(",")],
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="comma-separated worker counts (default: 1,2,4 and the CPU count)",
+    )
+    parser.add_argument("--size", type=int, default=100000, help="users in the store")
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="seconds each run lasts"
+    )
+    parser.add_argument(
+        "--write-fraction",
+        type=float,
+        default=0.0,
+        help="fraction of calls that are updates (default: 0)",
+    )
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"shared:///{os.path.join(directory, 'users.log')}"
+        print(f"Writing {args.size} users", file=sys.stderr)
+        asyncio.run(_fill(url, args.size))
+
+        runs = []
+        per_worker = None
+        for workers in args.workers:
+            run = measure(url, args.size, workers, args.duration, args.write_fraction)
+            if per_worker is None:
+                per_worker = run["ops_per_second"] / workers
+            # Throughput in multiples of one worker's, as measured by the first run
+            run["scaling"] = round(run["ops_per_second"] / per_worker, 2)
+            runs.append(run)
+            print(
+                f"  {workers:>3} workers {run['ops_per_second']:>12.1f} ops/s"
+                f"  x{run['scaling']:.2f}",
+                file=sys.stderr,
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "runs": runs}, f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
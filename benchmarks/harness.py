@@ -0,0 +1,121 @@
+"""
+Benchmark Harness
+
+This module contains the shared pieces of the benchmark suite: timing
+and latency statistics, an in-process ASGI client for ``app.main:app`` and
+helpers that build user stores of a given size.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+import httpx
+
+from app.core.cache import LRUCache
+from app.repositories import InMemoryUserRepository
+from app.services.user_service import UserService, get_user_service
+
+
+def make_rows(count: int) -> List[dict]:
+    """Build ``count`` stored user rows."""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": i,
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "full_name": f"User Number {i}",
+            "is_active": i % 10 != 0,
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def make_service(size: int, cache: bool = True) -> UserService:
+    """Build a user service backed by an in-memory store of ``size`` users."""
+    return UserService(
+        repository=InMemoryUserRepository(make_rows(size)),
+        cache=LRUCache() if cache else None,
+    )
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Turn per-call latencies (seconds) into throughput and percentiles."""
+    ordered = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 4)
+
+    return {
+        "calls": len(ordered),
+        "ops_per_second": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": percentile(0.50),
+        "p99_ms": percentile(0.99),
+    }
+
+
+async def measure(
+    call: Callable[[int], Awaitable[object]],
+    iterations: int,
+    concurrency: int = 1,
+    warmup: int = 5,
+) -> Dict[str, float]:
+    """Run ``call(i)`` ``iterations`` times across ``concurrency`` workers."""
+    for i in range(warmup):
+        await call(-1 - i)
+
+    latencies: List[float] = []
+    counter = iter(range(iterations))
+
+    async def worker() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def measure_sync(call: Callable[[int], object], iterations: int) -> Dict[str, float]:
+    """Time a synchronous call ``iterations`` times."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        call(i)
+        latencies.append(time.perf_counter() - call_start)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def app_client(service: UserService) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield an ASGI client for ``app.main:app`` using ``service``.
+
+    The lifespan is not run, so the app keeps the supplied in-memory store
+    whatever DATABASE_URL says.
+    """
+    from app.main import app
+
+    # app.main configures INFO logging; per-request httpx lines would dominate
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app.dependency_overrides[get_user_service] = lambda: service
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            yield client
+    finally:
+        app.dependency_overrides.pop(get_user_service, None)
@@ -5,8 +5,16 @@ This module contains pytest configuration and common fixtures
 used across all test modules.
 """
 
+import os
 import uuid
+from typing import Callable, Optional
+
 import pytest
+
+# Cheap password hashing keeps the suite fast; set before settings load.
+os.environ.setdefault("PASSWORD_SCRYPT_N", "1024")
+
+from fastapi import APIRouter, FastAPI
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -17,6 +25,25 @@ def client():
     return TestClient(app)
 
 
+@pytest.fixture
+def make_app() -> Callable[..., FastAPI]:
+    """Build a bare app serving a router, optionally behind one middleware.
+
+    Tests of a middleware or route class use it instead of the full
+    application, with a few routes of their own.
+    """
+    def make(
+        router: APIRouter, middleware: Optional[type] = None, /, **options
+    ) -> FastAPI:
+        app = FastAPI()
+        app.include_router(router)
+        if middleware is not None:
+            app.add_middleware(middleware, **options)
+        return app
+
+    return make
+
+
 @pytest.fixture
 def sample_user_data():
     """Sample user data for testing."""
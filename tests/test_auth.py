@@ -0,0 +1,211 @@
+"""
+Test Authentication.
+
+This module contains tests for password hashing, the login rate limiter,
+access tokens and the auth endpoints.
+"""
+
+import asyncio
+import pytest
+from app.core.ratelimit import KeyedRateLimiter, RateLimitExceeded
+from app.core.security import (
+    PasswordHasher,
+    PasswordHasherBusyError,
+    hash_password,
+    verify_password,
+)
+from app.core.tokens import InvalidTokenError, TokenManager
+from app.repositories import UserAlreadyExistsError
+from app.schemas.user import UserCreate
+from app.services.user_service import UserService
+
+
+def test_hash_and_verify_password():
+    """Test that hashes are salted and verify only the right password."""
+    first = hash_password("secret-password", n=1024)
+    second = hash_password("secret-password", n=1024)
+
+    assert first != second
+    assert first.startswith("scrypt$1024$")
+    assert verify_password("secret-password", first)
+    assert not verify_password("wrong-password", first)
+    assert not verify_password("secret-password", "not-a-hash")
+
+
+async def test_hasher_rejects_when_full():
+    """Test that calls beyond workers plus queue size are rejected."""
+    hasher = PasswordHasher(workers=1, queue_size=1, cost=1024)
+    try:
+        results = await asyncio.gather(
+            *(hasher.hash("password123") for _ in range(4)), return_exceptions=True
+        )
+        assert sum(isinstance(r, PasswordHasherBusyError) for r in results) == 2
+        assert hasher.pending == 0
+
+        hashes = await hasher.hash_many(["password123"] * 4)
+        assert all(verify_password("password123", h) for h in hashes)
+
+        # A batch waits for the queue to drain rather than failing
+        results = await asyncio.gather(
+            hasher.hash("password123"),
+            hasher.hash("password123"),
+            hasher.hash_many(["password123"] * 2),
+        )
+        assert len(results[2]) == 2
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_rate_limiter_refills_over_time():
+    """Test the token bucket burst, refill and key bound."""
+    now = [0.0]
+    limiter = KeyedRateLimiter(capacity=2, period=10, max_keys=2, clock=lambda: now[0])
+
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == pytest.approx(5.0)
+    with pytest.raises(RateLimitExceeded):
+        limiter.check("a")
+
+    now[0] = 5.0
+    assert limiter.acquire("a") == 0
+
+    limiter.acquire("b")
+    limiter.acquire("c")
+    assert len(limiter) == 2
+
+
+async def test_authenticate_user():
+    """Test password checks, email login and inactive users."""
+    service = UserService(hasher=PasswordHasher(cost=1024))
+    await service.create_user(UserCreate(
+        username="alice", email="alice@example.com", password="password123"
+    ))
+    await service.create_user(UserCreate(
+        username="bob", email="bob@example.com", password="password123",
+        is_active=False,
+    ))
+
+    assert (await service.authenticate_user("alice", "password123")).username == "alice"
+    assert await service.authenticate_user("alice@example.com", "password123")
+    assert await service.authenticate_user("alice", "wrong-password") is None
+    assert await service.authenticate_user("nobody", "password123") is None
+    assert await service.authenticate_user("bob", "password123") is None
+    # Seeded users have no password and can never log in
+    assert await service.authenticate_user("admin", "") is None
+
+
+async def test_create_hashes_only_accepted_users():
+    """Test that rejected usernames never reach the hasher."""
+    hashed = []
+
+    class RecordingHasher(PasswordHasher):
+        async def hash(self, password):
+            hashed.append(password)
+            return await super().hash(password)
+
+    service = UserService(hasher=RecordingHasher(cost=1024))
+    users = [
+        UserCreate(username=name, email=f"{name}@example.com", password=password)
+        for name, password in (
+            ("admin", "taken-password"),
+            ("alice", "first-password"),
+            ("alice", "repeat-password"),
+            ("bob", "bob-password"),
+        )
+    ]
+    results = await service.bulk_create_users(users)
+    assert [r.status_code for r in results] == [400, 201, 400, 201]
+    assert sorted(hashed) == ["bob-password", "first-password"]
+
+    with pytest.raises(UserAlreadyExistsError):
+        await service.create_user(users[2])
+    assert len(hashed) == 2
+    assert await service.authenticate_user("alice", "first-password")
+
+
+def test_login_endpoint(client, sample_user_data):
+    """Test login through the API, including the rate limit."""
+    assert client.post("/api/users/", json=sample_user_data).status_code == 201
+    credentials = {
+        "username": sample_user_data["username"],
+        "password": sample_user_data["password"],
+    }
+
+    response = client.post("/api/auth/login", json=credentials)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["token_type"] == "bearer"
+    assert body["user"]["username"] == sample_user_data["username"]
+    assert "password_hash" not in body["user"]
+
+    wrong = {**credentials, "password": "wrong-password"}
+    statuses = [client.post("/api/auth/login", json=wrong).status_code for _ in range(6)]
+    assert statuses == [401] * 5 + [429]
+    assert "Retry-After" in client.post("/api/auth/login", json=wrong).headers
+
+
+def test_token_round_trip_and_cache():
+    """Test issuing, cached verification and tampering."""
+    tokens = TokenManager({"k1": b"secret"}, active_key_id="k1", ttl_seconds=60)
+    token, claims = tokens.issue(7, "alice")
+
+    assert tokens.verify(token) == claims
+    assert tokens.verify(token) == claims
+    assert (tokens.hits, tokens.misses) == (1, 1)
+
+    header, payload, signature = token.split(".")
+    forged = TokenManager({"k1": b"other"}, active_key_id="k1").issue(1, "admin")[0]
+    for bad in (f"{header}.{forged.split('.')[1]}.{signature}", forged, "garbage"):
+        with pytest.raises(InvalidTokenError):
+            tokens.verify(bad)
+
+
+def test_token_expiry_rotation_and_revocation():
+    """Test that expired, retired-key and revoked tokens are rejected."""
+    now = [1000.0]
+    tokens = TokenManager(
+        {"old": b"old-secret"}, active_key_id="old", ttl_seconds=60,
+        clock=lambda: now[0],
+    )
+    old_token, old_claims = tokens.issue(1, "alice")
+
+    tokens.rotate("new", b"new-secret")
+    new_token, new_claims = tokens.issue(1, "alice")
+    assert new_claims.key_id == "new"
+    assert tokens.verify(old_token) == old_claims
+
+    tokens.retire("old")
+    with pytest.raises(InvalidTokenError):
+        tokens.verify(old_token)
+
+    tokens.revoke(new_claims)
+    with pytest.raises(InvalidTokenError):
+        tokens.verify(new_token)
+
+    now[0] += 61
+    assert not tokens.is_revoked(new_claims.token_id)
+    assert tokens.stats()["revoked"] == 0
+    with pytest.raises(InvalidTokenError):
+        tokens.verify(new_token)
+
+
+def test_me_and_logout(client, sample_user_data):
+    """Test the bearer dependency through /me and /logout."""
+    client.post("/api/users/", json=sample_user_data)
+    token = client.post("/api/auth/login", json={
+        "username": sample_user_data["username"],
+        "password": sample_user_data["password"],
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/auth/me").status_code == 401
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == sample_user_data["username"]
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
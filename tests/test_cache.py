@@ -0,0 +1,99 @@
+"""
+Test Response Cache.
+
+This module contains tests for the read cache and its invalidation
+by user writes.
+"""
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.core.cache import LRUCache
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.user_service import UserService
+
+
+async def test_lru_cache_counts_hits_and_misses():
+    """Test basic get/set bookkeeping."""
+    cache = LRUCache(max_entries=10)
+    assert await cache.get("a") is None
+    await cache.set("a", b"1")
+    assert await cache.get("a") == b"1"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+async def test_lru_cache_evicts_least_recently_used():
+    """Test that the entry and byte bounds evict the oldest entries."""
+    cache = LRUCache(max_entries=2, max_bytes=5)
+    await cache.set("a", b"11")
+    await cache.set("b", b"22")
+    await cache.get("a")
+    await cache.set("c", b"33")
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"11"
+
+    await cache.set("d", b"4444")
+    assert len(cache) == 1
+    assert cache.stats()["evictions"] == 3
+
+
+async def test_lru_cache_expires_entries(monkeypatch):
+    """Test that entries expire after the TTL."""
+    now = [100.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(ttl=5)
+    await cache.set("a", b"1")
+    now[0] += 6
+    assert await cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+@pytest.fixture
+def service():
+    """Create a user service with a cache."""
+    return UserService(cache=LRUCache())
+
+
+async def test_service_invalidates_on_update(service):
+    """Test that updates drop the user, username and list entries."""
+    first = json.loads((await service.get_user_json(1)).body)
+    by_name = await service.get_user_by_username_json("admin")
+    users = json.loads((await service.get_users_json()).body)
+    assert await service.get_user_json(1) is not None
+    assert service.cache.stats()["hits"] == 1
+
+    await service.update_user(1, UserUpdate(username="root"))
+
+    assert json.loads((await service.get_user_json(1)).body)["username"] == "root"
+    assert first["username"] == "admin" and by_name is not None
+    assert await service.get_user_by_username_json("admin") is None
+    assert json.loads((await service.get_users_json()).body)[0]["username"] == "root"
+    assert users[0]["username"] == "admin"
+
+
+async def test_service_invalidates_on_create_and_delete(service):
+    """Test that creates and deletes refresh cached lists and users."""
+    before = json.loads((await service.get_users_json()).body)
+    user = await service.create_user(UserCreate(
+        username="cached", email="cached@example.com", password="password123"
+    ))
+    assert len(json.loads((await service.get_users_json()).body)) == len(before) + 1
+
+    assert await service.get_user_json(user.id) is not None
+    await service.delete_user(user.id)
+    assert await service.get_user_json(user.id) is None
+    assert await service.get_user_by_username_json("cached") is None
+
+
+def test_cache_stats_endpoint(client: TestClient):
+    """Test the cache statistics endpoint."""
+    client.get("/api/users/1")
+    client.get("/api/users/1")
+
+    response = client.get("/api/health/cache")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["enabled"] is True
+    assert data["hits"] >= 1
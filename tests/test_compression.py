@@ -0,0 +1,127 @@
+"""
+Test Response Compression.
+
+This module contains tests for the compression middleware.
+"""
+
+import asyncio
+import zlib
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from app.core.compression import CompressionMiddleware, accepted_encodings
+from app.core.conditional import if_match, if_none_match
+from app.core.metrics import HTTP_COMPRESSION_INPUT_BYTES
+
+BODY = "compressible text " * 200
+
+
+COMPRESSION = {"algorithms": ["gzip"], "minimum_size": 500, "excluded_types": ["image/"]}
+router = APIRouter()
+
+
+@router.get("/large")
+async def large():
+    return PlainTextResponse(BODY, headers={"ETag": '"abc"'})
+
+
+@router.get("/small")
+async def small():
+    return PlainTextResponse("tiny")
+
+
+@router.get("/encoded")
+async def encoded():
+    return Response(b"raw", headers={"Content-Encoding": "br"})
+
+
+@router.get("/image")
+async def image():
+    return Response(BODY.encode(), media_type="image/png")
+
+
+@router.get("/stream")
+async def stream():
+    async def chunks():
+        for i in range(3):
+            yield f"chunk {i} ".encode() * 100
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def test_accepted_encodings():
+    """Test Accept-Encoding parsing with quality values."""
+    assert accepted_encodings("gzip, br;q=0, deflate;q=0.5") == ["gzip", "deflate"]
+    assert accepted_encodings(None) == []
+
+
+def test_compresses_large_responses(make_app):
+    """Test that large bodies are gzipped with a length and their own ETag."""
+    client = TestClient(make_app(router, CompressionMiddleware, **COMPRESSION))
+    before = HTTP_COMPRESSION_INPUT_BYTES.labels("gzip").value
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc-gzip"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.text == BODY
+    assert HTTP_COMPRESSION_INPUT_BYTES.labels("gzip").value - before == len(BODY)
+
+
+def test_compressed_etag_satisfies_conditions(make_app):
+    """Test that a compressed response's ETag works in If-Match and If-None-Match."""
+    client = TestClient(make_app(router, CompressionMiddleware, **COMPRESSION))
+    etag = client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    assert if_match(etag, '"abc"')
+    assert if_none_match(etag, '"abc"')
+    assert if_none_match(f"W/{etag}", '"abc"')
+    assert not if_match(etag, '"abd"')
+    assert not if_match('"abc-deflate"', '"abc"')
+
+
+def test_skips_ineligible_responses(make_app):
+    """Test small, already encoded, excluded and unaccepted responses."""
+    client = TestClient(make_app(router, CompressionMiddleware, **COMPRESSION))
+    gzip_only = {"Accept-Encoding": "gzip"}
+
+    assert "content-encoding" not in client.get("/small", headers=gzip_only).headers
+    assert client.get("/encoded", headers=gzip_only).headers["content-encoding"] == "br"
+    assert "content-encoding" not in client.get("/image", headers=gzip_only).headers
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+async def test_streams_chunk_by_chunk(make_app):
+    """Test that every chunk is sent, decodable, as soon as it is produced."""
+    app = make_app(router, CompressionMiddleware, **COMPRESSION)
+    messages = []
+
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)  # The client never disconnects
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream",
+        "root_path": "", "scheme": "http", "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")], "server": ("test", 80),
+        "client": ("test", 1234), "http_version": "1.1",
+    }
+    await app(scope, receive, send)
+
+    start = messages[0]
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert not any(name == b"content-length" for name, _ in start["headers"])
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [m for m in messages[1:] if m.get("body")]
+    decoded = [decompressor.decompress(m["body"]) for m in chunks]
+    assert decoded[:3] == [f"chunk {i} ".encode() * 100 for i in range(3)]
+    assert messages[-1]["more_body"] is False
@@ -0,0 +1,273 @@
+"""
+Test Concurrent Writes.
+
+This module contains tests for striped locks, for UserService writes
+racing each other and for coalescing of concurrent identical reads.
+"""
+
+import asyncio
+import pytest
+from app.core.cache import LRUCache
+from app.core.locks import StripedLock
+from app.core.singleflight import SingleFlight
+from app.repositories import (
+    InMemoryUserRepository,
+    UserAlreadyExistsError,
+    VersionConflictError,
+)
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.user_service import UserService
+
+
+class SlowRepository(InMemoryUserRepository):
+    """In-memory store that yields to the event loop like real I/O would."""
+
+    async def get(self, user_id):
+        await asyncio.sleep(0)
+        return await super().get(user_id)
+
+    async def add(self, data):
+        await asyncio.sleep(0)
+        return await super().add(data)
+
+    async def update(self, user_id, changes, expected_version=None):
+        await asyncio.sleep(0)
+        return await super().update(user_id, changes, expected_version)
+
+
+def new_user(username: str) -> UserCreate:
+    return UserCreate(
+        username=username, email=f"{username}@example.com", password="password123"
+    )
+
+
+async def test_striped_lock_serializes_same_key():
+    """Test that holders of one key run one at a time, others concurrently."""
+    locks = StripedLock(stripes=8)
+    running = []
+    peak = 0
+
+    async def hold(key):
+        nonlocal peak
+        async with locks.hold(key):
+            running.append(key)
+            peak = max(peak, running.count(key))
+            await asyncio.sleep(0)
+            running.remove(key)
+
+    await asyncio.gather(*(hold("same") for _ in range(10)))
+    assert peak == 1
+
+
+async def test_striped_lock_multi_key_does_not_deadlock():
+    """Test that overlapping multi-key holders acquire in a consistent order."""
+    locks = StripedLock(stripes=64)
+
+    async def hold(keys):
+        async with locks.hold_all(keys):
+            await asyncio.sleep(0)
+
+    keys = [f"key{i}" for i in range(20)]
+    await asyncio.wait_for(
+        asyncio.gather(*(hold(keys if i % 2 else keys[::-1]) for i in range(10))),
+        timeout=1,
+    )
+
+
+async def test_concurrent_creates_keep_usernames_unique():
+    """Test that racing creates of one username produce exactly one user."""
+    service = UserService(repository=SlowRepository())
+
+    results = await asyncio.gather(
+        *(service.create_user(new_user("racer")) for _ in range(10)),
+        return_exceptions=True,
+    )
+
+    errors = [r for r in results if isinstance(r, UserAlreadyExistsError)]
+    assert len(errors) == 9
+    assert await service.repository.count() == 1
+
+
+async def test_concurrent_creates_get_distinct_ids():
+    """Test that racing creates of different usernames all succeed."""
+    service = UserService(repository=SlowRepository())
+
+    created = await asyncio.gather(
+        *(service.create_user(new_user(f"user{i}")) for i in range(20))
+    )
+
+    assert len({user.id for user in created}) == 20
+
+
+async def test_compare_and_set_allows_one_winner():
+    """Test that two writers holding the same version cannot both win."""
+    service = UserService(repository=SlowRepository())
+    user = await service.create_user(new_user("cas"))
+    version = (await service.repository.get(user.id))["version"]
+
+    results = await asyncio.gather(
+        service.compare_and_set_user(user.id, version, UserUpdate(full_name="A")),
+        service.compare_and_set_user(user.id, version, UserUpdate(full_name="B")),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(r, VersionConflictError) for r in results) == 1
+    assert await service.compare_and_set_user(
+        99999, version, UserUpdate(full_name="C")
+    ) is None
+
+
+async def test_concurrent_renames_to_same_username():
+    """Test that only one of two racing renames can claim a username."""
+    service = UserService(repository=SlowRepository())
+    first = await service.create_user(new_user("first"))
+    second = await service.create_user(new_user("second"))
+
+    results = await asyncio.gather(
+        service.update_user(first.id, UserUpdate(username="taken")),
+        service.update_user(second.id, UserUpdate(username="taken")),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(r, UserAlreadyExistsError) for r in results) == 1
+
+
+def test_create_duplicate_username_via_api(client, sample_user_data):
+    """Test that the API maps a lost create race to 400."""
+    assert client.post("/api/users/", json=sample_user_data).status_code == 201
+    response = client.post("/api/users/", json=sample_user_data)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already exists"
+
+
+def test_striped_lock_rejects_zero_stripes():
+    """Test StripedLock argument validation."""
+    with pytest.raises(ValueError):
+        StripedLock(stripes=0)
+
+
+def test_striped_lock_works_across_event_loops():
+    """Test that a pool built outside any loop serves each loop it is used in."""
+    locks = StripedLock(stripes=1)
+
+    async def contend():
+        async def hold(key):
+            async with locks.hold(key):
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(hold(key) for key in ("a", "b", "c")))
+
+    asyncio.run(contend())
+    asyncio.run(contend())
+
+
+async def test_single_flight_coalesces_concurrent_calls():
+    """Test that concurrent calls with one key run once and share the result."""
+    flights = SingleFlight()
+    release = asyncio.Event()
+    runs = []
+
+    async def load(value):
+        runs.append(value)
+        await release.wait()
+        return value
+
+    tasks = [
+        asyncio.ensure_future(flights.do(("user", 1), lambda: load("a")))
+        for _ in range(10)
+    ]
+    other = asyncio.ensure_future(flights.do(("user", 2), lambda: load("b")))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == ["a"] * 10
+    assert await other == "b"
+    assert runs == ["a", "b"]
+    assert flights.stats() == {
+        "in_flight": 0, "calls": {"user": 11}, "coalesced": {"user": 9},
+    }
+
+
+async def test_single_flight_survives_leader_cancellation():
+    """Test that cancelling the first caller leaves the call running for others."""
+    flights = SingleFlight()
+    release = asyncio.Event()
+    cancelled = []
+
+    async def load():
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "result"
+
+    leader = asyncio.ensure_future(flights.do(("read",), load))
+    follower = asyncio.ensure_future(flights.do(("read",), load))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == "result"
+    assert leader.cancelled()
+    assert not cancelled
+
+    # Once every caller is gone, the call itself is cancelled
+    release.clear()
+    only = asyncio.ensure_future(flights.do(("read",), load))
+    await asyncio.sleep(0)
+    only.cancel()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert cancelled == [True]
+    assert len(flights) == 0
+
+
+class CountingRepository(SlowRepository):
+    """Slow in-memory store counting its lookups."""
+
+    gets = 0
+
+    async def get(self, user_id):
+        self.gets += 1
+        return await super().get(user_id)
+
+
+@pytest.mark.parametrize("cache", [None, LRUCache()], ids=["uncached", "cached"])
+async def test_concurrent_reads_share_one_load(cache):
+    """Test that identical concurrent reads load and serialize a user once."""
+    service = UserService(repository=CountingRepository(), cache=cache)
+    user = await service.create_user(new_user("popular"))
+
+    bodies = await asyncio.gather(*(service.get_user_json(user.id) for _ in range(50)))
+
+    assert service.repository.gets == 1
+    assert len({id(body) for body in bodies}) == 1
+    assert service.flights.stats()["coalesced"] == {"user": 49}
+
+
+async def test_reads_after_a_write_do_not_join_older_loads():
+    """Test that a read starting after a write is not served pre-write data."""
+    service = UserService(repository=SlowRepository())
+    user = await service.create_user(new_user("renamed"))
+    loading, release = asyncio.Event(), asyncio.Event()
+    get = service.repository.get
+
+    async def first_get_blocks(user_id):
+        row = dict(await get(user_id))
+        if not loading.is_set():
+            loading.set()
+            await release.wait()
+        return row
+
+    service.repository.get = first_get_blocks
+    before = asyncio.ensure_future(service.get_user_json(user.id))
+    await loading.wait()
+    await service.update_user(user.id, UserUpdate(full_name="After"))
+    after = asyncio.ensure_future(service.get_user_json(user.id))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert b"After" not in (await before).body
+    assert b"After" in (await after).body
@@ -0,0 +1,193 @@
+"""
+Test Durable User Store.
+
+This module contains tests for the write-ahead log, snapshots and recovery
+of the durable in-memory user store.
+"""
+
+import asyncio
+import pytest
+from datetime import datetime
+from app.repositories import DurableUserRepository, RepositoryError
+from app.repositories.snapshot import decode_snapshot, encode_snapshot
+from app.repositories.wal import WriteAheadLog, list_segments, segment_path
+
+
+def make_user(username: str) -> dict:
+    """Build the data for a new user row."""
+    return {
+        "username": username,
+        "email": f"{username}@example.com",
+        "full_name": None,
+        "is_active": True,
+    }
+
+
+async def open_store(directory, **options) -> DurableUserRepository:
+    repository = DurableUserRepository(str(directory), **options)
+    await repository.connect()
+    return repository
+
+
+async def test_recovers_from_log_without_snapshot(tmp_path):
+    """Test that acknowledged writes survive a crash before any snapshot."""
+    store = await open_store(tmp_path, snapshot_interval=None)
+    alice = await store.add({**make_user("alice"), "password_hash": "scrypt$x"})
+    bob = await store.add(make_user("bob"))
+    await store.update(alice["id"], {"full_name": "Alice"})
+    await store.delete(bob["id"])
+    # Crash: neither a final snapshot nor a clean close
+    await store._log.close()
+
+    recovered = await open_store(tmp_path)
+    assert await recovered.get(alice["id"]) == await store.get(alice["id"])
+    assert await recovered.get(bob["id"]) is None
+    # The deleted user's ID is not handed out again
+    assert (await recovered.add(make_user("carol")))["id"] == bob["id"] + 1
+    await recovered.close()
+
+
+async def test_snapshot_replaces_older_log(tmp_path):
+    """Test that a snapshot drops the log it covers and recovery combines both."""
+    store = await open_store(tmp_path)
+    await store.add_many([make_user(f"user{i}") for i in range(5)])
+    await store.snapshot()
+    await store.update_many({1: {"full_name": "First"}, 2: {"is_active": False}})
+    await store.delete_many([5])
+    expected = await store.list()
+    await store._log.close()
+
+    assert len(list(tmp_path.glob("snapshot-*.bin"))) == 1
+    assert list_segments(tmp_path) == [1]
+
+    recovered = await open_store(tmp_path)
+    assert await recovered.list() == expected
+    assert (await recovered.get_by_username("user0"))["full_name"] == "First"
+    await recovered.close()
+
+    # Closing takes a snapshot, so the next start replays nothing
+    assert len(list(tmp_path.glob("snapshot-*.bin"))) == 1
+    assert len(list_segments(tmp_path)) == 1
+    reopened = await open_store(tmp_path)
+    assert reopened._unsnapshotted == 0
+    assert await reopened.list() == expected
+    await reopened.close()
+
+
+async def test_torn_tail_is_ignored(tmp_path):
+    """Test that a record cut short by a crash does not prevent recovery."""
+    store = await open_store(tmp_path)
+    await store.add(make_user("alice"))
+    await store.add(make_user("bob"))
+    await store._log.close()
+
+    path = segment_path(tmp_path, list_segments(tmp_path)[-1])
+    path.write_bytes(path.read_bytes()[:-5])
+
+    recovered = await open_store(tmp_path)
+    assert [row["username"] for row in await recovered.list()] == ["alice"]
+    await recovered.close()
+
+
+async def test_concurrent_writes_share_fsyncs(tmp_path):
+    """Test group commit: writes waiting on one fsync are committed together."""
+    store = await open_store(tmp_path)
+    await asyncio.gather(*(store.add(make_user(f"user{i}")) for i in range(50)))
+    stats = store.log_stats()
+    assert stats["records"] == 50
+    assert stats["fsyncs"] < 50
+    await store.close()
+
+
+async def test_interval_policy_flushes_on_close(tmp_path):
+    """Test that writes acknowledged before their fsync are kept on close."""
+    store = await open_store(tmp_path, fsync="interval", fsync_interval=60)
+    await store.add(make_user("alice"))
+    assert store.log_stats()["batches"] == 0
+    await store._log.close()
+
+    recovered = await open_store(tmp_path)
+    assert await recovered.get_by_username("alice") is not None
+    await recovered.close()
+
+
+@pytest.mark.parametrize("error", [OSError("disk full"), RuntimeError("bug")])
+async def test_log_failure_rolls_back_writes(tmp_path, monkeypatch, error):
+    """Test that writes the log could not persist are dropped from memory."""
+    store = await open_store(tmp_path, snapshot_interval=None)
+    alice = await store.add(make_user("alice"))
+
+    def fail(fd, data, sync):
+        raise error
+
+    monkeypatch.setattr(WriteAheadLog, "_write", staticmethod(fail))
+    results = await asyncio.gather(
+        store.add(make_user("bob")), store.add(make_user("carol")),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, RepositoryError) for r in results)
+    assert await store.get_by_username("bob") is None
+    # Later writes are refused before they change anything
+    with pytest.raises(RepositoryError):
+        await store.update(alice["id"], {"full_name": "Alice"})
+    assert (await store.get(alice["id"]))["full_name"] is None
+    assert not store._log._flusher.done()
+    await store._log.close()
+
+    monkeypatch.undo()
+    recovered = await open_store(tmp_path)
+    assert [row["username"] for row in await recovered.list()] == ["alice"]
+    await recovered.close()
+
+
+async def test_interval_log_failure_reloads_on_next_write(tmp_path, monkeypatch):
+    """Test that a write acknowledged before a failed flush is dropped later."""
+    store = await open_store(tmp_path, fsync="interval", fsync_interval=60)
+
+    def fail(fd, data, sync):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(WriteAheadLog, "_write", staticmethod(fail))
+    await store.add(make_user("alice"))
+    await store._log.flush()
+
+    with pytest.raises(RepositoryError):
+        await store.add(make_user("bob"))
+    assert await store.count() == 0
+    await store._log.close()
+
+
+def test_rejects_unknown_fsync_policy(tmp_path):
+    """Test that a misspelt policy fails at construction."""
+    with pytest.raises(ValueError):
+        WriteAheadLog(tmp_path, fsync="sometimes")
+
+
+def test_snapshot_round_trip():
+    """Test the binary snapshot format, including optional fields."""
+    now = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    rows = [
+        {"id": 1, "username": "ädmin", "email": "a@example.com", "full_name": None,
+         "is_active": True, "created_at": now, "updated_at": now, "version": 3,
+         "password_hash": "scrypt$x"},
+        {"id": 7, "username": "bob", "email": "b@example.com", "full_name": "Bob",
+         "is_active": False, "created_at": now, "updated_at": now, "version": 1,
+         "password_hash": None},
+    ]
+    data = encode_snapshot(rows, next_id=9, segment=4)
+    assert decode_snapshot(data) == (rows, 9, 4)
+
+    with pytest.raises(ValueError):
+        decode_snapshot(data[:-1] + bytes([data[-1] ^ 1]))
+
+
+async def test_corrupt_snapshot_fails_recovery(tmp_path):
+    """Test that a damaged snapshot is reported instead of silently dropped."""
+    store = await open_store(tmp_path)
+    await store.add(make_user("alice"))
+    await store.close()
+
+    path = next(tmp_path.glob("snapshot-*.bin"))
+    path.write_bytes(b"garbage" + path.read_bytes())
+    with pytest.raises(RepositoryError):
+        await open_store(tmp_path)
@@ -45,3 +45,13 @@ def test_app_info(client: TestClient):
     assert "debug" in data
     assert data["docs_url"] == "/docs"
     assert data["redoc_url"] == "/redoc"
+
+
+def test_app_info_without_docs(client: TestClient, monkeypatch):
+    """Test that disabled docs are reported as null."""
+    monkeypatch.setattr(client.app, "docs_url", None)
+    monkeypatch.setattr(client.app, "redoc_url", None)
+
+    data = client.get("/api/health/info").json()
+    assert data["docs_url"] is None
+    assert data["redoc_url"] is None
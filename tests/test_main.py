@@ -5,8 +5,11 @@ This module contains tests for the main application endpoints
 and template rendering.
 """
 
+import os
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
+from app.core.pages import PageRenderer
 
 
 def test_read_root(client: TestClient):
@@ -62,3 +65,73 @@ def test_openapi_schema(client: TestClient):
     assert "openapi" in schema
     assert "info" in schema
     assert schema["info"]["title"] == "FastAPI Template"
+
+
+def test_lifespan_selects_database_backend(monkeypatch, tmp_path):
+    """Test that DATABASE_URL swaps the user store during the lifespan."""
+    pytest.importorskip("aiosqlite")
+    from app.main import app, settings
+    from app.services.user_service import get_user_service
+
+    user_service = get_user_service()
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(user_service, "repository", user_service.repository)
+
+    with TestClient(app) as client:
+        assert type(user_service.repository).__name__ == "SQLiteUserRepository"
+        response = client.post("/api/users/", json={
+            "username": "sqliteuser",
+            "email": "sqlite@example.com",
+            "password": "testpassword123",
+        })
+        assert response.status_code == 201
+        assert client.get("/api/users/username/sqliteuser").status_code == 200
+
+
+def test_list_settings_from_environment(monkeypatch):
+    """Test that list settings accept comma-separated values and JSON arrays."""
+    from app.core.config import Settings
+
+    monkeypatch.setenv("COMPRESSION_ALGORITHMS", "br, gzip")
+    monkeypatch.setenv("RATE_LIMIT_EXEMPT_PATHS", "/api/health,/static")
+    monkeypatch.setenv("ALLOWED_ORIGINS", '["http://a.example", "http://b.example"]')
+    monkeypatch.setenv("PROFILING_ADMIN_IDS", "1, 7")
+    settings = Settings(_env_file=None)
+
+    assert settings.compression_algorithms == ["br", "gzip"]
+    assert settings.rate_limit_exempt_paths == ["/api/health", "/static"]
+    assert settings.allowed_origins == ["http://a.example", "http://b.example"]
+    assert settings.profiling_admin_ids == [1, 7]
+
+
+def test_root_page_is_cached(client: TestClient):
+    """Test that the landing page is served with a stable ETag and length."""
+    identity = {"Accept-Encoding": "identity"}
+    first = client.get("/", headers=identity)
+    second = client.get("/", headers=identity)
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    assert int(first.headers["content-length"]) == len(first.content)
+
+    cached = client.get("/", headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_page_renderer_reloads_changed_templates(tmp_path):
+    """Test that debug mode re-renders after a template file changes."""
+    template = tmp_path / "page.html"
+    template.write_text("v1 {{ name }}")
+    renderer = PageRenderer(str(tmp_path), debug=True)
+    renderer.precompile()
+    request = Request({
+        "type": "http", "scheme": "http", "server": ("test", 80), "path": "/",
+        "root_path": "", "query_string": b"", "headers": [],
+    })
+
+    assert renderer.render(request, "page.html", {"name": "a"}).body == b"v1 a"
+    assert renderer.render(request, "page.html", {"name": "a"}).body == b"v1 a"
+    assert renderer.stats()["hits"] == 1
+
+    template.write_text("v2 {{ name }}")
+    os.utime(template, (1, 1))
+    assert renderer.render(request, "page.html", {"name": "a"}).body == b"v2 a"
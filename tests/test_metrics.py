@@ -0,0 +1,89 @@
+"""
+Test Metrics.
+
+This module contains tests for the metrics registry, the HTTP metrics
+middleware and the /metrics endpoint.
+"""
+
+from app.core.metrics import (
+    HTTP_REQUESTS_TOTAL,
+    SERVICE_OPERATION_DURATION,
+    MetricsRegistry,
+)
+
+
+def test_render_prometheus_text():
+    """Test the text exposition of counters, gauges and histograms."""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["route"])
+    requests.labels('/a"b').inc(2)
+    registry.gauge("in_flight", "In flight.").set(3)
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=[0.1, 1.0])
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a\\"b"} 2' in text
+    assert "in_flight 3" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+    assert "latency_seconds_sum 5.55" in text
+
+
+async def test_multiprocess_aggregation(tmp_path):
+    """Test that worker snapshots are summed, and dead workers' gauges dropped."""
+    def worker(requests, in_flight):
+        registry = MetricsRegistry(multiprocess_dir=str(tmp_path))
+        registry.counter("requests_total", "Requests.").inc(requests)
+        registry.gauge("in_flight", "In flight.").set(in_flight)
+        registry.histogram("latency_seconds", "Latency.", buckets=[1.0]).observe(0.5)
+        return registry
+
+    first, second = worker(2, 1), worker(3, 4)
+    # Both registries live in this process, so give the second another pid.
+    document = second._document(live=False)
+    document["pid"] += 1
+    second._write(document)
+
+    text = await first.exposition()
+
+    assert "requests_total 5" in text
+    assert "in_flight 1" in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert len(list(tmp_path.glob("metrics_*.json"))) == 2
+
+
+def test_middleware_labels_route_templates(client):
+    """Test that requests are counted by route template, not raw path."""
+    counter = HTTP_REQUESTS_TOTAL.labels("GET", "/api/users/{user_id}", "200")
+    missing = HTTP_REQUESTS_TOTAL.labels("GET", "/api/users/{user_id}", "404")
+    before = (counter.value, missing.value)
+
+    client.get("/api/users/1")
+    client.get("/api/users/2")
+    client.get("/api/users/99999")
+
+    assert (counter.value, missing.value) == (before[0] + 2, before[1] + 1)
+
+
+def test_metrics_endpoint(client):
+    """Test the /metrics endpoint."""
+    operation = SERVICE_OPERATION_DURATION.labels("get_user_json")
+    before = operation.count
+    client.get("/api/users/1")
+    assert operation.count == before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/api/users/{user_id}"' in text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert 'user_service_operation_duration_seconds_count{operation="get_user_json"}' in text
+    assert "user_store_users " in text
+    assert 'user_cache_requests_total{result="hit"}' in text
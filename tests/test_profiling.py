@@ -0,0 +1,119 @@
+"""
+Test Request Profiling.
+
+This module contains tests for the profiling middleware and stack sampler.
+"""
+
+import pstats
+import sys
+import threading
+
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+from app.core.profiling import ProfilingMiddleware, StackSampler, collapse_stack
+from app.core.tokens import TokenManager
+
+tokens = TokenManager({"k1": b"test-secret"}, "k1")
+ADMIN = {"Authorization": f"Bearer {tokens.issue(1, 'admin')[0]}"}
+USER = {"Authorization": f"Bearer {tokens.issue(2, 'alice')[0]}"}
+# Another user who took the admin's username
+IMPOSTOR = {"Authorization": f"Bearer {tokens.issue(3, 'admin')[0]}"}
+PROFILING = {"tokens": tokens, "admin_ids": [1]}
+
+
+def slow_work() -> int:
+    return sum(i * i for i in range(20000))
+
+
+router = APIRouter()
+
+
+@router.get("/items/{item_id}")
+async def item(item_id: int):
+    return {"id": item_id, "total": slow_work()}
+
+
+def test_admin_gets_profile_of_request(make_app):
+    """Test that a flagged admin request is answered with its profile."""
+    client = TestClient(make_app(router, ProfilingMiddleware, **PROFILING))
+
+    for params, headers in (({}, {**ADMIN, "X-Profile": "1"}), ({"profile": 1}, ADMIN)):
+        response = client.get("/items/404", params=params, headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert response.headers["x-profiled-status"] == "200"
+        assert response.text.startswith("GET /items/404 -> 200 in ")
+        assert "function calls" in response.text
+        assert "slow_work" in response.text
+        assert "x-profile-file" not in response.headers
+
+
+def test_profile_flag_ignored_without_admin(make_app):
+    """Test that the flag is ignored from anonymous and non-admin clients."""
+    client = TestClient(make_app(router, ProfilingMiddleware, **PROFILING))
+    invalid = {"Authorization": "Bearer not-a-token"}
+
+    for headers in ({}, USER, IMPOSTOR, invalid, {**ADMIN, "X-Profile": "0"}):
+        response = client.get("/items/1?profile=1", headers={"X-Profile": "1", **headers})
+        assert response.json()["id"] == 1
+        assert "x-profiled-status" not in response.headers
+
+
+def test_profile_saved_to_directory(tmp_path, make_app):
+    """Test that the raw profile is written for pstats."""
+    client = TestClient(
+        make_app(router, ProfilingMiddleware, directory=str(tmp_path), **PROFILING)
+    )
+
+    response = client.get("/items/1", headers={**ADMIN, "X-Profile": "true"})
+    name = response.headers["x-profile-file"]
+    assert name.endswith("-GET-items_1.pstats")
+    stats = pstats.Stats(str(tmp_path / name))
+    assert any(function == "slow_work" for _, _, function in stats.stats)
+
+
+def test_stack_sampler_writes_collapsed_stacks(tmp_path):
+    """Test that sampled stacks are written one counted line per stack."""
+    done = threading.Event()
+
+    def busy():
+        while not done.is_set():
+            slow_work()
+
+    worker = threading.Thread(target=busy)
+    worker.start()
+    path = tmp_path / "stacks.folded"
+    sampler = StackSampler(0.001, str(path))
+    try:
+        sampler.start(worker.ident)
+        while sampler.stats()["samples"] < 20:
+            done.wait(0.01)
+    finally:
+        sampler.stop()
+        done.set()
+        worker.join()
+
+    lines = path.read_text().splitlines()
+    counts = [int(line.rpartition(" ")[2]) for line in lines]
+    assert sum(counts) == sampler.stats()["samples"] - sampler.stats()["idle"]
+    assert counts == sorted(counts, reverse=True)
+    stack = lines[0].rpartition(" ")[0].split(";")
+    assert stack[0] == "threading:Thread._bootstrap"
+    assert f"{__name__}:slow_work" in stack
+
+
+def test_collapse_stack_orders_outermost_first():
+    """Test that stacks read from the outermost call inwards."""
+    def inner():
+        return collapse_stack(sys._getframe())
+
+    def outer():
+        return inner()
+
+    stack = outer()
+    assert stack[-2:] == (
+        f"{__name__}:test_collapse_stack_orders_outermost_first.<locals>.outer",
+        f"{__name__}:test_collapse_stack_orders_outermost_first.<locals>.inner",
+    )
+    # Frames beyond the depth limit are dropped from the outer end
+    assert collapse_stack(sys._getframe(), max_depth=1) == (stack[-3],)
@@ -0,0 +1,182 @@
+"""
+Test Request Rate Limiting.
+
+This module contains tests for the rate limit backends and middleware.
+"""
+
+import pytest
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+from app.core.metrics import HTTP_RATE_LIMITED
+from app.core.ratelimit import (
+    MemoryRateLimitBackend,
+    RateLimitMiddleware,
+    RateLimitRule,
+    parse_rate,
+)
+from app.core.tokens import TokenManager
+
+
+def test_parse_rate():
+    """Test quota parsing with and without units."""
+    assert parse_rate("100/60") == RateLimitRule(100, 60.0, "token_bucket")
+    assert parse_rate("100/60s") == RateLimitRule(100, 60.0, "token_bucket")
+    assert parse_rate("5/minute", "sliding_window") == RateLimitRule(
+        5, 60.0, "sliding_window"
+    )
+    assert parse_rate("1000/2hours").period == 7200
+    assert parse_rate("10/60").policy == "10;w=60"
+    for value in ("100", "0/60", "10/fortnight"):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+    with pytest.raises(ValueError):
+        parse_rate("10/60", "leaky_bucket")
+
+
+async def test_token_bucket_allows_burst_then_refills():
+    """Test that a bucket allows a burst, then one request per refill."""
+    now = [0.0]
+    backend = MemoryRateLimitBackend(clock=lambda: now[0])
+    rule = RateLimitRule(3, 30)
+
+    decisions = [await backend.hit("a", rule) for _ in range(4)]
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions] == [2, 1, 0, 0]
+    assert decisions[-1].retry_after == pytest.approx(10)
+    # Another key has its own bucket
+    assert (await backend.hit("b", rule)).allowed
+
+    now[0] = 10.0
+    assert (await backend.hit("a", rule)).allowed
+    assert not (await backend.hit("a", rule)).allowed
+
+
+async def test_sliding_window_weights_previous_window():
+    """Test that requests in the previous window count by their overlap."""
+    now = [0.0]
+    backend = MemoryRateLimitBackend(clock=lambda: now[0])
+    rule = RateLimitRule(4, 60, "sliding_window")
+
+    for _ in range(4):
+        assert (await backend.hit("a", rule)).allowed
+    denied = await backend.hit("a", rule)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(60)
+
+    # A quarter into the next window, 3 of the 4 earlier requests still count
+    now[0] = 75.0
+    assert (await backend.hit("a", rule)).allowed
+    denied = await backend.hit("a", rule)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(15)
+
+    # Two windows later nothing counts
+    now[0] = 190.0
+    assert (await backend.hit("a", rule)).remaining == 3
+
+
+async def test_idle_keys_are_evicted():
+    """Test that keys with their quota back are dropped and the map is capped."""
+    now = [0.0]
+    backend = MemoryRateLimitBackend(max_keys=3, clock=lambda: now[0])
+    rule = RateLimitRule(5, 10)
+
+    for key in ("a", "b", "c", "d"):
+        await backend.hit(key, rule)
+    assert len(backend) == 3
+    assert backend.stats() == {"keys": 3, "evictions": 1}
+
+    # Each hit drops up to two idle keys
+    now[0] = 20.0
+    await backend.hit("e", rule)
+    assert len(backend) == 2
+    await backend.hit("e", rule)
+    assert len(backend) == 1
+
+
+router = APIRouter()
+
+
+@router.get("/items/{item_id}")
+async def item(item_id: int):
+    return {"id": item_id}
+
+
+@router.post("/items/{item_id}")
+async def update_item(item_id: int):
+    return {"id": item_id}
+
+
+@router.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+def test_middleware_limits_per_route_template(make_app):
+    """Test that paths of one route share a quota and 429s carry Retry-After."""
+    client = TestClient(make_app(
+        router, RateLimitMiddleware, router=router, backend=MemoryRateLimitBackend(),
+        default=RateLimitRule(2, 60), exempt_paths=("/health",),
+    ))
+    before = HTTP_RATE_LIMITED.labels("/items/{item_id}").value
+
+    first = client.get("/items/1")
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    assert first.headers["ratelimit-policy"] == "2;w=60"
+    assert client.get("/items/2").status_code == 200
+
+    response = client.get("/items/3")
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert response.headers["retry-after"] == "30"
+    assert response.headers["ratelimit-remaining"] == "0"
+    assert HTTP_RATE_LIMITED.labels("/items/{item_id}").value == before + 1
+
+    # Other methods are counted separately; exempt paths are not counted
+    assert client.post("/items/1").status_code == 200
+    for _ in range(3):
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert "ratelimit-limit" not in response.headers
+
+
+def test_middleware_route_rules(make_app):
+    """Test per-route quotas, by method and template, over the default."""
+    client = TestClient(make_app(
+        router, RateLimitMiddleware, router=router, backend=MemoryRateLimitBackend(),
+        default=None, routes={"POST /items/{item_id}": RateLimitRule(1, 60)},
+    ))
+    for _ in range(3):
+        response = client.get("/items/1")
+        assert response.status_code == 200
+        assert "ratelimit-limit" not in response.headers
+    assert client.post("/items/1").status_code == 200
+    assert client.post("/items/1").status_code == 429
+
+
+def test_middleware_keys_by_token_user(make_app):
+    """Test that authenticated clients get a quota per user, not per address."""
+    tokens = TokenManager({"k1": b"test-secret"}, "k1")
+    client = TestClient(make_app(
+        router, RateLimitMiddleware, router=router, backend=MemoryRateLimitBackend(),
+        default=RateLimitRule(2, 60), tokens=tokens,
+    ))
+    alice = {"Authorization": f"Bearer {tokens.issue(1, 'alice')[0]}"}
+    bob = {"Authorization": f"Bearer {tokens.issue(2, 'bob')[0]}"}
+
+    for _ in range(2):
+        assert client.get("/items/1", headers=alice).status_code == 200
+    assert client.get("/items/1", headers=alice).status_code == 429
+    assert client.get("/items/1", headers=bob).status_code == 200
+    # An invalid token falls back to the address
+    invalid = {"Authorization": "Bearer not-a-token"}
+    assert client.get("/items/1", headers=invalid).status_code == 200
+
+
+def test_app_not_rate_limited_by_default(client):
+    """Test that the application only limits requests once enabled."""
+    response = client.get("/api/users/1")
+    assert response.status_code == 200
+    assert "ratelimit-limit" not in response.headers
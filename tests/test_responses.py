@@ -0,0 +1,37 @@
+"""
+Test Response Classes.
+
+This module contains tests for the fast JSON response path.
+"""
+
+import json
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from app.core.responses import PydanticJSONResponse
+from app.schemas.base import SuccessResponse
+from app.schemas.user import UserResponse
+
+
+def test_pydantic_json_response_matches_default_encoding():
+    """Test that the fast path produces the same JSON as FastAPI's encoder."""
+    user = UserResponse.model_construct(
+        id=1,
+        username="admin",
+        email="admin@example.com",
+        full_name=None,
+        is_active=True,
+        created_at=datetime(2024, 1, 2, 3, 4, 5, 678),
+        updated_at=datetime(2024, 1, 2, 3, 4, 5, 678),
+    )
+    content = {"users": [user], "message": SuccessResponse(message="ok")}
+
+    response = PydanticJSONResponse(content)
+    assert response.headers["content-type"] == "application/json"
+    assert json.loads(response.body) == jsonable_encoder(content)
+
+
+def test_response_schemas_skip_assignment_validation():
+    """Test that response-only schemas do not validate on assignment."""
+    response = SuccessResponse(message="ok")
+    response.message = "changed"
+    assert SuccessResponse.model_config["validate_assignment"] is False
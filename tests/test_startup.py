@@ -0,0 +1,91 @@
+"""
+Test Startup Helpers.
+
+This module contains tests for the OpenAPI schema cache, lazy template
+loading and the startup profile.
+"""
+
+import json
+from fastapi import APIRouter
+from app.core.openapi import install_openapi_cache, schema_fingerprint
+from app.core.pages import PageRenderer
+from app.core.startup import StartupProfile, process_age
+
+
+router = APIRouter()
+
+
+@router.get("/items")
+async def items():
+    return []
+
+
+def test_openapi_cache_round_trip(tmp_path, make_app):
+    """Test that the schema is written once and then read back."""
+    path = str(tmp_path / "openapi.json")
+    app = make_app(router)
+    install_openapi_cache(app, path)
+    schema = app.openapi()
+    assert "/items" in schema["paths"]
+
+    with open(path) as file:
+        assert json.load(file)["schema"] == schema
+
+    # A new process reads the file instead of generating the schema
+    second = make_app(router)
+    second.openapi = lambda: {"generated": True}
+    install_openapi_cache(second, path)
+    assert second.openapi() == schema
+
+
+def test_openapi_cache_ignores_stale_files(tmp_path, make_app):
+    """Test that a file with a different fingerprint is regenerated."""
+    path = tmp_path / "openapi.json"
+    path.write_text(json.dumps({"fingerprint": "old", "schema": {"stale": True}}))
+    app = make_app(router)
+    install_openapi_cache(app, str(path))
+
+    assert "/items" in app.openapi()["paths"]
+    assert json.loads(path.read_text())["fingerprint"] != "old"
+
+
+def test_openapi_fingerprint_covers_routes(make_app):
+    """Test that mounting different routes changes the fingerprint."""
+    app = make_app(router)
+    fingerprint = schema_fingerprint(app)
+    assert schema_fingerprint(make_app(router)) == fingerprint
+
+    extra = APIRouter()
+    extra.get("/metrics")(items)
+    app.include_router(extra)
+    assert schema_fingerprint(app) != fingerprint
+
+
+def test_page_renderer_loads_templates_lazily(tmp_path):
+    """Test that the Jinja2 environment is created, and set up, on first use."""
+    (tmp_path / "page.html").write_text("{{ greeting() }}")
+    calls = []
+
+    def setup(templates):
+        calls.append(templates)
+        templates.env.globals["greeting"] = lambda: "hello"
+
+    renderer = PageRenderer(str(tmp_path), setup=setup)
+    assert calls == []
+
+    assert renderer.precompile() == ["page.html"]
+    assert renderer.templates is calls[0]
+    assert len(calls) == 1
+
+
+def test_startup_profile():
+    """Test that steps are timed and reported."""
+    profile = StartupProfile(enabled=True)
+    with profile.step("load"):
+        pass
+
+    assert [name for name, _ in profile.steps] == ["load"]
+    assert "load" in profile.report(1.5)
+    assert "1500.0 ms" in profile.report(1.5)
+    age = process_age()
+    assert age is None or age > 0
@@ -0,0 +1,135 @@
+"""
+Test Static Assets.
+
+This module contains tests for the static file manifest, content
+negotiation and cache headers.
+"""
+
+import asyncio
+import gzip
+import pytest
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.static import StaticAssets
+
+
+@pytest.fixture
+def assets(tmp_path):
+    """Create a static directory with a small and a large file."""
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "site.css").write_text("body { color: red; }\n" * 50)
+    (tmp_path / "big.js").write_text("console.log(1);\n" * 1000)
+    (tmp_path / "big.js.gz").write_bytes(gzip.compress(b"console.log(1);\n" * 1000))
+    return StaticAssets(tmp_path, memory_limit=4096)
+
+
+@pytest.fixture
+def static_client(assets):
+    """Serve the assets under /static."""
+    app = FastAPI()
+    app.mount("/static", assets, name="static")
+    return TestClient(app)
+
+
+def test_manifest(assets):
+    """Test that the manifest hashes files and skips pre-built siblings."""
+    manifest = assets.build()
+    assert set(manifest) == {"css/site.css", "big.js"}
+
+    css = manifest["css/site.css"]
+    assert css.hashed_path == f"css/site.{css.digest}.css"
+    assert set(css.variants) >= {"identity", "gzip"}
+    assert css.variants["identity"].body is not None
+    assert manifest["big.js"].variants["identity"].body is None
+    assert manifest["big.js"].variants["gzip"].path.endswith("big.js.gz")
+
+
+def test_negotiation_and_cache_headers(assets, static_client):
+    """Test encodings, immutable hashed URLs and conditional requests."""
+    css = assets.manifest["css/site.css"]
+
+    plain = static_client.get(
+        "/static/css/site.css", headers={"Accept-Encoding": "gzip"}
+    )
+    assert plain.status_code == 200
+    assert plain.headers["content-encoding"] == "gzip"
+    assert plain.headers["cache-control"] == "no-cache"
+    assert plain.text == "body { color: red; }\n" * 50
+
+    identity = static_client.get(
+        "/static/css/site.css", headers={"Accept-Encoding": "gzip;q=0"}
+    )
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] != plain.headers["etag"]
+
+    hashed = static_client.get(f"/static/{css.hashed_path}")
+    assert "immutable" in hashed.headers["cache-control"]
+
+    not_modified = static_client.get("/static/css/site.css", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"],
+    })
+    assert not_modified.status_code == 304
+    assert static_client.get("/static/css/site.css", headers={
+        "If-Modified-Since": plain.headers["last-modified"],
+    }).status_code == 304
+
+    assert static_client.get("/static/missing.css").status_code == 404
+    assert static_client.post("/static/css/site.css").status_code == 405
+
+
+async def test_load_builds_once_off_the_event_loop(assets, monkeypatch):
+    """Test that concurrent first loads share one build in a worker thread."""
+    threads = []
+    build = assets.build
+
+    def recording_build():
+        threads.append(threading.current_thread())
+        return build()
+
+    monkeypatch.setattr(assets, "build", recording_build)
+    manifests = await asyncio.gather(*(assets.load() for _ in range(5)))
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(threads) == 1
+    assert all(manifest is manifests[0] for manifest in manifests)
+
+
+def test_large_files_stream_from_disk(static_client):
+    """Test that large files and their pre-built variants are sent from disk."""
+    response = static_client.get("/static/big.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "console.log(1);\n" * 1000
+
+    response = static_client.get("/static/big.js", headers={"Accept-Encoding": ""})
+    assert int(response.headers["content-length"]) == len(response.content)
+
+
+def test_reload_picks_up_changes(tmp_path):
+    """Test that reload mode reloads just the edited file."""
+    (tmp_path / "a.txt").write_text("one")
+    (tmp_path / "other.txt").write_text("untouched")
+    assets = StaticAssets(tmp_path, reload=True)
+    app = FastAPI()
+    app.mount("/static", assets, name="static")
+    client = TestClient(app)
+
+    assert client.get("/static/a.txt").text == "one"
+    other = assets.manifest["other.txt"]
+    old_url = "/static/" + assets.manifest["a.txt"].hashed_path
+    (tmp_path / "a.txt").write_text("two!")
+
+    # The old hashed URL now names stale content, so it is not immutable
+    response = client.get(old_url)
+    assert response.text == "two!"
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.get("/static/a.txt").text == "two!"
+    assert assets.url_path("a.txt") == "a.txt"
+    # Only the changed file was reloaded
+    assert assets.manifest["other.txt"] is other
+
+    # Files added after the manifest was built are found on first request
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "b.txt").write_text("three")
+    assert client.get("/static/new/b.txt").text == "three"
+    assert client.get("/static/new/missing.txt").status_code == 404
@@ -0,0 +1,143 @@
+"""
+Test Request Timing.
+
+This module contains tests for the Server-Timing middleware, the timed
+route class and service spans.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.core.timing import ServerTimingMiddleware, TimedRoute, span
+
+
+class Item(BaseModel):
+    name: str
+
+
+def get_store() -> dict:
+    return {"1": "one"}
+
+
+router = APIRouter(prefix="/api", route_class=TimedRoute)
+
+
+@router.get("/items/{item_id}")
+async def item(item_id: int, store: dict = Depends(get_store)):
+    with span("store"):
+        await asyncio.sleep(0.02)
+        name = store.get(str(item_id))
+    if name is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return {"id": item_id, "name": name}
+
+
+@router.post("/items")
+def create_item(item: Item, tag: Optional[str] = None):
+    with span("build"):
+        return {"name": item.name, "tag": tag}
+
+
+def parse(header: str) -> dict:
+    metrics = {}
+    for metric in header.split(", "):
+        name, _, duration = metric.partition(";dur=")
+        metrics[name] = float(duration)
+    return metrics
+
+
+def test_server_timing_breaks_request_into_phases(make_app):
+    """Test that phases and spans are sent and add up to the total."""
+    client = TestClient(make_app(router, ServerTimingMiddleware))
+
+    response = client.get("/api/items/1")
+    assert response.json() == {"id": 1, "name": "one"}
+    metrics = parse(response.headers["server-timing"])
+    assert list(metrics) == [
+        "routing", "deps", "validate", "store", "handler", "serialize", "total",
+    ]
+    assert metrics["store"] >= 20
+    # The sleep is only counted in its span, not in the handler around it
+    assert metrics["handler"] < 20
+    phases = sum(duration for name, duration in metrics.items() if name != "total")
+    assert phases <= metrics["total"] + 0.1
+
+    response = client.post("/api/items?tag=a", json={"name": "x"})
+    assert response.json() == {"name": "x", "tag": "a"}
+    metrics = parse(response.headers["server-timing"])
+    assert list(metrics)[:3] == ["routing", "body", "deps"]
+    assert "build" in metrics
+
+    # A body that fails to parse is still reported by FastAPI
+    response = client.post(
+        "/api/items", content=b"{", headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 422
+
+
+def test_server_timing_on_errors(make_app):
+    """Test that failed requests end in the phase that failed."""
+    client = TestClient(make_app(router, ServerTimingMiddleware))
+
+    response = client.get("/api/items/abc")
+    assert response.status_code == 422
+    assert list(parse(response.headers["server-timing"]))[-2] == "validate"
+
+    response = client.get("/api/items/2")
+    assert response.status_code == 404
+    metrics = parse(response.headers["server-timing"])
+    assert "serialize" not in metrics
+    assert list(metrics)[-2] == "handler"
+
+    response = client.get("/missing")
+    assert list(parse(response.headers["server-timing"])) == ["routing", "total"]
+
+
+def test_timed_route_keeps_endpoint_signature(make_app):
+    """Test that the timing markers do not show up as parameters."""
+    schema = make_app(router).openapi()
+    parameters = schema["paths"]["/api/items/{item_id}"]["get"]["parameters"]
+    assert [p["name"] for p in parameters] == ["item_id"]
+    operation = schema["paths"]["/api/items"]["post"]
+    assert [p["name"] for p in operation["parameters"]] == ["tag"]
+    assert "requestBody" in operation
+
+
+def test_timing_record_logged_for_slow_requests(caplog, make_app):
+    """Test that requests over the threshold are logged as JSON records."""
+    client = TestClient(make_app(router, ServerTimingMiddleware, log_threshold=0.015))
+
+    with caplog.at_level(logging.INFO, logger="app.core.timing"):
+        client.post("/api/items", json={"name": "x"})
+        client.get("/api/items/1")
+    records = [r for r in caplog.records if r.name == "app.core.timing"]
+    assert len(records) == 1
+    record = json.loads(records[0].getMessage())
+    assert record["method"] == "GET"
+    assert record["route"] == "/api/items/{item_id}"
+    assert record["status"] == 200
+    assert record["total_ms"] >= 20
+    assert record["phases_ms"]["store"] >= 20
+
+
+def test_user_service_spans(client, sample_user_data):
+    """Test that user routes report the service's own spans."""
+    response = client.post("/api/users/", json=sample_user_data)
+    assert response.status_code == 201
+    metrics = parse(response.headers["server-timing"])
+    assert {"hash", "store", "handler", "serialize"} <= set(metrics)
+
+    response = client.get(f"/api/users/{response.json()['id']}")
+    assert {"cache", "store", "build"} <= set(parse(response.headers["server-timing"]))
+
+
+def test_span_outside_request_does_nothing():
+    """Test that spans are no-ops when no request is being timed."""
+    with span("store"):
+        with span("build"):
+            pass
@@ -5,8 +5,12 @@ This module contains tests for user-related API endpoints including
 CRUD operations.
 """
 
+import json
 import pytest
 from fastapi.testclient import TestClient
+from app.core.security import PasswordHasherBusyError
+from app.repositories import RepositoryError
+from app.services.user_service import user_service
 
 
 def test_get_users(client: TestClient):
@@ -130,3 +134,245 @@ def test_delete_user_not_found(client: TestClient):
     """Test deleting a non-existent user."""
     response = client.delete("/api/users/999")
     assert response.status_code == 404
+
+
+def test_update_user_duplicate_username(client: TestClient):
+    """Test renaming a user to a username that already exists."""
+    response = client.put("/api/users/2", json={"username": "admin"})
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+
+def test_update_user_rejects_null_fields(client: TestClient):
+    """Test that required fields cannot be set to null."""
+    before = client.get("/api/users/2").json()
+    for field in ("username", "email", "is_active"):
+        response = client.put("/api/users/2", json={field: None})
+        assert response.status_code == 422
+
+        payload = {"items": [{"id": 2, field: None}]}
+        assert client.patch("/api/users/bulk", json=payload).status_code == 422
+
+    # full_name may still be cleared
+    response = client.put("/api/users/2", json={"full_name": None})
+    assert response.status_code == 200
+    assert response.json()["username"] == before["username"]
+    assert client.get(f"/api/users/username/{before['username']}").status_code == 200
+
+
+def test_get_users_page_walks_all_users(client: TestClient):
+    """Test following next_cursor through every page."""
+    expected = [user["id"] for user in client.get("/api/users/?limit=1000").json()]
+
+    seen = []
+    params = {"limit": 1}
+    while True:
+        response = client.get("/api/users/page", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(user["id"] for user in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+
+    assert seen == expected
+
+
+def test_get_users_page_invalid_cursor(client: TestClient):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/api/users/page?after=not-a-cursor")
+    assert response.status_code == 400
+
+
+def test_search_users(client: TestClient, sample_user_data):
+    """Test searching by username prefix and name words."""
+    sample_user_data["full_name"] = "Searchable Person"
+    created = client.post("/api/users/", json=sample_user_data).json()
+
+    response = client.get(
+        "/api/users/search",
+        params={"username": sample_user_data["username"][:12], "name": "search pers"},
+    )
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()["items"]] == [created["id"]]
+
+    response = client.get(
+        "/api/users/search",
+        params={"name": "searchable", "created_to": "2000-01-01T00:00:00Z"},
+    )
+    assert response.json() == {"items": [], "next_cursor": None}
+
+
+def test_search_users_pages(client: TestClient):
+    """Test paging through search results with next_cursor."""
+    expected = [u["id"] for u in client.get("/api/users/?limit=1000").json()]
+
+    seen = []
+    params = {"limit": 1}
+    while True:
+        page = client.get("/api/users/search", params=params).json()
+        seen.extend(user["id"] for user in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params["after"] = page["next_cursor"]
+
+    assert seen == expected
+
+
+def test_export_users_ndjson(client: TestClient):
+    """Test streaming every user as NDJSON."""
+    expected = client.get("/api/users/?limit=1000").json()
+
+    response = client.get("/api/users/export?batch_size=1")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = response.text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [u["id"] for u in expected]
+
+
+def test_export_users_json_array_with_filter(client: TestClient, sample_user_data):
+    """Test streaming a filtered JSON array."""
+    sample_user_data["is_active"] = False
+    inactive = client.post("/api/users/", json=sample_user_data).json()
+
+    response = client.get("/api/users/export?format=json&is_active=false&batch_size=2")
+    assert response.status_code == 200
+    data = response.json()
+    assert inactive["id"] in [user["id"] for user in data]
+    assert all(user["is_active"] is False for user in data)
+
+    response = client.get("/api/users/export?format=json&is_active=true")
+    assert inactive["id"] not in [user["id"] for user in response.json()]
+
+
+def test_bulk_create_users(client: TestClient, sample_user_data):
+    """Test creating users in one batch with duplicate detection."""
+    second = dict(sample_user_data, username=sample_user_data["username"] + "_2")
+    payload = {"items": [
+        sample_user_data,
+        dict(sample_user_data, email="dup@example.com"),  # Repeats within the batch
+        dict(second, username="admin"),  # Already exists
+        second,
+    ]}
+
+    response = client.post("/api/users/bulk", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert (data["succeeded"], data["failed"]) == (2, 2)
+    assert [r["status"] for r in data["results"]] == ["created", "error", "error", "created"]
+    assert data["results"][1]["status_code"] == 400
+    created_id = data["results"][3]["id"]
+    assert client.get(f"/api/users/{created_id}").json()["username"] == second["username"]
+
+
+def test_bulk_create_users_hasher_busy(client: TestClient, sample_user_data, monkeypatch):
+    """Test that a saturated password hasher answers 503 for a batch too."""
+    async def busy(passwords):
+        raise PasswordHasherBusyError(retry_after=2)
+
+    monkeypatch.setattr(user_service.hasher, "hash_many", busy)
+    response = client.post("/api/users/bulk", json={"items": [sample_user_data]})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "2"
+
+
+def test_bulk_update_users(client: TestClient, sample_user_data):
+    """Test updating users in one batch."""
+    user_id = client.post("/api/users/", json=sample_user_data).json()["id"]
+    payload = {"items": [
+        {"id": user_id, "full_name": "Bulk Updated"},
+        {"id": 999, "full_name": "Nobody"},
+        {"id": user_id, "full_name": "Twice"},
+        {"id": 2, "username": "admin"},
+    ]}
+
+    response = client.patch("/api/users/bulk", json=payload)
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [r["status_code"] for r in results] == [200, 404, 400, 400]
+    assert results[0]["user"]["full_name"] == "Bulk Updated"
+    assert client.get(f"/api/users/{user_id}").json()["full_name"] == "Bulk Updated"
+
+
+def test_bulk_delete_users(client: TestClient, sample_user_data):
+    """Test deleting users in one batch."""
+    user_id = client.post("/api/users/", json=sample_user_data).json()["id"]
+
+    response = client.request("DELETE", "/api/users/bulk", json={"ids": [user_id, 999, user_id]})
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["deleted", "error", "error"]
+    assert [r["status_code"] for r in results] == [200, 404, 400]
+    assert client.get(f"/api/users/{user_id}").status_code == 404
+
+
+def test_get_user_etag_not_modified(client: TestClient):
+    """Test that a matching If-None-Match returns 304."""
+    response = client.get("/api/users/2")
+    etag = response.headers["etag"]
+
+    cached = client.get("/api/users/2", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.content == b""
+
+    by_name = client.get("/api/users/username/user")
+    assert by_name.headers["etag"] == etag
+
+
+def test_get_users_etag_changes_on_write(client: TestClient, sample_user_data):
+    """Test that the collection ETag changes when users change."""
+    etag = client.get("/api/users/").headers["etag"]
+    assert client.get("/api/users/", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/users/", json=sample_user_data)
+    response = client.get("/api/users/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_update_user_if_match(client: TestClient, sample_user_data):
+    """Test optimistic concurrency on PUT with If-Match."""
+    user_id = client.post("/api/users/", json=sample_user_data).json()["id"]
+    etag = client.get(f"/api/users/{user_id}").headers["etag"]
+
+    response = client.put(
+        f"/api/users/{user_id}", json={"full_name": "First"}, headers={"If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    current = client.get(f"/api/users/{user_id}")
+    assert current.headers["etag"] == response.headers["etag"]
+    assert current.json() == response.json()
+
+    stale = client.put(
+        f"/api/users/{user_id}", json={"full_name": "Second"}, headers={"If-Match": etag}
+    )
+    assert stale.status_code == 412
+    assert client.get(f"/api/users/{user_id}").json()["full_name"] == "First"
+
+
+def test_delete_user_if_match(client: TestClient, sample_user_data):
+    """Test optimistic concurrency on DELETE with If-Match."""
+    user_id = client.post("/api/users/", json=sample_user_data).json()["id"]
+    etag = client.get(f"/api/users/{user_id}").headers["etag"]
+    client.put(f"/api/users/{user_id}", json={"full_name": "Changed"})
+
+    assert client.delete(f"/api/users/{user_id}", headers={"If-Match": etag}).status_code == 412
+    current = client.get(f"/api/users/{user_id}").headers["etag"]
+    assert client.delete(f"/api/users/{user_id}", headers={"If-Match": current}).status_code == 200
+
+
+def test_store_failure_returns_503(client: TestClient, monkeypatch):
+    """Test that a failing user store answers 503 rather than 500."""
+    async def failing(user_id, if_match=None):
+        raise RepositoryError("Write-ahead log failed: disk full")
+
+    monkeypatch.setattr(user_service, "delete_user", failing)
+    response = client.delete("/api/users/2")
+    assert response.status_code == 503
+    assert "unavailable" in response.json()["detail"]